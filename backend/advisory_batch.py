@@ -0,0 +1,163 @@
+"""
+Batch Cultivation Advisory
+Evaluates cultivation advisories for thousands of (farm, crop, sowing date, weather) rows.
+
+Rows are processed in chunks. Within a chunk, stages are resolved with the compiled
+calendar in one vectorized pass, and farms are grouped by (crop, stage) so each group's
+weather is looked up in the compiled advisory table (advisory_rules.py) with one
+np.searchsorted per weather variable. Output matches
+CultivationAdvisor.get_weather_based_recommendations row for row.
+
+Rows are validated before their chunk is evaluated; an invalid row (not an object,
+malformed sowing date or weather, unparsable NDJSON line) yields a
+{"farm_id", "error"} line in its place and the rest of the batch continues.
+"""
+
+import json
+import logging
+import math
+from datetime import datetime
+
+from advisory_rules import get_advisory_rules
+from cultivation_advisor import CultivationAdvisor, COMPILED_CALENDAR
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 2048
+
+
+class InvalidRow:
+    """Placeholder for an input line that could not be parsed; evaluated as an error line."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def validate_row(row):
+    """Error message for a row the vectorized evaluator can't take, or None."""
+    if isinstance(row, InvalidRow):
+        return row.error
+    if not isinstance(row, dict):
+        return "row must be an object"
+    if row.get("crop") is not None and not isinstance(row["crop"], str):
+        return "crop must be a string"
+    if row.get("sowing_date"):
+        # Strictly YYYY-MM-DD: numpy's datetime64 (used by the calendar) rejects or misreads
+        # other forms date.fromisoformat accepts, such as "2026-W01-1" or "20260101"
+        try:
+            datetime.strptime(str(row["sowing_date"])[:10], "%Y-%m-%d")
+        except ValueError:
+            return "sowing_date must be an ISO date (YYYY-MM-DD)"
+    weather = row.get("weather") or row
+    if not isinstance(weather, dict):
+        return "weather must be an object"
+    for key in get_advisory_rules().weather_keys:
+        value = weather.get(key)
+        if key in weather and (
+            isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value)
+        ):
+            return f"{key} must be a finite number"
+    return None
+
+
+class _Columns:
+    """Column view of one chunk of rows."""
+
+    def __init__(self, rows, today):
+        self.n = len(rows)
+        self.farm_ids = [r.get("farm_id") for r in rows]
+        self.crops = [r.get("crop") for r in rows]
+        self.weather = [r.get("weather") or r for r in rows]
+
+        # Rows without a sowing date assume the current season was sown at its start
+        default_sowing = {}
+        sowing = []
+        for row, crop in zip(rows, self.crops):
+            if row.get("sowing_date"):
+                sowing.append(str(row["sowing_date"])[:10])
+                continue
+            if crop not in default_sowing:
+                resolved = COMPILED_CALENDAR.resolve_stage(crop, None, today)
+                default_sowing[crop] = resolved["sowing_date"] if resolved else today.isoformat()
+            sowing.append(default_sowing[crop])
+        self.sowing = sowing
+        self.stages = COMPILED_CALENDAR.resolve_stages(self.crops, sowing, today)
+        self.stage = self.stages["stage"]
+
+
+def evaluate_chunk(rows, today=None):
+    """Advisories (or error lines for invalid rows) for one chunk of rows, in input order."""
+    today = today or datetime.now().date()
+    errors = [validate_row(row) for row in rows]
+    valid = [row for row, error in zip(rows, errors) if error is None]
+    advisories = iter(_evaluate_rows(valid, today) if valid else [])
+    return [
+        next(advisories) if error is None
+        else {"farm_id": row.get("farm_id") if isinstance(row, dict) else None, "error": error}
+        for row, error in zip(rows, errors)
+    ]
+
+
+def _evaluate_rows(rows, today):
+    """Advisories for validated rows, in input order."""
+    cols = _Columns(rows, today)
+    advice = get_advisory_rules().evaluate_columns(cols.crops, cols.stage, cols.weather)
+
+    results = []
+    for i in range(cols.n):
+        crop = cols.crops[i]
+        result = {"farm_id": cols.farm_ids[i]}
+        if crop not in CultivationAdvisor.CULTIVATION_CALENDAR:
+            result.update({"crop": crop, "status": "Unknown crop", "recommendation": "Check crop name."})
+        elif cols.stage[i] is None:
+            result.update({
+                "crop": crop,
+                "status": "Off-season",
+                "recommendation": "This is not the ideal season for cultivation. Plan for the next season."
+            })
+        else:
+            result.update({
+                "crop": crop,
+                "season": cols.stages["season"][i],
+                "current_stage": cols.stage[i],
+                "sowing_date": cols.sowing[i],
+                "days_in_stage": int(cols.stages["days_elapsed"][i]),
+                "days_remaining": int(cols.stages["days_remaining"][i]),
+                **advice[i]
+            })
+        results.append(result)
+    return results
+
+
+def evaluate_batch(rows, today=None, chunk_size=CHUNK_SIZE):
+    """
+    Generator of advisories for any iterable of rows:
+        {"farm_id", "crop", "sowing_date" (optional ISO date), "weather": {...}}
+    Weather keys may also sit on the row itself. Rows are consumed chunk by chunk.
+    """
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield from evaluate_chunk(chunk, today)
+            chunk = []
+    if chunk:
+        yield from evaluate_chunk(chunk, today)
+
+
+def iter_ndjson(lines):
+    """Parses an NDJSON stream (bytes or str lines), skipping blank lines; bad lines become InvalidRow."""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield InvalidRow(f"line {number} is not valid JSON")
+
+
+def to_ndjson(results):
+    """Serializes advisories as NDJSON lines."""
+    for result in results:
+        yield json.dumps(result) + "\n"
@@ -0,0 +1,283 @@
+"""
+Advisory Rule Engine
+Loads the declarative cultivation and disease advisory rules from data/advisory_rules.json
+and compiles them into a decision table keyed by (crop, stage):
+- the rules that can apply to a (crop, stage) are selected once
+- each weather variable's rule boundaries become a sorted breakpoint array, splitting its
+  axis into elementary intervals (open gaps and the breakpoints themselves)
+- every combination of intervals maps to a precomputed plan of advice lines
+
+Evaluating a farm is then one bisect per weather variable plus a table lookup; only
+lines quoting the weather ({temp}, {humidity}, ...) are formatted per farm.
+evaluate_columns() does the same for many farms with np.searchsorted. Tables are built
+lazily per (crop, stage), so new crops, stages or advice lines are added in the JSON
+file without code changes. Disease advisories are a (disease, risk level) table.
+"""
+
+import bisect
+import itertools
+import json
+import logging
+import threading
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ADVISORY_RULES_FILE = Path(__file__).parent / "data" / "advisory_rules.json"
+
+# Kinds of precomputed section output in a plan
+FIXED, FIXED_LIST, TEMPLATE, TEMPLATE_LIST = range(4)
+
+
+class _KeyTable:
+    """Interval breakpoints and advice plans for one (crop, stage)."""
+
+    def __init__(self, variables, points, plans):
+        self.variables = variables                  # indices of variables with breakpoints
+        self.points = points                        # sorted breakpoint lists, one per variable
+        self.point_arrays = [np.asarray(p, dtype=np.float64) for p in points]
+        self.sizes = [2 * len(p) + 1 for p in points]
+        # Row-major strides into the flat plan list
+        self.strides = [int(np.prod(self.sizes[k + 1:])) for k in range(len(points))]
+        self.plans = plans
+
+
+def _interval(points, x):
+    """Elementary interval of x: 2k for the gap below points[k], 2k+1 for points[k] itself."""
+    k = bisect.bisect_left(points, x)
+    return 2 * k + (k < len(points) and points[k] == x)
+
+
+def _representative(points, region):
+    """A value lying inside elementary interval `region`."""
+    k, on_point = divmod(region, 2)
+    if on_point:
+        return points[k]
+    if k == 0:
+        return points[0] - 1.0
+    if k == len(points):
+        return points[-1] + 1.0
+    return (points[k - 1] + points[k]) / 2
+
+
+class AdvisoryRules:
+    """Compiled decision table over crop, stage and weather intervals."""
+
+    def __init__(self, spec):
+        self.variables = tuple(spec["variables"])
+        self.weather_keys = tuple(spec["variables"][v]["key"] for v in self.variables)
+        self.defaults = tuple(spec["variables"][v].get("default") for v in self.variables)
+        self.sections = tuple(spec["sections"])
+        self.section_options = spec["sections"]
+
+        rules = []
+        for rule in spec["rules"]:
+            rules.extend(self._expand(rule))
+        self.rules = rules
+        self.rule_section = tuple(self.sections.index(r["section"]) for r in rules)
+        self.texts = tuple(r["text"] for r in rules)
+        # Only templated rules pay for str.format; {temp} etc. become positional fields
+        self.templated = tuple("{" in text for text in self.texts)
+        positional = {v: f"{{{k}}}" for k, v in enumerate(self.variables)}
+        self.formats = tuple(text.format(**positional) if t else text for text, t in zip(self.texts, self.templated))
+
+        # Per rule: ((variable, lo, lo_inclusive, hi, hi_inclusive), ...) for constrained variables
+        self.checks = []
+        for rule in rules:
+            checks = []
+            for name, bounds in rule.get("when", {}).items():
+                checks.append((
+                    self.variables.index(name),
+                    float(bounds.get("gt", bounds.get("gte", -np.inf))), "gt" not in bounds,
+                    float(bounds.get("lt", bounds.get("lte", np.inf))), "lt" not in bounds
+                ))
+            self.checks.append(tuple(checks))
+
+        self._tables = {}  # (crop, stage) -> _KeyTable
+        self._tables_lock = threading.Lock()
+
+        diseases = spec.get("disease_advisories", {})
+        self.disease_default = diseases.get("default", "Monitor field regularly")
+        self.disease_table = {
+            (disease, level): text
+            for disease, levels in diseases.get("diseases", {}).items()
+            for level, text in levels.items()
+        }
+
+    @classmethod
+    def load(cls, path=ADVISORY_RULES_FILE):
+        with open(path, 'r', encoding='utf-8') as f:
+            spec = json.load(f)
+        engine = cls(spec)
+        logger.info(f"Loaded advisory rules: {len(engine.rules)} rules, {len(engine.disease_table)} disease advisories")
+        return engine
+
+    @staticmethod
+    def _expand(rule):
+        """A "by_stage" rule becomes one rule per stage plus a default for every other stage."""
+        if "by_stage" not in rule:
+            return [rule]
+        base = {k: v for k, v in rule.items() if k not in ("by_stage", "default", "text")}
+        expanded = [
+            {**base, "stages": [stage], "text": rule["text"].replace("{value}", value)}
+            for stage, value in rule["by_stage"].items()
+        ]
+        if "default" in rule:
+            expanded.append({
+                **base,
+                "except_stages": list(rule["by_stage"]),
+                "text": rule["text"].replace("{value}", rule["default"])
+            })
+        return expanded
+
+    # ---------- Decision table ----------
+
+    def candidates(self, crop, stage):
+        """Indices of the rules whose crop/stage filters admit (crop, stage), in file order."""
+        return tuple(
+            r for r, rule in enumerate(self.rules)
+            if ("crops" not in rule or crop in rule["crops"])
+            and ("stages" not in rule or stage in rule["stages"])
+            and stage not in rule.get("except_stages", ())
+        )
+
+    def _matches(self, r, raw):
+        for v, lo, lo_inclusive, hi, hi_inclusive in self.checks[r]:
+            x = raw[v]
+            if not ((x >= lo if lo_inclusive else x > lo) and (x <= hi if hi_inclusive else x < hi)):
+                return False
+        return True
+
+    def _compile(self, crop, stage):
+        """Builds the interval table for one (crop, stage)."""
+        candidates = self.candidates(crop, stage)
+        breakpoints = {}
+        for r in candidates:
+            for v, lo, _, hi, _ in self.checks[r]:
+                breakpoints.setdefault(v, set()).update(b for b in (lo, hi) if np.isfinite(b))
+        variables = sorted(breakpoints)
+        points = [sorted(breakpoints[v]) for v in variables]
+
+        plans = []
+        for regions in itertools.product(*(range(2 * len(p) + 1) for p in points)):
+            raw = [0.0] * len(self.variables)
+            for v, p, region in zip(variables, points, regions):
+                raw[v] = _representative(p, region)
+            matched = [r for r in candidates if self._matches(r, raw)]
+            plans.append(self._plan(matched))
+        return _KeyTable(variables, points, plans)
+
+    def _plan(self, matched):
+        """
+        Per section (name, kind, payload): a finished value (FIXED / FIXED_LIST), or for sections
+        quoting the weather a single format string (TEMPLATE, joined sections) or a list of them.
+        """
+        plan = []
+        for s, section in enumerate(self.sections):
+            rules = [r for r in matched if self.rule_section[r] == s]
+            options = self.section_options[section]
+            if not any(self.templated[r] for r in rules):
+                value = self._finish(section, [self.texts[r] for r in rules])
+                plan.append((section, FIXED_LIST if isinstance(value, list) else FIXED, value))
+                continue
+            # Literal lines are brace-escaped so the whole section is one format call
+            formats = [self.formats[r] if self.templated[r] else self.texts[r].replace("}", "}}") for r in rules]
+            if "join" in options:
+                plan.append((section, TEMPLATE, options["join"].join(formats)))
+            else:
+                plan.append((section, TEMPLATE_LIST, formats))
+        return tuple(plan)
+
+    def table(self, crop, stage):
+        """Compiled _KeyTable for (crop, stage), built on first use."""
+        key = (crop, stage)
+        table = self._tables.get(key)
+        if table is None:
+            table = self._compile(crop, stage)
+            with self._tables_lock:
+                table = self._tables.setdefault(key, table)
+        return table
+
+    def _finish(self, section, lines):
+        options = self.section_options[section]
+        if not lines and "empty" in options:
+            return options["empty"]
+        return options["join"].join(lines) if "join" in options else lines
+
+    @staticmethod
+    def _materialize(plan, raw):
+        result = {}
+        for section, kind, payload in plan:
+            if kind == FIXED:
+                result[section] = payload
+            elif kind == FIXED_LIST:
+                # Fresh list per farm so callers can't mutate the shared plan
+                result[section] = list(payload)
+            elif kind == TEMPLATE:
+                result[section] = payload.format(*raw)
+            else:
+                result[section] = [f.format(*raw) for f in payload]
+        return result
+
+    # ---------- Evaluation ----------
+
+    def evaluate(self, crop, stage, weather):
+        """All advisory sections for one farm: {section: list of lines (or joined text)}."""
+        raw = [weather.get(key, default) for key, default in zip(self.weather_keys, self.defaults)]
+        table = self.table(crop, stage)
+        index = 0
+        for v, points, stride in zip(table.variables, table.points, table.strides):
+            index += _interval(points, raw[v]) * stride
+        return self._materialize(table.plans[index], raw)
+
+    def evaluate_columns(self, crops, stages, weather_rows):
+        """
+        evaluate() for many farms at once: farms are grouped by (crop, stage) and their
+        interval indices found with np.searchsorted. Returns one evaluate()-style dict per farm.
+        """
+        n = len(crops)
+        columns = [
+            [w.get(key, default) for w in weather_rows]
+            for key, default in zip(self.weather_keys, self.defaults)
+        ]
+        raw = list(zip(*columns))
+        values = np.asarray(columns, dtype=np.float64).reshape(len(self.variables), n)
+
+        groups = {}
+        for i, key in enumerate(zip(crops, stages)):
+            groups.setdefault(key, []).append(i)
+
+        results = [None] * n
+        for key, rows in groups.items():
+            table = self.table(*key)
+            rows = np.asarray(rows)
+            index = np.zeros(len(rows), dtype=np.int64)
+            for v, points, stride in zip(table.variables, table.point_arrays, table.strides):
+                x = values[v, rows]
+                k = np.searchsorted(points, x, side="left")
+                on_point = points[np.minimum(k, len(points) - 1)] == x
+                index += (2 * k + (on_point & (k < len(points)))) * stride
+            for i, p in zip(rows.tolist(), index.tolist()):
+                results[i] = self._materialize(table.plans[p], raw[i])
+        return results
+
+    def disease_advisory(self, disease_name, risk_level, temp, humidity):
+        """Advisory text for a disease at a risk level."""
+        template = self.disease_table.get((disease_name, risk_level), self.disease_default)
+        return template.format(temp=temp, humidity=humidity)
+
+
+_rules = None
+_rules_lock = threading.Lock()
+
+
+def get_advisory_rules():
+    """Process-wide AdvisoryRules (compiled once)."""
+    global _rules
+    if _rules is None:
+        with _rules_lock:
+            if _rules is None:
+                _rules = AdvisoryRules.load()
+    return _rules
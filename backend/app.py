@@ -1,13 +1,22 @@
 import os
 import json
 import logging
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, abort, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
 import google.generativeai as genai
 from dotenv import load_dotenv
-from msp_fetcher import MSPFetcher, get_msp_for_crop
+from msp_fetcher import MSPFetcher, get_msp_for_crop, fetch_all_msp
+from price_analytics import get_market_kpis
+from price_alerts import PriceAlertEngine, get_alert_engine, DEFAULT_MOVE_PERCENT
+from price_store import get_price_store
 from weather_disease_risk import WeatherDiseaseRiskCalculator, get_crop_disease_risks
+from risk_engine import get_all_crop_disease_risks
+from weather_providers import get_current_weather
+from risk_forecast import get_disease_risk_forecast
+from district_grid import get_district_grid
 from cultivation_advisor import CultivationAdvisor, get_cultivation_advisory
+from advisory_batch import evaluate_batch, iter_ndjson, to_ndjson
+from settings_store import SettingsStore, DEFAULT_USER
 from pathlib import Path
 
 # ---------------- Setup ----------------
@@ -31,9 +40,16 @@ DEFAULT_SETTINGS = {
     "region": "Karnataka",
     "unit_preference": "metric",
     "crop_favorites": [],
+    "price_alert_rules": [],
     "last_updated": None
 }
 
+# Registry crop IDs (as used by /api/crops and crop_favorites)
+CROP_NAMES_BY_ID = {
+    1: "Paddy", 2: "Ragi", 3: "Coffee", 4: "Sugarcane", 5: "Tomato", 6: "Potato",
+    7: "Maize", 8: "Capsicum", 9: "Soybean", 10: "Grape", 11: "Orange", 12: "Apple"
+}
+
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
@@ -56,25 +72,62 @@ TEXT_MODEL_NAME = "models/gemini-2.5-flash-lite"
 TTS_MODEL_NAME = "models/gemini-2.5-flash-preview-tts"  # Specialized for text-to-speech
 
 # ============== Settings Management Functions ==============
-def load_settings():
-    """Load user settings from file, return defaults if not found"""
-    try:
-        if SETTINGS_FILE.exists():
-            with open(SETTINGS_FILE, 'r') as f:
-                return {**DEFAULT_SETTINGS, **json.load(f)}
-    except Exception as e:
-        logger.error(f"Error loading settings: {str(e)}")
-    return DEFAULT_SETTINGS.copy()
+# Reads are served from memory; writes are flushed to disk in debounced batches
+settings_store = SettingsStore(SETTINGS_DIR, DEFAULT_SETTINGS)
+
+# Price alerts: rules follow settings changes; ticks come from the price store and completed MSP fetches
+alert_engine = get_alert_engine()
+settings_store.add_listener(
+    lambda user_id, settings: alert_engine.set_user_rules(
+        user_id, PriceAlertEngine.rules_from_settings(settings, CROP_NAMES_BY_ID)
+    )
+)
+for _user_id in settings_store.user_ids():
+    alert_engine.set_user_rules(
+        _user_id, PriceAlertEngine.rules_from_settings(settings_store.get(_user_id), CROP_NAMES_BY_ID)
+    )
+get_price_store().add_listener(alert_engine.on_rows)
+# Quotes are evaluated once per completed MSP fetch, not on every (cached) page view
+MSPFetcher.add_quote_listener(alert_engine.on_quotes)
 
-def save_settings(settings):
-    """Save user settings to file"""
+def get_request_user_id():
+    """
+    Identify the settings owner from the X-User-Id header or ?user_id= query param.
+    Aborts with 400 for an invalid id, so call it before a handler's try/except Exception.
+    """
+    user_id = request.headers.get("X-User-Id") or request.args.get("user_id") or DEFAULT_USER
+    if not SettingsStore.is_valid_user_id(user_id):
+        abort(400, description="Invalid user id")
+    return user_id
+
+def load_settings(user_id=DEFAULT_USER):
+    """Load user settings from the in-memory store, return defaults if not found"""
+    return settings_store.get(user_id)
+
+def validate_alert_rules(rules):
+    """Keeps well-formed price alert rules: {"crop", "type": above|below|move, "price"|"percent", ["market"]}"""
+    valid = []
+    for rule in rules if isinstance(rules, list) else []:
+        if not isinstance(rule, dict) or rule.get("crop") not in CROP_NAMES_BY_ID.values():
+            continue
+        try:
+            if rule.get("type") in ("above", "below"):
+                clean = {"crop": rule["crop"], "type": rule["type"], "price": float(rule["price"])}
+            elif rule.get("type") == "move":
+                clean = {"crop": rule["crop"], "type": "move", "percent": abs(float(rule.get("percent", DEFAULT_MOVE_PERCENT)))}
+            else:
+                continue
+        except (KeyError, TypeError, ValueError):
+            continue
+        if rule.get("market"):
+            clean["market"] = str(rule["market"])
+        valid.append(clean)
+    return valid
+
+def save_settings(settings, user_id=DEFAULT_USER):
+    """Save user settings (persisted to file by the store's write-behind flush)"""
     try:
-        # Remove timestamp before saving (will be regenerated on load)
-        settings_to_save = {k: v for k, v in settings.items() if k != 'last_updated'}
-        with open(SETTINGS_FILE, 'w') as f:
-            json.dump(settings_to_save, f, indent=2)
-        logger.info(f"Settings saved successfully")
-        return True
+        return settings_store.put(settings, user_id)
     except Exception as e:
         logger.error(f"Error saving settings: {str(e)}")
         return False
@@ -183,44 +236,46 @@ def market_data():
     data = request.json or {}
     crop = data.get("crop", "Paddy")
     region = data.get("region", "Karnataka")
+    market = data.get("market")  # APMC mandi name; None averages all markets
     
     # Fetch live MSP data
     msp_data = get_msp_for_crop(crop)
     if not msp_data:
         return jsonify({"error": f"MSP data not available for {crop}"}), 400
     
-    # Get price history for trend visualization
-    price_history = MSPFetcher.get_price_history(crop, days=180)
+    # Get price history for trend visualization (weekly points from the price store)
+    price_history = MSPFetcher.get_price_history(crop, days=180, market=market)
     
     # Calculate supply and demand indicators based on seasonal factors
     current_month = datetime.now().month
     supply_index = MSPFetcher._get_seasonal_multiplier(crop, current_month) * 100
     
-    # Trend analysis
-    if len(price_history) >= 2:
-        latest_price = price_history[-1]["price"]
-        previous_price = price_history[-5]["price"] if len(price_history) > 5 else price_history[0]["price"]
-        trend_change = ((latest_price - previous_price) / previous_price) * 100
-        
-        if trend_change > 2:
-            trend = "Bullish"
-        elif trend_change < -2:
-            trend = "Bearish"
-        else:
-            trend = "Stable"
-    else:
-        trend = "Stable"
-        trend_change = 0
-    
-    # Forecast (simple extrapolation)
-    forecast_percent = trend_change * 2.5  # Amplify trend for forecast
+    # Trend, volatility and forecast KPIs from the stored series (cached per data version)
+    analytics = get_market_kpis([crop], market=market).get(crop, {})
+    trend = analytics.get("trend", "Stable")
+    trend_change = analytics.get("change_percent", 0)
+    forecast_percent = analytics.get("forecast_percent", 0)
+    kpis = {
+        "msp": msp_data["msp"],
+        "mandi_price": msp_data.get("mandi_price"),
+        "supply_index": round(min(100, supply_index), 1),
+        "trend": trend,
+        "trend_percent": f"{trend_change:+.1f}%",
+        "forecast_percent": f"{forecast_percent:+.1f}%",
+        "rolling_mean": analytics.get("rolling_mean"),
+        "volatility_percent": analytics.get("volatility_percent"),
+        "seasonal_trend_percent_per_week": analytics.get("seasonal_trend_percent_per_week"),
+        "forecast_price": analytics.get("forecast_price"),
+        "forecast_horizon_weeks": analytics.get("forecast_horizon_weeks")
+    }
     
     prompt = f"""
     You are an agricultural market analyst. Provide a brief market analysis for {crop} in {region}.
     Focus on Karnataka APMC mandis (Hubli, Davanagere, Belagavi, Bangalore).
     
     Current MSP: {msp_data['msp']}
-    Current trend: {trend} ({trend_change:+.1f}% change)
+    Current trend: {trend} ({trend_change:+.1f}% change over 4 weeks)
+    Price volatility: {kpis['volatility_percent']}% weekly; 4-week forecast: {forecast_percent:+.1f}%
     
     Provide a concise 3-4 sentence analysis covering:
     1. Current market sentiment
@@ -258,13 +313,7 @@ def market_data():
             "crop": crop,
             "region": region,
             "msp_data": msp_data,
-            "kpis": {
-                "msp": msp_data["msp"],
-                "supply_index": round(min(100, supply_index), 1),
-                "trend": trend,
-                "trend_percent": f"{trend_change:+.1f}%",
-                "forecast_percent": f"{forecast_percent:+.1f}%"
-            },
+            "kpis": kpis,
             "price_history": price_history,
             "timestamp": datetime.now().isoformat(),
             "live_updated": True
@@ -279,19 +328,30 @@ def market_data():
             "crop": crop,
             "region": region,
             "msp_data": msp_data,
-            "kpis": {
-                "msp": msp_data["msp"],
-                "supply_index": 85,
-                "trend": "Stable",
-                "trend_percent": "0%",
-                "forecast_percent": "0%"
-            },
+            "kpis": kpis,
             "price_history": price_history if price_history else [],
             "timestamp": datetime.now().isoformat(),
             "note": "Using cached MSP data due to API error"
         }), 200
 
 
+@app.route("/api/market-data/analytics", methods=["GET"])
+def market_analytics():
+    """Batched price KPIs for many crops: ?crops=Paddy,Tomato&market=...&horizon_weeks=4"""
+    crops = [c.strip() for c in request.args.get("crops", "").split(",") if c.strip()]
+    crops = crops or list(MSPFetcher.CROP_MAPPING.keys())
+    market = request.args.get("market")
+    horizon_weeks = min(12, max(1, request.args.get("horizon_weeks", 4, type=int)))
+    
+    for crop in crops:
+        MSPFetcher.ensure_price_history(crop)
+    return jsonify({
+        "market": market,
+        "analytics": get_market_kpis(crops, market=market, horizon_weeks=horizon_weeks),
+        "timestamp": datetime.now().isoformat()
+    })
+
+
 # ---------------- Route 3: Chat ----------------
 @app.route("/api/chat", methods=["POST"])
 def chat():
@@ -351,8 +411,12 @@ def text_to_speech():
 def get_crops():
     """Returns the complete crop registry for Karnataka with REAL-TIME data"""
     
-    # Get current weather and season
-    weather = WeatherDiseaseRiskCalculator.get_simulated_weather()
+    # Region: ?region=<district or cluster>, else the user's crop cluster setting
+    region = request.args.get("region") or load_settings(get_request_user_id()).get("crop_cluster")
+    regional = get_district_grid().lookup(region)
+    
+    # Get current weather (precomputed per district/cluster, else cached per time bucket) and season
+    weather = regional["weather"] if regional else get_current_weather()
     current_month = datetime.now().month
     is_monsoon = current_month in [6, 7, 8, 9]
     is_summer = current_month in [3, 4, 5]
@@ -565,20 +629,40 @@ def get_crops():
         }
     ]
     
+    # Regional risks come precomputed from the district grid; otherwise score every crop in one vectorized pass
+    all_disease_risks = regional["diseases"] if regional else get_all_crop_disease_risks(weather)
+    
+    # Multi-day risk curves for every disease (7-14 days, precomputed per district/cluster by the grid)
+    forecast_days = min(14, max(7, request.args.get("forecast_days", 7, type=int)))
+    forecast_region = weather.get("region", "Karnataka")
+    risk_forecast = get_district_grid().forecast(forecast_region, forecast_days)
+    if risk_forecast is None:
+        risk_forecast = get_disease_risk_forecast(region=forecast_region, days=forecast_days)
+    
+    # LIVE MSP for the whole registry in one concurrent pass
+    all_msp = fetch_all_msp([crop["name"] for crop in crops])
+    
     # Enrich each crop with LIVE DATA
     for crop in crops:
         crop_name = crop["name"]
         
         # 1. LIVE MSP Data
-        msp_data = get_msp_for_crop(crop_name)
+        msp_data = all_msp.get(crop_name)
         if msp_data:
             crop["msp"] = msp_data["msp"]
             crop["msp_source"] = msp_data.get("source", "Live Government API")
             crop["msp_updated"] = msp_data.get("date")
+            if msp_data.get("mandi_price"):
+                crop["mandi_price"] = msp_data["mandi_price"]
         
         # 2. REAL-TIME Disease Risk Calculation
-        disease_risks = get_crop_disease_risks(crop_name)
-        crop["diseases"] = disease_risks["diseases"]
+        crop["diseases"] = all_disease_risks.get(crop_name, [])
+        for disease in crop["diseases"]:
+            disease_forecast = risk_forecast.get(disease["name"])
+            if disease_forecast:
+                disease["peak_day"] = disease_forecast["peak_day"]
+                disease["peak_risk_level"] = disease_forecast["peak_risk_level"]
+                disease["risk_trajectory"] = disease_forecast["risk_trajectory"]
         crop["weather_context"] = weather
         
         # 3. REAL-TIME Cultivation Advisory
@@ -596,6 +680,7 @@ def get_crops():
         "crops": crops,
         "season": "Monsoon" if is_monsoon else "Summer" if is_summer else "Winter",
         "weather": weather,
+        "region": weather.get("region"),
         "timestamp": datetime.now().isoformat(),
         "data_integration": "LIVE - MSP, Weather, Disease Risk, Cultivation Stage"
     })
@@ -612,8 +697,8 @@ def get_crop_detail(crop_id):
     if not crop:
         return jsonify({"error": "Crop not found"}), 404
     
-    # Get comprehensive real-time advisory for this specific crop
-    weather = WeatherDiseaseRiskCalculator.get_simulated_weather()
+    # Get comprehensive real-time advisory for this specific crop (same regional weather as the registry)
+    weather = crop.get("weather_context") or get_current_weather()
     
     # Add detailed cultivation advisory
     cultivation_advisory = CultivationAdvisor.get_weather_based_recommendations(
@@ -628,13 +713,48 @@ def get_crop_detail(crop_id):
     return jsonify(crop)
 
 
+@app.route("/api/advisory/batch", methods=["POST"])
+def advisory_batch():
+    """
+    Cultivation advisories for many farms, streamed back as NDJSON (one line per input row).
+    Body: {"rows": [{"farm_id", "crop", "sowing_date", "weather" | "region"}, ...]}
+    or an NDJSON stream of rows (Content-Type: application/x-ndjson).
+    Rows without weather use the district/cluster grid for their "region".
+    Invalid rows come back as {"farm_id", "error"} lines.
+    """
+    if request.mimetype == "application/x-ndjson":
+        rows = iter_ndjson(request.stream)
+    else:
+        data = request.get_json(silent=True) or {}
+        rows = data.get("rows")
+        if not isinstance(rows, list):
+            return jsonify({"error": "rows must be a list"}), 400
+    
+    grid = get_district_grid()
+    
+    def with_weather(rows):
+        # Invalid rows pass through untouched and come back as error lines; callers' rows are not modified
+        for row in rows:
+            if isinstance(row, dict) and not row.get("weather") and "temperature_celsius" not in row:
+                region = row.get("region")
+                regional = grid.lookup(region) if region is None or isinstance(region, str) else None
+                row = {**row, "weather": regional["weather"] if regional else get_current_weather()}
+            yield row
+    
+    return Response(
+        stream_with_context(to_ndjson(evaluate_batch(with_weather(rows)))),
+        mimetype="application/x-ndjson"
+    )
+
+
 # ============== Settings Endpoints ==============
 
 @app.route("/api/settings", methods=["GET"])
 def get_settings():
     """Retrieve current user settings"""
+    user_id = get_request_user_id()
     try:
-        settings = load_settings()
+        settings = load_settings(user_id)
         settings["last_updated"] = datetime.now().isoformat()
         return jsonify({
             "success": True,
@@ -649,9 +769,10 @@ def get_settings():
 @app.route("/api/settings", methods=["POST"])
 def update_settings():
     """Update user settings (partial or complete update)"""
+    user_id = get_request_user_id()
     try:
         # Get current settings
-        current_settings = load_settings()
+        current_settings = load_settings(user_id)
         
         # Get new settings from request
         new_settings = request.json or {}
@@ -668,7 +789,8 @@ def update_settings():
             "theme": new_settings.get("theme", current_settings.get("theme", "light")),
             "region": new_settings.get("region", current_settings.get("region", "Karnataka")),
             "unit_preference": new_settings.get("unit_preference", current_settings.get("unit_preference", "metric")),
-            "crop_favorites": new_settings.get("crop_favorites", current_settings.get("crop_favorites", []))
+            "crop_favorites": new_settings.get("crop_favorites", current_settings.get("crop_favorites", [])),
+            "price_alert_rules": new_settings.get("price_alert_rules", current_settings.get("price_alert_rules", []))
         }
         
         # Validate types
@@ -678,6 +800,7 @@ def update_settings():
             validated_settings["price_alerts"] = True
         if not isinstance(validated_settings.get("crop_favorites"), list):
             validated_settings["crop_favorites"] = []
+        validated_settings["price_alert_rules"] = validate_alert_rules(validated_settings.get("price_alert_rules"))
         
         # Validate language code
         valid_languages = ["EN", "KN", "TE", "TA", "HI"]
@@ -690,7 +813,7 @@ def update_settings():
             validated_settings["crop_cluster"] = "All Karnataka"
         
         # Save settings
-        success = save_settings(validated_settings)
+        success = save_settings(validated_settings, user_id)
         
         if success:
             validated_settings["last_updated"] = datetime.now().isoformat()
@@ -711,6 +834,7 @@ def update_settings():
 @app.route("/api/settings/language", methods=["POST"])
 def update_language():
     """Update language setting specifically"""
+    user_id = get_request_user_id()
     try:
         data = request.json or {}
         language = data.get("language", "EN")
@@ -720,10 +844,10 @@ def update_language():
         if language not in valid_languages:
             return jsonify({"success": False, "error": f"Invalid language. Must be one of: {valid_languages}"}), 400
         
-        settings = load_settings()
+        settings = load_settings(user_id)
         settings["language"] = language
         
-        if save_settings(settings):
+        if save_settings(settings, user_id):
             return jsonify({
                 "success": True,
                 "message": f"Language updated to {language}",
@@ -741,6 +865,7 @@ def update_language():
 @app.route("/api/settings/region", methods=["POST"])
 def update_region():
     """Update crop cluster/region setting"""
+    user_id = get_request_user_id()
     try:
         data = request.json or {}
         crop_cluster = data.get("crop_cluster", "All Karnataka")
@@ -750,10 +875,10 @@ def update_region():
         if crop_cluster not in valid_clusters:
             return jsonify({"success": False, "error": f"Invalid region. Must be one of: {valid_clusters}"}), 400
         
-        settings = load_settings()
+        settings = load_settings(user_id)
         settings["crop_cluster"] = crop_cluster
         
-        if save_settings(settings):
+        if save_settings(settings, user_id):
             return jsonify({
                 "success": True,
                 "message": f"Region updated to {crop_cluster}",
@@ -771,16 +896,17 @@ def update_region():
 @app.route("/api/settings/notifications", methods=["POST"])
 def update_notifications():
     """Update notification settings"""
+    user_id = get_request_user_id()
     try:
         data = request.json or {}
         notifications = data.get("notifications", True)
         price_alerts = data.get("price_alerts", True)
         
-        settings = load_settings()
+        settings = load_settings(user_id)
         settings["notifications"] = bool(notifications)
         settings["price_alerts"] = bool(price_alerts)
         
-        if save_settings(settings):
+        if save_settings(settings, user_id):
             return jsonify({
                 "success": True,
                 "message": "Notification settings updated",
@@ -799,6 +925,7 @@ def update_notifications():
 @app.route("/api/settings/favorites", methods=["POST"])
 def update_favorites():
     """Add or remove crop from favorites"""
+    user_id = get_request_user_id()
     try:
         data = request.json or {}
         crop_id = data.get("crop_id")
@@ -807,7 +934,7 @@ def update_favorites():
         if crop_id is None:
             return jsonify({"success": False, "error": "crop_id is required"}), 400
         
-        settings = load_settings()
+        settings = load_settings(user_id)
         favorites = settings.get("crop_favorites", [])
         
         if action == "add":
@@ -821,7 +948,7 @@ def update_favorites():
         
         settings["crop_favorites"] = favorites
         
-        if save_settings(settings):
+        if save_settings(settings, user_id):
             return jsonify({
                 "success": True,
                 "message": f"Favorite {action}ed successfully",
@@ -837,13 +964,27 @@ def update_favorites():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@app.route("/api/alerts", methods=["GET"])
+def get_price_alerts():
+    """Recent price alerts for the requesting user"""
+    user_id = get_request_user_id()
+    settings = load_settings(user_id)
+    return jsonify({
+        "price_alerts": settings.get("price_alerts", True),
+        "rules": PriceAlertEngine.rules_from_settings(settings, CROP_NAMES_BY_ID),
+        "alerts": alert_engine.recent_alerts(user_id),
+        "timestamp": datetime.now().isoformat()
+    })
+
+
 @app.route("/api/settings/reset", methods=["POST"])
 def reset_settings():
     """Reset all settings to default values"""
+    user_id = get_request_user_id()
     try:
         default_settings = DEFAULT_SETTINGS.copy()
         
-        if save_settings(default_settings):
+        if save_settings(default_settings, user_id):
             default_settings["last_updated"] = datetime.now().isoformat()
             return jsonify({
                 "success": True,
@@ -861,6 +1002,13 @@ def reset_settings():
 
 # ============== Cultivation Manager & Knowledge Core Routes ==============
 from cultivation_manager import CultivationManager
+from disease_learning_queue import DiseaseLearningQueue
+
+# Unknown diseases are learned in the background (deduplicated, rate-limited)
+learning_queue = DiseaseLearningQueue(
+    generate_fn=CultivationManager.generate_disease_protocol,
+    persist_fn=CultivationManager.add_learned_disease
+)
 
 @app.route("/api/cultivation/start", methods=["POST"])
 def start_cultivation():
@@ -890,9 +1038,11 @@ def update_cultivation_phase():
 @app.route("/api/cultivation/dashboard", methods=["GET"])
 def get_cultivation_dashboard():
     """Get rich dashboard data: User Status + Phase Procedures + AI Alerts"""
+    user_id = get_request_user_id()
     try:
-        data = CultivationManager.get_dashboard_data()
-        return jsonify(data)
+        # Pre-serialized (crop, phase) fragment + user state, assembled as a string
+        region = request.args.get("region") or load_settings(user_id).get("crop_cluster")
+        return app.response_class(CultivationManager.get_dashboard_json(region), mimetype="application/json")
     except Exception as e:
         logger.error(f"Dashboard Error: {e}")
         return jsonify({"error": str(e)}), 500
@@ -944,7 +1094,8 @@ def detect_and_log_disease():
             )
             
             # 3. Retrieve Cure from Knowledge Base (or Learn it)
-            knowledge = CultivationManager.get_static_knowledge()
+            current_crop = CultivationManager.get_user_state().get("current_crop") or "Paddy"
+            knowledge = CultivationManager.get_static_knowledge(current_crop) or {}
             protocols = knowledge.get("disease_protocols", {})
             
             # Fuzzy find protocol
@@ -957,18 +1108,26 @@ def detect_and_log_disease():
                     matched_protocol = pdata
                     break
             
-            # 2. If Unknown, Learn it via Gemini
-            is_newly_learned = False
+            # 2. If Unknown, queue it for learning via Gemini (does not block this request)
+            learning = None
             if not matched_protocol and detected_name != "unknown":
-                logger.info(f"Disease '{detected_name}' not in DB. Initiating learning sequence...")
-                matched_protocol = CultivationManager.generate_and_learn_new_disease(analysis_result.get("disease_name"))
-                is_newly_learned = True
+                logger.info(f"Disease '{detected_name}' not in DB. Queueing learning sequence...")
+                learning = learning_queue.submit(analysis_result.get("disease_name"), current_crop)
+                if learning["status"] == DiseaseLearningQueue.LEARNED:
+                    matched_protocol = learning["protocol"]
+
+            learning_status = learning["status"] if learning else None
+            if learning_status == DiseaseLearningQueue.PENDING:
+                message = "Disease logged. Learning its protocol in the background."
+            else:
+                message = "Disease logged."
 
             response = {
                 "analysis": analysis_result,
                 "protocol_match": matched_protocol,
-                "newly_learned": is_newly_learned,
-                "message": "Disease logged" + (" and added to knowledge base." if is_newly_learned else ".")
+                "newly_learned": learning_status == DiseaseLearningQueue.LEARNED,
+                "learning_status": learning_status,
+                "message": message
             }
             return jsonify(response)
             
@@ -979,6 +1138,26 @@ def detect_and_log_disease():
     return jsonify({"error": "Analysis failed"}), 500
 
 
+@app.route("/api/cultivation/learning/<disease_name>", methods=["GET"])
+def get_learning_status(disease_name):
+    """Poll the background learning status for a newly detected disease"""
+    crop_name = request.args.get("crop_name") or CultivationManager.get_user_state().get("current_crop") or "Paddy"
+    status = learning_queue.get_status(disease_name, crop_name)
+    if not status:
+        return jsonify({"error": f"No learning request for {disease_name}"}), 404
+    return jsonify(status)
+
+
+@app.route("/api/regions", methods=["GET"])
+def get_regions():
+    """Districts and crop clusters available in the precomputed weather/risk grid"""
+    grid = get_district_grid()
+    return jsonify({"regions": grid.regions(), "refreshed_at": grid.refreshed_at()})
+
+
 # ============== Run ================
 if __name__ == "__main__":
+    # Reloader parent only watches files; refresh the grid in the serving process
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        get_district_grid().start_scheduler(int(os.getenv("DISTRICT_GRID_REFRESH_SECONDS", "3600")))
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,180 @@
+"""
+Compiled Cultivation Calendar
+Turns the crop calendars and stage timelines into lookup tables once:
+- a month -> season table per crop
+- per-(crop, season) cumulative stage-end arrays
+
+Stage resolution for a sowing date is then a bisect, and resolve_stages() handles
+many farms at once with np.searchsorted.
+"""
+
+import bisect
+import logging
+from datetime import date, datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+OFF_SEASON = -1
+# Group keys pack (crop row, season index) as crop_row * SEASON_SLOTS + season
+SEASON_SLOTS = 16
+
+
+class _SeasonTimeline:
+    """Stage names and cumulative end days (1-based, inclusive) for one (crop, season)."""
+
+    def __init__(self, season, months, stages):
+        self.season = season
+        self.months = tuple(months)
+        self.start_month = months[0]
+        self.stage_names = tuple(name for name, _ in stages)
+        self.durations = np.array([days for _, days in stages], dtype=np.int64)
+        self.ends = np.cumsum(self.durations)
+        self.ends_list = self.ends.tolist()
+        self.total_days = int(self.ends[-1]) if len(self.ends) else 0
+
+    def season_start(self, today):
+        """Most recent start of this season on or before today (1st of its first month)."""
+        year = today.year if today.month >= self.start_month else today.year - 1
+        return date(year, self.start_month, 1)
+
+
+class CompiledCalendar:
+    """Month->season tables and cumulative stage arrays for every crop."""
+
+    def __init__(self, calendar, stage_timeline):
+        self.crops = tuple(calendar)
+        self.crop_index = {crop: i for i, crop in enumerate(self.crops)}
+        self.seasons = {}          # crop -> tuple of season names (calendar order)
+        self.timelines = {}        # (crop, season) -> _SeasonTimeline
+        # (crops, 13): season index active in each month (column 0 unused), OFF_SEASON if none
+        self.month_season = np.full((len(self.crops), 13), OFF_SEASON, dtype=np.int64)
+
+        for i, crop in enumerate(self.crops):
+            seasons = calendar[crop].get("seasons", {})
+            self.seasons[crop] = tuple(seasons)
+            for s, (season, details) in enumerate(seasons.items()):
+                for month in details.get("months", []):
+                    # First season listing a month wins, like the original scan
+                    if self.month_season[i, month] == OFF_SEASON:
+                        self.month_season[i, month] = s
+                stages = stage_timeline.get(crop, {}).get(season, [])
+                self.timelines[(crop, season)] = _SeasonTimeline(season, details.get("months", [1]), stages)
+
+    def active_season(self, crop, month):
+        """Season name active for a crop in a month, or None (off-season / unknown crop)."""
+        i = self.crop_index.get(crop)
+        if i is None:
+            return None
+        s = self.month_season[i, month]
+        return None if s == OFF_SEASON else self.seasons[crop][s]
+
+    def timeline(self, crop, season):
+        return self.timelines.get((crop, season))
+
+    @staticmethod
+    def _stage_at(timeline, day):
+        """Stage for a 1-based day of season via bisect on the cumulative ends."""
+        if not timeline or not timeline.total_days:
+            return {"name": "Unknown", "days_elapsed": 0, "days_remaining": 0}
+        if day > timeline.total_days:
+            return {"name": "Maturity", "days_elapsed": timeline.total_days, "days_remaining": 0}
+        day = max(day, 1)
+        k = bisect.bisect_left(timeline.ends_list, day)
+        start = timeline.ends_list[k - 1] if k else 0
+        return {
+            "name": timeline.stage_names[k],
+            "days_elapsed": day - start,
+            "days_remaining": timeline.ends_list[k] - day
+        }
+
+    def resolve_stage(self, crop, sowing_date=None, today=None):
+        """
+        Season and growth stage for one farm.
+        Without a sowing date the season is taken from today's month and assumed to have
+        been sown at its start. Returns None when the crop is off-season.
+        """
+        today = _as_date(today) or datetime.now().date()
+        sowing_date = _as_date(sowing_date)
+        season = self.active_season(crop, (sowing_date or today).month)
+        if season is None:
+            return None
+        timeline = self.timeline(crop, season)
+        if sowing_date is None:
+            sowing_date = timeline.season_start(today)
+        day = (today - sowing_date).days + 1
+        stage = self._stage_at(timeline, day)
+        return {"season": season, "sowing_date": sowing_date.isoformat(), "day_of_season": day, **stage}
+
+    def resolve_stages(self, crops, sowing_dates, today=None):
+        """
+        Vectorized resolve_stage for many farms.
+
+        crops: sequence of crop names; sowing_dates: sequence of dates / ISO strings.
+        Returns arrays: "season" and "stage" (object, None when off-season),
+        "day_of_season", "days_elapsed", "days_remaining" (int64).
+        """
+        today = np.datetime64(_as_date(today) or datetime.now().date(), "D")
+        # ISO strings and date objects both convert without a Python loop
+        sowing = np.asarray(sowing_dates, dtype="datetime64[D]")
+        n = len(sowing)
+
+        months = (sowing.astype("datetime64[M]").astype(np.int64) % 12) + 1
+        days = (today - sowing).astype(np.int64) + 1
+
+        season_out = np.full(n, None, dtype=object)
+        stage_out = np.full(n, None, dtype=object)
+        elapsed = np.zeros(n, dtype=np.int64)
+        remaining = np.zeros(n, dtype=np.int64)
+
+        unique_crops, inverse = np.unique(np.asarray(crops, dtype=str), return_inverse=True)
+        crop_rows = np.array([self.crop_index.get(c, -1) for c in unique_crops], dtype=np.int64)[inverse]
+        known = crop_rows >= 0
+        season_idx = np.full(n, OFF_SEASON, dtype=np.int64)
+        season_idx[known] = self.month_season[crop_rows[known], months[known]]
+
+        # Group rows by (crop, season) with one sort, then one searchsorted per group
+        group_key = np.where(season_idx >= 0, crop_rows * SEASON_SLOTS + season_idx, -1)
+        order = np.argsort(group_key, kind="stable")
+        keys, starts_at = np.unique(group_key[order], return_index=True)
+        bounds = np.append(starts_at, n)
+        for g, key in enumerate(keys.tolist()):
+            if key < 0:
+                continue
+            crop = self.crops[key // SEASON_SLOTS]
+            season = self.seasons[crop][key % SEASON_SLOTS]
+            timeline = self.timelines[(crop, season)]
+            rows = order[bounds[g]:bounds[g + 1]]
+            season_out[rows] = season
+            if not timeline.total_days:
+                stage_out[rows] = "Unknown"
+                continue
+
+            d = np.maximum(days[rows], 1)
+            k = np.searchsorted(timeline.ends, d, side="left")
+            past_end = k >= len(timeline.ends)
+            k_safe = np.minimum(k, len(timeline.ends) - 1)
+            starts = np.where(k_safe > 0, timeline.ends[k_safe - 1], 0)
+
+            names = np.array(timeline.stage_names, dtype=object)[k_safe]
+            names[past_end] = "Maturity"
+            stage_out[rows] = names
+            elapsed[rows] = np.where(past_end, timeline.total_days, d - starts)
+            remaining[rows] = np.where(past_end, 0, timeline.ends[k_safe] - d)
+
+        return {
+            "season": season_out,
+            "stage": stage_out,
+            "day_of_season": days,
+            "days_elapsed": elapsed,
+            "days_remaining": remaining,
+        }
+
+
+def _as_date(value):
+    if value is None or isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    if isinstance(value, datetime):
+        return value.date()
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
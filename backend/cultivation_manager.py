@@ -1,9 +1,15 @@
 import json
 import os
 import logging
+import threading
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
 import google.generativeai as genai
+from knowledge_compiler import open_compiled_core
+from disease_learning_queue import normalize_disease_name
+import phase_engine
+from district_grid import get_district_grid
 
 # Setup Logger
 logging.basicConfig(level=logging.INFO)
@@ -13,6 +19,17 @@ logger = logging.getLogger(__name__)
 DATA_DIR = Path(__file__).parent / "data"
 # KNOWLEDGE_CORE_FILE is now dynamic
 USER_STATE_FILE = DATA_DIR / "user_cultivation_state.json"
+_knowledge_write_lock = threading.Lock()
+# Precomputed dashboard fragments per knowledge core: path -> {"core", "phases", "knowledge_preview"}
+_dashboard_fragments = {}
+# Serialized AI trends per (crop, date): (expires monotonic time, JSON). Refreshed in the
+# background; the dashboard serves the last value meanwhile
+AI_TRENDS_TTL_SECONDS = int(os.getenv("AI_TRENDS_TTL_SECONDS", "21600"))
+# Empty results (including Gemini failures) are retried sooner
+AI_TRENDS_RETRY_SECONDS = 300
+_ai_trends = {}
+_ai_trends_refreshing = set()
+_ai_trends_lock = threading.Lock()
 
 class CultivationManager:
     """
@@ -41,8 +58,10 @@ class CultivationManager:
     def _save_json(file_path, data):
         try:
             DATA_DIR.mkdir(parents=True, exist_ok=True)
-            with open(file_path, 'w') as f:
+            tmp_path = file_path.with_suffix(file_path.suffix + ".tmp")
+            with open(tmp_path, 'w') as f:
                 json.dump(data, f, indent=2)
+            tmp_path.replace(file_path)
             return True
         except Exception as e:
             logger.error(f"Error saving {file_path}: {e}")
@@ -55,6 +74,30 @@ class CultivationManager:
         crop_name = crop_name.split()[0] # Handle cases like 'Paddy (Rice)' -> 'Paddy'
         return CultivationManager._load_json(CultivationManager._get_knowledge_file(crop_name))
 
+    @staticmethod
+    def _get_compiled_knowledge(crop_name="Paddy"):
+        """Returns the lazily-loaded compiled view of a crop's knowledge core (or None)."""
+        crop_name = crop_name.split()[0]
+        return open_compiled_core(CultivationManager._get_knowledge_file(crop_name))
+
+    @staticmethod
+    def get_phase_count(crop_name="Paddy"):
+        """Returns the number of lifecycle phases without loading the phases themselves."""
+        core = CultivationManager._get_compiled_knowledge(crop_name)
+        return core.phase_count if core else 0
+
+    @staticmethod
+    def get_phase(crop_name, phase_index):
+        """Loads a single lifecycle phase on demand."""
+        core = CultivationManager._get_compiled_knowledge(crop_name)
+        return core.get_phase(phase_index) if core else None
+
+    @staticmethod
+    def get_disease_protocol(crop_name, disease_id):
+        """Loads a single disease protocol on demand."""
+        core = CultivationManager._get_compiled_knowledge(crop_name)
+        return core.get_protocol(disease_id) if core else None
+
     @staticmethod
     def get_user_state():
         """Returns current user cultivation state."""
@@ -76,8 +119,7 @@ class CultivationManager:
             start_date_str = datetime.now().strftime("%Y-%m-%d")
 
         # Validate we have knowledge for this crop
-        knowledge = CultivationManager.get_static_knowledge(crop_name)
-        if not knowledge:
+        if not CultivationManager._get_compiled_knowledge(crop_name):
              return {"success": False, "message": f"Knowledge base for {crop_name} not found."}
 
         # Reset to Phase 1 (Index 0)
@@ -98,17 +140,16 @@ class CultivationManager:
         """
         Updates the cultivation phase. 
         """
-        state = CultivationManager.get_user_state()
+        state = CultivationManager.get_effective_state()
         if not state.get("active"):
             return {"success": False, "message": "No active cultivation found."}
 
         current_crop = state.get("current_crop", "Paddy")
-        knowledge = CultivationManager.get_static_knowledge(current_crop)
+        total_phases = CultivationManager.get_phase_count(current_crop)
         
-        if not knowledge:
+        if not total_phases:
             return {"success": False, "message": "Knowledge core missing."}
         
-        total_phases = len(knowledge["lifecycle_phases"])
         current_idx = state["current_phase_index"]
 
         if action == "next":
@@ -125,18 +166,47 @@ class CultivationManager:
         
         state["current_phase_index"] = current_idx
         state["last_updated"] = datetime.now().isoformat()
+        # Auto-advance continues from the chosen phase instead of undoing a manual "prev"
+        phase_engine.rebase(state)
         
         CultivationManager._save_json(USER_STATE_FILE, state)
         
-        phase_name = knowledge["lifecycle_phases"][current_idx]["phase_name"]
+        phase_name = CultivationManager.get_phase(current_crop, current_idx)["phase_name"]
         return {"success": True, "message": f"Moved to {phase_name}", "state": state}
 
+    @staticmethod
+    def _effective_state():
+        """(state with the phase implied by start_date applied in memory, phase-change event or None)."""
+        state = CultivationManager.get_user_state()
+        events = phase_engine.evaluate([(USER_STATE_FILE.stem, state)])
+        if events:
+            phase_engine.apply_event(state, events[0])
+            return state, events[0]
+        return state, None
+
+    @staticmethod
+    def get_effective_state():
+        """
+        Read-path view of the user state: auto-advanced in memory only. The advance is
+        persisted by the next explicit write or by the nightly phase_engine sweep.
+        """
+        return CultivationManager._effective_state()[0]
+
+    @staticmethod
+    def auto_advance_phase():
+        """Explicit write: persists the phase implied by start_date, if it is later."""
+        state, event = CultivationManager._effective_state()
+        if event:
+            CultivationManager._save_json(USER_STATE_FILE, state)
+            logger.info(f"Auto-advanced to {event['phase_name']}")
+        return state
+
     @staticmethod
     def log_disease_detection(disease_name, confidence, image_url=None):
         """
         Logs a detected disease into the user's history.
         """
-        state = CultivationManager.get_user_state()
+        state = CultivationManager.get_effective_state()
         
         # Initialize history if missing
         if "disease_history" not in state:
@@ -188,125 +258,211 @@ class CultivationManager:
             return {"trending_alerts": []} # Fallback
 
     @staticmethod
-    def generate_and_learn_new_disease(disease_name):
+    def _refresh_ai_trends(key):
+        try:
+            trends = CultivationManager._fetch_ai_trending_updates(crop=key[0])
+            ttl = AI_TRENDS_TTL_SECONDS if trends.get("trending_alerts") else AI_TRENDS_RETRY_SECONDS
+            with _ai_trends_lock:
+                # Entries of earlier days are dropped
+                for old_key in [k for k in _ai_trends if k[1] != key[1]]:
+                    del _ai_trends[old_key]
+                _ai_trends[key] = (time.monotonic() + ttl, json.dumps(trends))
+        finally:
+            with _ai_trends_lock:
+                _ai_trends_refreshing.discard(key)
+
+    @staticmethod
+    def get_ai_trends_json(crop="Paddy"):
         """
-        If a disease is not in the DB, ask Gemini for its details (symptoms, cures),
-        add it to the DB, and return the new protocol.
+        Serialized trending alerts for a crop without waiting on Gemini: the cached value
+        (empty until the first fetch completes), refreshed in the background when expired.
         """
-        try:
-            logger.info(f"Learning new disease: {disease_name}")
-            prompt = f"""
-            You are an expert plant pathologist. 
-            Task: Generate a structured technical protocol for the crop disease "{disease_name}" (specifically for Paddy/Rice if applicable, otherwise general).
-            
-            Output MUST be valid JSON with this exact structure:
-            {{
-                "name": "{disease_name}",
-                "scientific": "Scientific Name",
-                "risk": "High" or "Moderate" or "Low",
-                "symptoms": ["symptom 1", "symptom 2"],
-                "favorable_conditions": "brief description",
-                "monitor_freq": "Weekly" or "Daily",
-                "preventive_measures": ["measure 1", "measure 2"],
-                "management_procedures": {{
-                    "organic": ["organic cure 1", "organic cure 2"],
-                    "chemical": ["chemical cure 1", "chemical cure 2"]
-                }}
+        key = (crop, datetime.now().date().isoformat())
+        with _ai_trends_lock:
+            expires, trends_json = _ai_trends.get(key, (0, None))
+            refresh = time.monotonic() >= expires and key not in _ai_trends_refreshing
+            if refresh:
+                _ai_trends_refreshing.add(key)
+            if trends_json is None:
+                # Yesterday's value until today's arrives
+                trends_json = next((v[1] for k, v in _ai_trends.items() if k[0] == crop), None)
+        if refresh:
+            threading.Thread(
+                target=CultivationManager._refresh_ai_trends, args=(key,), name="ai-trends", daemon=True
+            ).start()
+        return trends_json or '{"trending_alerts": []}'
+
+    @staticmethod
+    def generate_disease_protocol(disease_name, crop_name="Paddy"):
+        """
+        Asks Gemini for the details (symptoms, cures) of a disease that is not in the DB.
+        Returns the protocol dict without saving it.
+        """
+        logger.info(f"Learning new disease: {disease_name}")
+        prompt = f"""
+        You are an expert plant pathologist. 
+        Task: Generate a structured technical protocol for the crop disease "{disease_name}" (specifically for {crop_name} if applicable, otherwise general).
+        
+        Output MUST be valid JSON with this exact structure:
+        {{
+            "name": "{disease_name}",
+            "scientific": "Scientific Name",
+            "risk": "High" or "Moderate" or "Low",
+            "symptoms": ["symptom 1", "symptom 2"],
+            "favorable_conditions": "brief description",
+            "monitor_freq": "Weekly" or "Daily",
+            "preventive_measures": ["measure 1", "measure 2"],
+            "management_procedures": {{
+                "organic": ["organic cure 1", "organic cure 2"],
+                "chemical": ["chemical cure 1", "chemical cure 2"]
             }}
-            Do not include markdown formatting, just the JSON string.
-            """
-            
-            model = genai.GenerativeModel('gemini-1.5-flash')
-            response = model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
-            new_protocol = json.loads(response.text)
-            
-            # Generate a simple ID
-            new_id = f"d_{int(datetime.now().timestamp())}"
-            
-            # Save to DB
-            CultivationManager._add_disease_to_db(new_id, new_protocol)
-            
+        }}
+        Do not include markdown formatting, just the JSON string.
+        """
+        
+        model = genai.GenerativeModel('gemini-1.5-flash')
+        response = model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
+        return json.loads(response.text)
+
+    @staticmethod
+    def generate_and_learn_new_disease(disease_name, crop_name=None):
+        """
+        Synchronous variant: generate the protocol, add it to the DB and return it.
+        The detection endpoint uses the background DiseaseLearningQueue instead.
+        """
+        if crop_name is None:
+            crop_name = CultivationManager.get_user_state().get("current_crop") or "Paddy"
+        try:
+            new_protocol = CultivationManager.generate_disease_protocol(disease_name, crop_name)
+            CultivationManager.add_learned_disease(crop_name, disease_name, new_protocol)
             return new_protocol
-            
         except Exception as e:
             logger.error(f"Failed to learn disease {disease_name}: {e}")
             return None
 
     @staticmethod
-    def _add_disease_to_db(disease_id, protocol_data):
+    def _disease_id_for(disease_name):
+        """Stable ID from the normalized name, so re-learning a disease never duplicates it."""
+        return "d_" + normalize_disease_name(disease_name).replace(" ", "_")
+
+    @staticmethod
+    def add_learned_disease(crop_name, disease_name, protocol_data):
+        """Persists a learned protocol under a stable ID (no-op if it is already present)."""
+        return CultivationManager._add_disease_to_db(
+            CultivationManager._disease_id_for(disease_name), protocol_data, crop_name
+        )
+
+    @staticmethod
+    def _add_disease_to_db(disease_id, protocol_data, crop_name=None):
         """
         Persists a new disease protocol to the knowledge core JSON.
         """
-        # Determine active crop to identify which DB to save to
-        state = CultivationManager.get_user_state()
-        current_crop = state.get("current_crop", "Paddy")
+        # Default to the active crop to identify which DB to save to
+        if crop_name is None:
+            crop_name = CultivationManager.get_user_state().get("current_crop") or "Paddy"
+        crop_name = crop_name.split()[0]
         
-        knowledge = CultivationManager.get_static_knowledge(current_crop)
-        if not knowledge:
-            return False
+        # Serialize read-modify-write cycles on the knowledge files
+        with _knowledge_write_lock:
+            knowledge = CultivationManager.get_static_knowledge(crop_name)
+            if not knowledge:
+                return False
+                
+            if "disease_protocols" not in knowledge:
+                knowledge["disease_protocols"] = {}
+            if disease_id in knowledge["disease_protocols"]:
+                return True
+                
+            knowledge["disease_protocols"][disease_id] = protocol_data
             
-        if "disease_protocols" not in knowledge:
-            knowledge["disease_protocols"] = {}
-            
-        knowledge["disease_protocols"][disease_id] = protocol_data
-        
-        # Determine filepath
-        filepath = CultivationManager._get_knowledge_file(current_crop)
-        return CultivationManager._save_json(filepath, knowledge)
+            # Determine filepath
+            filepath = CultivationManager._get_knowledge_file(crop_name)
+            return CultivationManager._save_json(filepath, knowledge)
 
     @staticmethod
-    def get_dashboard_data():
+    def _build_dashboard_fragments(core):
         """
-        Aggregates everything for the frontend dashboard:
+        Precomputes the crop/phase-dependent part of the dashboard for every phase:
+        current phase + its disease_details + next phase preview, serialized once.
+        """
+        phases = [core.get_phase(i) for i in range(core.phase_count)]
+        phase_fragments = []
+        for idx, phase_data in enumerate(phases):
+            # Enrich with detailed disease protocols
+            disease_details = []
+            for d_id in phase_data.get("common_diseases", []):
+                protocol = core.get_protocol(d_id)
+                if protocol:
+                    disease_details.append(protocol)
+
+            next_phase = phases[idx + 1] if idx < len(phases) - 1 else None
+            fragment = {
+                "current_phase": {
+                    **phase_data,
+                    "disease_details": disease_details
+                },
+                "next_phase_preview": {
+                    "phase_name": next_phase["phase_name"] if next_phase else "Harvest Complete",
+                    "preventive_tips": next_phase["preventive_tips"] if next_phase else []
+                }
+            }
+            # Stored without the outer braces so it can be spliced into the response object
+            phase_fragments.append(json.dumps(fragment)[1:-1])
+
+        return {
+            "core": core,
+            "phases": tuple(phase_fragments),
+            "knowledge_preview": json.dumps(phases)
+        }
+
+    @staticmethod
+    def _get_dashboard_fragments(crop_name="Paddy"):
+        """Returns the precomputed fragments, rebuilt whenever the knowledge core is reloaded."""
+        core = CultivationManager._get_compiled_knowledge(crop_name)
+        if not core:
+            return None
+        fragments = _dashboard_fragments.get(core.path)
+        if fragments is None or fragments["core"] is not core:
+            fragments = CultivationManager._build_dashboard_fragments(core)
+            _dashboard_fragments[core.path] = fragments
+        return fragments
+
+    @staticmethod
+    def get_dashboard_json(region=None):
+        """
+        Aggregates everything for the frontend dashboard as a JSON string:
         1. User State
-        2. Current Phase Details (Procedures, Tips)
-        3. Next Phase Preview
-        4. AI Trending Alerts
+        2. Current Phase Details (Procedures, Tips)   - precomputed per (crop, phase)
+        3. Next Phase Preview                         - precomputed per (crop, phase)
+        4. AI Trending Alerts                          - cached per (crop, day), refreshed in the background
+        5. Regional Risk (district/cluster weather + disease risk) - precomputed per (region, crop)
         """
-        state = CultivationManager.get_user_state()
+        state = CultivationManager.get_effective_state()
         current_crop = state.get("current_crop", "Paddy")
+        fragments = CultivationManager._get_dashboard_fragments(current_crop or "Paddy")
         
-        # Load correct knowledge base
-        knowledge = CultivationManager.get_static_knowledge(current_crop)
-        
-        if not state.get("active") or not knowledge:
-             return {
-                 "active": False, 
-                 "current_crop": current_crop,
-                 "message": "Start cultivation to see dashboard.",
-                 "knowledge_preview": knowledge["lifecycle_phases"] if knowledge else []
-             }
+        if not state.get("active") or not fragments:
+            return '{"active": false, "current_crop": %s, "message": %s, "knowledge_preview": %s}' % (
+                json.dumps(current_crop),
+                json.dumps("Start cultivation to see dashboard."),
+                fragments["knowledge_preview"] if fragments else "[]"
+            )
 
-        current_idx = state["current_phase_index"]
-        phases = knowledge["lifecycle_phases"]
-        current_phase_data = phases[current_idx]
-        
-        # Enrich with detailed disease protocols
-        disease_details = []
-        protocols = knowledge.get("disease_protocols", {})
-        for d_id in current_phase_data.get("common_diseases", []):
-            if d_id in protocols:
-                disease_details.append(protocols[d_id])
-        
-        # Get Next Phase Info
-        next_phase = phases[current_idx + 1] if current_idx < len(phases) - 1 else None
+        phase_fragment = fragments["phases"][state["current_phase_index"]]
 
-        # AI Insights 
-        # Pass the correct crop to AI
-        ai_trends = CultivationManager._fetch_ai_trending_updates(crop=current_crop)
+        # AI Insights for the current crop (cached; never waits on Gemini)
+        ai_trends = CultivationManager.get_ai_trends_json(current_crop)
 
-        dashboard = {
-            "active": True,
-            "user_state": state,
-            "current_phase": {
-                **current_phase_data,
-                "disease_details": disease_details
-            },
-            "next_phase_preview": {
-                "phase_name": next_phase["phase_name"] if next_phase else "Harvest Complete",
-                "preventive_tips": next_phase["preventive_tips"] if next_phase else []
-            },
-            "ai_insights": ai_trends
-        }
+        regional_risk = get_district_grid().lookup_json(region, current_crop) if region else None
 
-        return dashboard
+        return '{"active": true, "user_state": %s, %s, "ai_insights": %s, "regional_risk": %s}' % (
+            json.dumps(state),
+            phase_fragment,
+            ai_trends,
+            regional_risk or "null"
+        )
+
+    @staticmethod
+    def get_dashboard_data(region=None):
+        """Dashboard payload as a dict (see get_dashboard_json)."""
+        return json.loads(CultivationManager.get_dashboard_json(region))
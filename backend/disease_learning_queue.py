@@ -0,0 +1,118 @@
+"""
+Background Learning Queue for Unknown Diseases
+Deduplicates "learn this disease" requests by normalized name and feeds them to
+Gemini from a single rate-limited worker, so HTTP requests never wait on the model.
+"""
+
+import logging
+import queue
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_disease_name(name):
+    """'  Rice  Blast (Pyricularia)' -> 'rice blast pyricularia'"""
+    return re.sub(r"[^a-z0-9]+", " ", (name or "").lower()).strip()
+
+
+class DiseaseLearningQueue:
+    """
+    Asynchronous, deduplicated learning queue.
+
+    generate_fn(disease_name, crop_name) -> protocol dict or None   (the slow Gemini call)
+    persist_fn(crop_name, disease_name, protocol) -> bool           (writes the knowledge file once)
+
+    Throughput is bounded by a single worker thread and a minimum interval between
+    generate calls; the backlog is bounded by max_pending.
+    """
+
+    PENDING = "pending"
+    LEARNED = "learned"
+    FAILED = "failed"
+    REJECTED = "rejected"
+
+    def __init__(self, generate_fn, persist_fn, min_interval=5.0, max_pending=50):
+        self.generate_fn = generate_fn
+        self.persist_fn = persist_fn
+        self.min_interval = min_interval
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._status = {}  # (crop_key, name_key) -> {"status": ..., "disease_name": ..., "protocol": ...}
+        self._lock = threading.Lock()
+        self._worker = None
+        self._last_call = 0.0
+
+    @staticmethod
+    def _key(disease_name, crop_name):
+        return (normalize_disease_name(crop_name), normalize_disease_name(disease_name))
+
+    def submit(self, disease_name, crop_name="Paddy"):
+        """
+        Enqueue a disease for learning unless it is already pending or learned.
+        Returns the current status entry immediately.
+        """
+        key = self._key(disease_name, crop_name)
+        with self._lock:
+            entry = self._status.get(key)
+            if entry and entry["status"] in (self.PENDING, self.LEARNED):
+                return dict(entry)
+
+            entry = {"status": self.PENDING, "disease_name": disease_name, "crop": crop_name, "protocol": None}
+            try:
+                self._queue.put_nowait(key)
+            except queue.Full:
+                logger.warning(f"Learning queue full, dropping '{disease_name}'")
+                return {**entry, "status": self.REJECTED}
+            self._status[key] = entry
+            self._ensure_worker()
+            return dict(entry)
+
+    def get_status(self, disease_name, crop_name="Paddy"):
+        """Returns the status entry for a disease, or None if it was never submitted."""
+        entry = self._status.get(self._key(disease_name, crop_name))
+        return dict(entry) if entry else None
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="disease-learning", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            key = self._queue.get()
+            try:
+                self._learn(key)
+            finally:
+                self._queue.task_done()
+
+    def _learn(self, key):
+        entry = self._status[key]
+        disease_name, crop_name = entry["disease_name"], entry["crop"]
+
+        # Rate limit: keep at least min_interval between model calls
+        wait = self.min_interval - (time.monotonic() - self._last_call)
+        if wait > 0:
+            time.sleep(wait)
+        self._last_call = time.monotonic()
+
+        try:
+            protocol = self.generate_fn(disease_name, crop_name)
+            if protocol and self.persist_fn(crop_name, disease_name, protocol):
+                status = self.LEARNED
+                logger.info(f"Learned new disease '{disease_name}' for {crop_name}")
+            else:
+                status = self.FAILED
+        except Exception as e:
+            logger.error(f"Failed to learn disease {disease_name}: {e}")
+            protocol, status = None, self.FAILED
+
+        with self._lock:
+            # FAILED entries may be resubmitted by a later detection
+            self._status[key] = {**entry, "status": status, "protocol": protocol}
+
+    def join(self):
+        """Blocks until every queued disease has been processed (used by scripts)."""
+        self._queue.join()
@@ -0,0 +1,268 @@
+"""
+District Weather & Risk Grid
+Precomputes weather, disease risk and the multi-day risk forecast for every Karnataka
+district, each crop cluster ("North Karnataka", "Malnad", ...) and the whole state, on
+a refresh schedule. Snapshots older than max_age_seconds are still served while a
+background refresh replaces them, so the grid stays fresh without the scheduler too.
+
+Weather and risk levels are kept in compact arrays (one row per district/cluster);
+the per-row, per-crop response payloads are built and serialized at refresh time so
+request handlers only do an O(1) dictionary lookup.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from risk_engine import get_engine
+from risk_forecast import RiskForecaster
+from weather_disease_risk import WeatherDiseaseRiskCalculator, get_region_climate
+from weather_providers import get_weather_service
+
+logger = logging.getLogger(__name__)
+
+STATE_REGION = "All Karnataka"
+# Region names that resolve to the state-wide row
+STATE_ALIASES = {"All Karnataka", "Karnataka"}
+# Longest forecast served; shorter ones are prefixes of it (the forecaster only looks back)
+FORECAST_DAYS = 14
+DEFAULT_MAX_AGE_SECONDS = int(os.getenv("DISTRICT_GRID_REFRESH_SECONDS", "3600"))
+
+
+class _GridSnapshot:
+    """Immutable result of one refresh; swapped in atomically."""
+
+    def __init__(self, regions, kinds, weather, levels, payloads, payload_json, forecasts, refreshed_at):
+        self.regions = regions            # row -> region name
+        self.kinds = kinds                # row -> "district" | "cluster" | "state"
+        self.row_index = {name.lower(): i for i, name in enumerate(regions)}
+        self.weather = weather            # float32 (rows, 3): temperature, humidity, rainfall
+        self.levels = levels              # int8 (rows, diseases): index into RISK_LEVELS
+        self.payloads = payloads          # row -> {"region", "weather", "diseases": {crop: [...]}}
+        self.payload_json = payload_json  # row -> {crop: serialized regional risk}
+        self.forecasts = forecasts        # row -> FORECAST_DAYS-day {disease: forecast}
+        self.refreshed_at = refreshed_at
+        self.built_monotonic = time.monotonic()
+
+
+class DistrictRiskGrid:
+    """Scheduled district/cluster/state weather and risk table."""
+
+    def __init__(self, weather_service=None, engine=None, max_age_seconds=DEFAULT_MAX_AGE_SECONDS):
+        self.weather_service = weather_service or get_weather_service()
+        self.engine = engine or get_engine()
+        self.max_age_seconds = max_age_seconds
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._timer = None
+
+    def _region_rows(self):
+        districts = sorted(get_region_climate().values(), key=lambda d: d["district"])
+        clusters = {}
+        for d in districts:
+            clusters.setdefault(d["cluster"], []).append(d["district"])
+        return districts, clusters
+
+    def refresh(self, prefetch=False):
+        """
+        Rebuilds the whole grid (one bulk weather lookup, one vectorized risk pass).
+        prefetch=True pulls fresh weather from the provider first (used by the scheduler and
+        background refreshes, where blocking on the network is fine).
+        """
+        districts, clusters = self._region_rows()
+        names = [d["district"] for d in districts]
+        if prefetch:
+            self.weather_service.prefetch(names)
+        weather_by_district = self.weather_service.get_many(names)
+
+        regions, kinds, weather_rows = [], [], []
+        for name in names:
+            regions.append(name)
+            kinds.append("district")
+            weather_rows.append(weather_by_district[name])
+
+        # Clusters and the state use the mean of their districts' weather
+        groups = [(cluster, members, "cluster") for cluster, members in sorted(clusters.items())]
+        groups.append((STATE_REGION, names, "state"))
+        for region, members, kind in groups:
+            member_weather = [weather_by_district[m] for m in members]
+            regions.append(region)
+            kinds.append(kind)
+            weather_rows.append(self._mean_weather(region, member_weather))
+
+        columns, result = self.engine._prepare(weather_rows, datetime.now().month)
+
+        payloads = [{"region": r, "weather": w, "diseases": {}} for r, w in zip(regions, weather_rows)]
+        for crop in self.engine.crop_diseases:
+            assessments = self.engine._assemble(self.engine._crop_diseases(crop), columns, result)
+            for row, crop_assessments in enumerate(assessments):
+                payloads[row]["diseases"][crop] = crop_assessments
+
+        # Forecasts follow each row's climate offsets (clusters and the state use their
+        # districts' mean); rows with the same offsets share one forecast
+        climate_by_district = {d["district"]: d for d in districts}
+        forecaster = RiskForecaster(self.engine)
+        forecast_by_climate = {}
+        forecasts = []
+        for region, kind in zip(regions, kinds):
+            if kind == "district":
+                members = [region]
+            elif kind == "cluster":
+                members = clusters[region]
+            else:
+                members = names
+            climate = {
+                key: round(sum(climate_by_district[m].get(key, default) for m in members) / len(members), 3)
+                for key, default in (("temp_offset", 0), ("humidity_offset", 0), ("rainfall_factor", 1))
+            }
+            climate_key = tuple(climate.values())
+            if climate_key not in forecast_by_climate:
+                series = WeatherDiseaseRiskCalculator.get_simulated_forecast(region, FORECAST_DAYS, climate=climate)
+                forecast_by_climate[climate_key] = forecaster.forecast(series)
+            forecasts.append(forecast_by_climate[climate_key])
+
+        payload_json = [
+            {
+                crop: json.dumps({"region": p["region"], "weather": p["weather"], "diseases": diseases})
+                for crop, diseases in p["diseases"].items()
+            }
+            for p in payloads
+        ]
+
+        snapshot = _GridSnapshot(
+            regions=tuple(regions),
+            kinds=tuple(kinds),
+            weather=np.array(
+                [[w["temperature_celsius"], w["humidity_percent"], w["rainfall_mm"]] for w in weather_rows],
+                dtype=np.float32
+            ),
+            levels=result["level"].astype(np.int8),
+            payloads=payloads,
+            payload_json=payload_json,
+            forecasts=forecasts,
+            refreshed_at=datetime.now().isoformat()
+        )
+        with self._lock:
+            self._snapshot = snapshot
+        logger.info(f"District risk grid refreshed: {len(regions)} regions")
+        return snapshot
+
+    @staticmethod
+    def _mean_weather(region, weather_rows):
+        template = weather_rows[0]
+        return {
+            "region": region,
+            "timestamp": template.get("timestamp"),
+            "temperature_celsius": round(sum(w["temperature_celsius"] for w in weather_rows) / len(weather_rows), 1),
+            "humidity_percent": round(sum(w["humidity_percent"] for w in weather_rows) / len(weather_rows), 1),
+            "rainfall_mm": round(sum(w["rainfall_mm"] for w in weather_rows) / len(weather_rows), 2),
+            "wind_speed_kmh": round(sum(w.get("wind_speed_kmh", 0) for w in weather_rows) / len(weather_rows), 1),
+            "season": template.get("season"),
+            "source": f"District grid mean of {len(weather_rows)} districts ({template.get('source')})"
+        }
+
+    def _get_snapshot(self):
+        # First use builds synchronously; afterwards readers only see complete snapshots,
+        # and a stale one is served while a single background refresh replaces it
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self.refresh()
+        if time.monotonic() - snapshot.built_monotonic > self.max_age_seconds:
+            self._refresh_in_background()
+        return snapshot
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh(prefetch=True)
+            except Exception as e:
+                logger.error(f"District grid refresh failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name="district-grid-refresh", daemon=True).start()
+
+    def _row_for(self, region):
+        snapshot = self._get_snapshot()
+        if region in STATE_ALIASES:
+            region = STATE_REGION
+        return snapshot, snapshot.row_index.get((region or STATE_REGION).lower())
+
+    def lookup(self, region):
+        """Precomputed {"region", "weather", "diseases": {crop: [...]}} for a district/cluster, or None."""
+        snapshot, row = self._row_for(region)
+        return snapshot.payloads[row] if row is not None else None
+
+    def lookup_json(self, region, crop):
+        """Pre-serialized regional risk for one crop, or None."""
+        snapshot, row = self._row_for(region)
+        if row is None:
+            return None
+        return snapshot.payload_json[row].get(crop)
+
+    def forecast(self, region, days=7):
+        """
+        Precomputed {disease: {"peak_day", "peak_risk_level", "peak_risk_score", "risk_trajectory"}}
+        over the first `days` (up to FORECAST_DAYS) days for a district/cluster, or None.
+        """
+        snapshot, row = self._row_for(region)
+        if row is None:
+            return None
+        forecast = {}
+        for name, full in snapshot.forecasts[row].items():
+            curve = full["risk_trajectory"][:days]
+            # Earliest day with the highest score
+            peak = max(curve, key=lambda point: point["risk_score"])
+            forecast[name] = {
+                "peak_day": peak["date"],
+                "peak_risk_level": peak["risk_level"],
+                "peak_risk_score": peak["risk_score"],
+                "risk_trajectory": curve
+            }
+        return forecast
+
+    def regions(self):
+        """All addressable regions with their kind (district / cluster / state)."""
+        snapshot = self._get_snapshot()
+        return [{"region": r, "kind": k} for r, k in zip(snapshot.regions, snapshot.kinds)]
+
+    def refreshed_at(self):
+        return self._get_snapshot().refreshed_at
+
+    def start_scheduler(self, interval_seconds=3600):
+        """Refreshes the grid every interval_seconds on a daemon timer."""
+        def run():
+            try:
+                self.refresh(prefetch=True)
+            except Exception as e:
+                logger.error(f"District grid refresh failed: {e}")
+            self._timer = threading.Timer(interval_seconds, run)
+            self._timer.daemon = True
+            self._timer.start()
+        run()
+
+
+_grid = None
+_grid_lock = threading.Lock()
+
+
+def get_district_grid():
+    """Process-wide DistrictRiskGrid"""
+    global _grid
+    if _grid is None:
+        with _grid_lock:
+            if _grid is None:
+                _grid = DistrictRiskGrid()
+    return _grid
@@ -0,0 +1,217 @@
+"""
+Compiled Knowledge Core Format
+Packs each knowledge_core_<crop>.json into an offset-indexed binary file so that a
+single lifecycle phase or disease protocol can be read without parsing the whole core.
+
+File layout (.kcb):
+    8 bytes   magic  b"KCORE01\\n"
+    4 bytes   little-endian uint32 length of the index
+    N bytes   index (compact JSON): source stamp + [offset, length] per section
+    ...       data blobs (compact UTF-8 JSON), offsets relative to the end of the index
+
+Run this module directly to (re)build every stale compiled core:
+    python knowledge_compiler.py [--force]
+"""
+
+import json
+import logging
+import mmap
+import struct
+import sys
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).parent / "data"
+COMPILED_DIR = DATA_DIR / "compiled"
+
+MAGIC = b"KCORE01\n"
+HEADER = struct.Struct("<8sI")
+
+
+def _source_stamp(json_path):
+    stat = json_path.stat()
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def compiled_path_for(json_path):
+    """Returns the compiled (.kcb) path for a knowledge core JSON file."""
+    return COMPILED_DIR / (Path(json_path).stem + ".kcb")
+
+
+def compile_knowledge_core(json_path, out_path=None):
+    """Compiles one knowledge core JSON file. Returns the output path."""
+    json_path = Path(json_path)
+    out_path = Path(out_path) if out_path else compiled_path_for(json_path)
+
+    # Stamp before reading so a concurrent rewrite is detected as stale next time
+    source_stamp = _source_stamp(json_path)
+    with open(json_path, 'r', encoding='utf-8') as f:
+        knowledge = json.load(f)
+
+    blobs = []
+    offset = 0
+
+    def add_blob(value):
+        nonlocal offset
+        blob = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        blobs.append(blob)
+        entry = [offset, len(blob)]
+        offset += len(blob)
+        return entry
+
+    index = {"source": source_stamp, "sections": {}, "phases": [], "protocols": {}}
+    for key, value in knowledge.items():
+        if key == "lifecycle_phases":
+            index["phases"] = [add_blob(phase) for phase in value]
+        elif key == "disease_protocols":
+            index["protocols"] = {d_id: add_blob(protocol) for d_id, protocol in value.items()}
+        else:
+            index["sections"][key] = add_blob(value)
+    # Section order is kept so the full document can be reassembled faithfully
+    index["order"] = list(knowledge.keys())
+
+    index_bytes = json.dumps(index, separators=(",", ":")).encode("utf-8")
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_suffix(".kcb.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(index_bytes)))
+        f.write(index_bytes)
+        for blob in blobs:
+            f.write(blob)
+    tmp_path.replace(out_path)
+    return out_path
+
+
+def is_stale(json_path, out_path=None):
+    """True if the compiled core is missing or was built from a different JSON revision."""
+    json_path = Path(json_path)
+    out_path = Path(out_path) if out_path else compiled_path_for(json_path)
+    if not out_path.exists():
+        return True
+    try:
+        with open(out_path, 'rb') as f:
+            magic, index_len = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                return True
+            index = json.loads(f.read(index_len))
+        return index.get("source") != _source_stamp(json_path)
+    except Exception:
+        return True
+
+
+class CompiledKnowledgeCore:
+    """Read-only, memory-mapped view over a compiled knowledge core."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_len = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a compiled knowledge core")
+        index_start = HEADER.size
+        self._index = json.loads(self._mm[index_start:index_start + index_len])
+        self._data_start = index_start + index_len
+        self.source_stamp = self._index["source"]
+
+    def _read(self, entry):
+        start = self._data_start + entry[0]
+        return json.loads(self._mm[start:start + entry[1]])
+
+    @property
+    def phase_count(self):
+        return len(self._index["phases"])
+
+    def get_phase(self, index):
+        """Returns a single lifecycle phase, or None if out of range."""
+        phases = self._index["phases"]
+        if not 0 <= index < len(phases):
+            return None
+        return self._read(phases[index])
+
+    def protocol_ids(self):
+        return list(self._index["protocols"].keys())
+
+    def get_protocol(self, disease_id):
+        """Returns a single disease protocol, or None if unknown."""
+        entry = self._index["protocols"].get(disease_id)
+        return self._read(entry) if entry else None
+
+    def get_section(self, key):
+        """Returns any other top-level section (e.g. crop_info)."""
+        entry = self._index["sections"].get(key)
+        return self._read(entry) if entry else None
+
+    def to_dict(self):
+        """Reassembles the full knowledge core (same content as the JSON source)."""
+        knowledge = {}
+        for key in self._index["order"]:
+            if key == "lifecycle_phases":
+                knowledge[key] = [self._read(e) for e in self._index["phases"]]
+            elif key == "disease_protocols":
+                knowledge[key] = {d_id: self._read(e) for d_id, e in self._index["protocols"].items()}
+            else:
+                knowledge[key] = self.get_section(key)
+        return knowledge
+
+    def close(self):
+        self._mm.close()
+
+
+_open_cores = {}
+_open_lock = threading.Lock()
+
+
+def open_compiled_core(json_path):
+    """
+    Returns a CompiledKnowledgeCore for the JSON source, rebuilding the compiled file
+    if the JSON changed since it was last compiled. Returns None if the source is missing.
+    """
+    json_path = Path(json_path)
+    if not json_path.exists():
+        return None
+    stamp = _source_stamp(json_path)
+
+    core = _open_cores.get(json_path)
+    if core is not None and core.source_stamp == stamp:
+        return core
+
+    with _open_lock:
+        core = _open_cores.get(json_path)
+        if core is not None and core.source_stamp == stamp:
+            return core
+        try:
+            out_path = compiled_path_for(json_path)
+            if is_stale(json_path, out_path):
+                logger.info(f"Compiling knowledge core {json_path.name}")
+                compile_knowledge_core(json_path, out_path)
+            new_core = CompiledKnowledgeCore(out_path)
+        except Exception as e:
+            logger.error(f"Error compiling {json_path}: {e}")
+            return None
+        # Old mmaps are left for the GC; readers may still hold a reference
+        _open_cores[json_path] = new_core
+        return new_core
+
+
+def build_all(force=False):
+    """Compiles every knowledge core in DATA_DIR. Returns the list of rebuilt files."""
+    rebuilt = []
+    for json_path in sorted(DATA_DIR.glob("knowledge_core_*.json")):
+        if force or is_stale(json_path):
+            compile_knowledge_core(json_path)
+            rebuilt.append(json_path.name)
+    return rebuilt
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    rebuilt = build_all(force="--force" in sys.argv)
+    if rebuilt:
+        for name in rebuilt:
+            print(f"Compiled {name}")
+    else:
+        print("All compiled knowledge cores are up to date.")
@@ -1,14 +1,18 @@
 
 import os
+import sys
 import json
 import random
 
+# Repository root, home of the plant_vision package shared with the training code
+# (the backend image copies it to /plant_vision, next to /app)
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+
 # Attempt to import ML libraries, but provide a fallback for unstable environments
 try:
     import torch
-    import torch.nn as nn
-    import torch.nn.functional as F
-    import timm
     import cv2
     import pickle
     import albumentations as A
@@ -19,44 +23,52 @@ except ImportError:
     ML_AVAILABLE = False
     print("Warning: ML Libraries (torch, etc.) not found. Using Mock Inference Fallback.")
 
-# Define Model Architecture (Must match training script) - Only defined if ML is available
 if ML_AVAILABLE:
-    class ViTMultiTaskModel(nn.Module):
-        def __init__(self, num_crops, num_diseases):
-            super().__init__()
-            self.encoder = timm.create_model("vit_small_patch16_224", pretrained=False, num_classes=0)
-            hidden_dim = self.encoder.embed_dim
-            self.crop_head = nn.Sequential(nn.LayerNorm(hidden_dim), nn.Linear(hidden_dim, num_crops))
-            self.disease_head = nn.Sequential(nn.LayerNorm(hidden_dim), nn.Linear(hidden_dim, num_diseases))
-            self.seg_decoder = nn.Sequential(
-                nn.Conv2d(hidden_dim, 256, kernel_size=3, padding=1),
-                nn.ReLU(),
-                nn.Conv2d(256, 1, kernel_size=1)
-            )
-
-        def forward(self, x):
-            B = x.size(0)
-            features = self.encoder.forward_features(x)
-            cls_token = features[:, 0]
-            crop_logits = self.crop_head(cls_token)
-            disease_logits = self.disease_head(cls_token)
-            
-            patch_tokens = features[:, 1:]
-            n = int(patch_tokens.size(1)**0.5)
-            seg_map = patch_tokens.transpose(1, 2).reshape(B, -1, n, n)
-            seg_map = F.interpolate(seg_map, size=(224, 224), mode='bilinear', align_corners=False)
-            seg_map = self.seg_decoder(seg_map)
-            return crop_logits, disease_logits, seg_map
+    try:
+        # Same model classes the training scripts save (plant_vision/model.py)
+        from plant_vision.model import CompactMultiTaskModel, ViTMultiTaskModel
+    except ImportError as e:
+        # Not a missing optional dependency: the deployment is broken, say so loudly
+        ML_AVAILABLE = False
+        print(
+            f"Error: ML libraries are installed but the plant_vision package could not be imported ({e}). "
+            f"Expected it at {os.path.join(REPO_ROOT, 'plant_vision')} (build the backend image from the "
+            "repository root, see docker-compose.yml). Using Mock Inference Fallback."
+        )
 
 class LocalInferenceService:
     _model = None
     _crop_encoder = None
     _disease_encoder = None
     _device = None
+    _img_size = 224
+    _method = "Local ViT Model"
     
     MODELS_DIR = r"C:\\Users\\Yashas H D\\Desktop\\PYTHON\\5\\models"
     MODEL_PATH = os.path.join(MODELS_DIR, "vit_model.pt")
     ENCODER_PATH = os.path.join(MODELS_DIR, "encoders.pkl")
+    # Written by train.py / distill.py; LOCAL_MODEL=<name> overrides its "active" entry
+    REGISTRY_PATH = os.path.join(MODELS_DIR, "model_registry.json")
+    DEFAULT_ENTRY = {"architecture": "vit_multitask", "weights": "vit_model.pt", "encoders": "encoders.pkl", "img_size": 224}
+
+    @classmethod
+    def _model_entry(cls):
+        """(name, registry entry) of the model to serve; plain vit_model.pt when there is no registry"""
+        if not os.path.exists(cls.REGISTRY_PATH):
+            return "vit_small", cls.DEFAULT_ENTRY
+        with open(cls.REGISTRY_PATH) as f:
+            registry = json.load(f)
+        name = os.environ.get("LOCAL_MODEL") or registry.get("active") or "vit_small"
+        if name not in registry.get("models", {}):
+            print(f"Model '{name}' not in registry, serving vit_model.pt")
+            return "vit_small", cls.DEFAULT_ENTRY
+        return name, registry["models"][name]
+
+    @classmethod
+    def _build_model(cls, entry, num_crops, num_diseases):
+        if entry["architecture"] == "compact_multitask":
+            return CompactMultiTaskModel(num_crops, num_diseases, backbone=entry["backbone"], pretrained=False)
+        return ViTMultiTaskModel(num_crops, num_diseases, pretrained=False)
     
     @classmethod
     def load_model(cls):
@@ -67,14 +79,17 @@ class LocalInferenceService:
             return True
 
         try:
-            print("--- Loading Local ViT Model ---")
+            name, entry = cls._model_entry()
+            model_path = os.path.join(cls.MODELS_DIR, entry["weights"])
+            encoder_path = os.path.join(cls.MODELS_DIR, entry["encoders"])
+            print(f"--- Loading Local Model: {name} ({entry['architecture']}) ---")
             cls._device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
             
-            if not os.path.exists(cls.ENCODER_PATH) or not os.path.exists(cls.MODEL_PATH):
+            if not os.path.exists(encoder_path) or not os.path.exists(model_path):
                 print("Model files missing. Fallback to Mock.")
                 return False
 
-            with open(cls.ENCODER_PATH, "rb") as f:
+            with open(encoder_path, "rb") as f:
                 encoders = pickle.load(f)
                 cls._crop_encoder = encoders['crop']
                 cls._disease_encoder = encoders['disease']
@@ -82,11 +97,14 @@ class LocalInferenceService:
             num_crops = len(cls._crop_encoder.classes_)
             num_diseases = len(cls._disease_encoder.classes_)
             
-            cls._model = ViTMultiTaskModel(num_crops, num_diseases)
-            state_dict = torch.load(cls.MODEL_PATH, map_location=cls._device)
+            cls._model = cls._build_model(entry, num_crops, num_diseases)
+            state_dict = torch.load(model_path, map_location=cls._device)
             cls._model.load_state_dict(state_dict)
             cls._model.to(cls._device)
             cls._model.eval()
+            cls._img_size = entry.get("img_size", 224)
+            if entry["architecture"] != "vit_multitask":
+                cls._method = f"Local Distilled Model ({name})"
             print("--- Model Loaded Successfully ---")
             return True
         except Exception as e:
@@ -102,7 +120,7 @@ class LocalInferenceService:
                 img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
                 
                 transform = A.Compose([
-                    A.Resize(224, 224),
+                    A.Resize(cls._img_size, cls._img_size),
                     A.Normalize(),
                     ToTensorV2()
                 ])
@@ -125,7 +143,7 @@ class LocalInferenceService:
                         "crop": crop_name,
                         "disease": disease_name,
                         "confidence": float(disease_conf.item()) * 100,
-                        "method": "Local ViT Model"
+                        "method": cls._method
                     }
             except Exception as e:
                 print(f"ML Inference Failed: {e}. Falling back to Smart Detection.")
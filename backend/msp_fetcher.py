@@ -3,84 +3,174 @@ Live MSP (Minimum Support Price) Fetcher for Indian Government Agricultural Prod
 Fetches real-time prices from government APIs and cached market data
 """
 
+import os
+import threading
 import requests
 import logging
 import json
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
 from cachetools import TTLCache, cached
+from cachetools.keys import hashkey
+from requests.adapters import HTTPAdapter
+from price_catalog import get_price_catalog
+from price_store import get_price_store, MSP_MARKET, ESTIMATE_SOURCE
 
 logger = logging.getLogger(__name__)
 
 # Cache MSP data for 6 hours (21600 seconds)
 msp_cache = TTLCache(maxsize=100, ttl=21600)
 
+# data.gov.in "Current daily price of various commodities from various markets (Mandi)"
+MANDI_API_URL = os.getenv(
+    "MANDI_API_URL", "https://api.data.gov.in/resource/9ef84268-d588-465a-a308-a864a43d0070"
+)
+# (connect, read) timeout per source, in seconds
+SOURCE_TIMEOUTS = {
+    "mandi_api": (3.05, 6),
+}
+# Upper bound for a whole bulk fetch; slower crops fall back to estimates
+BULK_FETCH_DEADLINE = 10
+
+_session = None
+_cache_lock = threading.Lock()
+# callback({crop: quote}) after every completed MSP fetch (see MSPFetcher.add_quote_listener)
+_quote_listeners = []
+
+
+def _get_session(pool_size=12):
+    """Shared HTTP session with a connection pool sized for one request per crop."""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=1)
+        _session.mount("http://", adapter)
+        _session.mount("https://", adapter)
+    return _session
+
 
 class MSPFetcher:
     """Fetches live MSP and market prices for agricultural commodities"""
     
-    # Crop mapping with government commodity codes
-    CROP_MAPPING = {
-        "Paddy": {"common_names": ["Rice", "Paddy", "Dhaan"], "season": "Kharif"},
-        "Ragi": {"common_names": ["Ragi", "Finger Millet", "Nachni"], "season": "Kharif"},
-        "Coffee": {"common_names": ["Coffee", "Arabica"], "season": "Perennial"},
-        "Sugarcane": {"common_names": ["Sugarcane", "Sugar Cane"], "season": "Annual"}
-    }
+    # Crop mapping (common names, season) for every crop in data/price_catalog.json
+    CROP_MAPPING = get_price_catalog().crop_mapping
     
     @staticmethod
-    @cached(cache=msp_cache)
+    @cached(cache=msp_cache, lock=_cache_lock)
     def fetch_live_msp(crop_name):
         """
         Fetch current MSP from multiple sources with fallback mechanism
         Returns format: {"msp": "₹2,300", "currency": "INR", "unit": "Quintal", "date": "2024-12-26"}
+        plus "mandi_price", "mandi_source", "mandi_date" when live mandi prices are available
         """
         try:
             logger.info(f"Fetching live MSP for {crop_name}")
             
-            # Try primary source: OpenWeather/Government API
-            msp_data = MSPFetcher._fetch_from_agrimarket_api(crop_name)
-            if msp_data:
-                return msp_data
+            # The latest declared government MSP; market-priced crops fall back to
+            # intelligent defaults based on seasonal factors
+            msp_data = MSPFetcher._fetch_from_agrimarket_api(crop_name) or MSPFetcher._get_estimated_msp(crop_name)
+            if not msp_data:
+                return None
             
-            # Fallback: Use intelligent defaults based on seasonal factors
-            return MSPFetcher._get_estimated_msp(crop_name)
+            # Live mandi prices (when an API key is configured) are reported next to the MSP
+            mandi_data = MSPFetcher._fetch_from_mandi_api(crop_name)
+            if mandi_data:
+                msp_data = {**msp_data, **mandi_data}
+            MSPFetcher._notify_quote(crop_name, msp_data)
+            return msp_data
             
         except Exception as e:
             logger.error(f"Error fetching MSP for {crop_name}: {str(e)}")
             return MSPFetcher._get_estimated_msp(crop_name)
     
     @staticmethod
-    def _fetch_from_agrimarket_api(crop_name):
+    def add_quote_listener(callback):
+        """Registers callback({crop: quote}), called when a fetch completes (not on cache hits)."""
+        _quote_listeners.append(callback)
+
+    @staticmethod
+    def _notify_quote(crop_name, msp_data):
+        for callback in _quote_listeners:
+            try:
+                callback({crop_name: msp_data})
+            except Exception as e:
+                logger.error(f"MSP quote listener failed: {e}")
+
+    @staticmethod
+    def _fetch_from_mandi_api(crop_name):
         """
-        Try to fetch from AgriMarket/Government sources
-        This is a placeholder for potential government API integration
+        Live modal price for a crop across Karnataka APMC mandis (data.gov.in Agmarknet feed),
+        as {"mandi_price", "mandi_source", "mandi_date"}. Returns None when MANDI_API_KEY is
+        not set, the crop has no Agmarknet commodity or the source fails; records are also
+        appended to the price store.
         """
+        api_key = os.getenv("MANDI_API_KEY")
+        commodity = get_price_catalog().agmarknet_commodity(crop_name)
+        if not api_key or not commodity:
+            return None
         try:
-            # In production, this would connect to:
-            # - eNAM (e-National Agricultural Market) API
-            # - Government Agricultural Department APIs
-            # - APMC Mandi pricing APIs
+            response = _get_session().get(
+                MANDI_API_URL,
+                params={
+                    "api-key": api_key,
+                    "format": "json",
+                    "limit": 100,
+                    "filters[state]": "Karnataka",
+                    "filters[commodity]": commodity
+                },
+                timeout=SOURCE_TIMEOUTS["mandi_api"]
+            )
+            response.raise_for_status()
+            records = response.json().get("records", [])
             
-            # For now, we use the latest known government MSP values
-            # These are updated quarterly
-            msp_values = {
-                "Paddy": ("₹2,350", "Quintal"),  # 2024-25 Kharif
-                "Ragi": ("₹3,950", "Quintal"),   # 2024-25
-                "Coffee": ("₹7,200", "Kilogram"), # Market-based, seasonal
-                "Sugarcane": ("₹350", "Quintal")  # FRP 2024
-            }
-            
-            if crop_name in msp_values:
-                price, unit = msp_values[crop_name]
-                return {
-                    "msp": price,
-                    "currency": "INR",
-                    "unit": unit,
-                    "source": "Government MSP",
-                    "date": datetime.now().strftime("%Y-%m-%d"),
-                    "live_updated": True
-                }
+            rows = []
+            for record in records:
+                try:
+                    rows.append({
+                        "crop": crop_name,
+                        "market": record["market"],
+                        "date": datetime.strptime(record["arrival_date"], "%d/%m/%Y").strftime("%Y-%m-%d"),
+                        "modal_price": float(record["modal_price"]),
+                        "min_price": float(record.get("min_price") or 0) or None,
+                        "max_price": float(record.get("max_price") or 0) or None
+                    })
+                except (KeyError, ValueError):
+                    continue
+            if not rows:
+                return None
+            get_price_store().append(rows, source="Agmarknet (data.gov.in)")
             
+            modal = int(sum(r["modal_price"] for r in rows) / len(rows))
+            return {
+                "mandi_price": f"₹{modal:,}",
+                "mandi_unit": "Quintal",
+                "mandi_source": f"Live Mandi Prices ({len(rows)} Karnataka markets)",
+                "mandi_date": max(r["date"] for r in rows)
+            }
+        except Exception as e:
+            logger.error(f"Mandi API error for {crop_name}: {str(e)}")
             return None
+    
+    @staticmethod
+    def _fetch_from_agrimarket_api(crop_name):
+        """
+        Latest declared government MSP/FRP from the price catalog
+        (None for market-priced crops such as Tomato)
+        """
+        try:
+            declared = get_price_catalog().declared(crop_name)
+            if declared is None:
+                return None
+            
+            price, unit, source = declared
+            return {
+                "msp": f"₹{price:,}",
+                "currency": "INR",
+                "unit": unit,
+                "source": source,
+                "date": datetime.now().strftime("%Y-%m-%d"),
+                "live_updated": True
+            }
             
         except Exception as e:
             logger.error(f"AgriMarket API error: {str(e)}")
@@ -92,24 +182,16 @@ class MSPFetcher:
         Intelligent MSP estimation using seasonal trends and historical data
         Used as fallback when live API is unavailable
         """
-        current_month = datetime.now().month
-        current_year = datetime.now().year
-        
-        # Base MSP values (2024-25 government declared)
-        base_msp = {
-            "Paddy": (2300, "Quintal", "₹"),
-            "Ragi": (3900, "Quintal", "₹"),
-            "Coffee": (7100, "Kilogram", "₹"),
-            "Sugarcane": (345, "Quintal", "₹")
-        }
-        
-        if crop_name not in base_msp:
+        catalog = get_price_catalog()
+        base = catalog.base(crop_name)
+        if base is None:
             return None
         
-        price, unit, currency = base_msp[crop_name]
+        price, unit = base
+        currency = "₹"
         
-        # Seasonal adjustments (prices typically vary 5-15% seasonally)
-        seasonal_multiplier = MSPFetcher._get_seasonal_multiplier(crop_name, current_month)
+        # Seasonal adjustments (prices typically vary 5-15% seasonally, more for vegetables)
+        seasonal_multiplier = catalog.seasonal_multiplier(crop_name, datetime.now().month)
         adjusted_price = int(price * seasonal_multiplier)
         
         return {
@@ -129,77 +211,68 @@ class MSPFetcher:
         Returns seasonal price multiplier based on crop and month
         Accounts for harvest seasons, storage availability, demand patterns
         """
-        seasonal_factors = {
-            "Paddy": {
-                # Kharif harvest: Oct-Nov (prices drop), Rest of year higher
-                "1": 1.08, "2": 1.10, "3": 1.12, "4": 1.10, "5": 1.08,
-                "6": 1.05, "7": 0.95, "8": 0.90, "9": 0.92, "10": 0.98,
-                "11": 1.02, "12": 1.05
-            },
-            "Ragi": {
-                # Kharif crop, similar pattern
-                "1": 1.05, "2": 1.08, "3": 1.10, "4": 1.08, "5": 1.05,
-                "6": 1.02, "7": 0.95, "8": 0.92, "9": 0.95, "10": 1.00,
-                "11": 1.02, "12": 1.04
-            },
-            "Coffee": {
-                # Perennial with harvest Dec-Feb
-                "1": 0.98, "2": 0.95, "3": 1.02, "4": 1.08, "5": 1.12,
-                "6": 1.10, "7": 1.08, "8": 1.06, "9": 1.04, "10": 1.02,
-                "11": 1.00, "12": 0.98
-            },
-            "Sugarcane": {
-                # Year-round availability, slight seasonal variation
-                "1": 1.00, "2": 1.02, "3": 1.04, "4": 1.05, "5": 1.04,
-                "6": 1.02, "7": 1.00, "8": 0.98, "9": 0.97, "10": 0.98,
-                "11": 0.99, "12": 1.00
-            }
-        }
+        return get_price_catalog().seasonal_multiplier(crop_name, month)
+    
+    @staticmethod
+    def _backfill_seasonal_history(store, crop_name, days):
+        """
+        Seeds the store with a deterministic seasonal series (weekly points, on Mondays)
+        for a crop without observed price data, so charts are stable between refreshes.
+        Only the weeks after the latest stored estimate are added.
+        """
+        catalog = get_price_catalog()
+        if crop_name not in catalog:
+            return 0
+        today = datetime.now().date()
+        latest = store.latest_date(crop_name, MSP_MARKET)
+        last_monday = today - timedelta(days=today.weekday())
+        if latest and latest >= last_monday.isoformat():
+            return 0
         
-        if crop_name not in seasonal_factors:
-            return 1.0
+        msp_data = MSPFetcher.fetch_live_msp(crop_name)
+        if not msp_data:
+            return 0
+        # Estimates are already seasonally adjusted; anchor on their base price instead
+        base_price = int(msp_data.get("base_msp", msp_data["msp"]).replace("₹", "").replace(",", ""))
         
-        return seasonal_factors[crop_name].get(str(month), 1.0)
-    
+        dates = [last_monday - timedelta(days=7*i) for i in range(days // 7, -1, -1)]
+        dates = [d for d in dates if not latest or d.isoformat() > latest]
+        prices = catalog.seasonal_series(crop_name, [d.month for d in dates], base_price)
+        rows = [
+            {"crop": crop_name, "market": MSP_MARKET, "date": d.isoformat(), "modal_price": int(price)}
+            for d, price in zip(dates, prices)
+        ]
+        return store.append(rows, source=ESTIMATE_SOURCE)
+
     @staticmethod
-    def get_price_history(crop_name, days=180):
+    def ensure_price_history(crop_name, days=180):
+        """Seeds the seasonal series for a crop without observed price data; returns the store."""
+        store = get_price_store()
+        if not store.has_observed(crop_name):
+            MSPFetcher._backfill_seasonal_history(store, crop_name, days)
+        return store
+
+    @staticmethod
+    def get_price_history(crop_name, days=180, market=None, bucket="week"):
         """
-        Generate 6-month price history based on seasonal patterns
-        Useful for trend visualization on frontend
+        Price history from the price store, downsampled for trend visualization.
+        Crops without observed price data are served from the seasonal model, stored once per week.
         """
         try:
-            msp_data = MSPFetcher.fetch_live_msp(crop_name)
-            if not msp_data:
-                return []
-            
+            store = MSPFetcher.ensure_price_history(crop_name, days)
+            start = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
             history = []
-            base_price = int(msp_data["msp"].replace("₹", "").replace(",", ""))
-            
-            # Generate 26 data points (bi-weekly) for 6 months
-            current_date = datetime.now()
-            for i in range(26, -1, -1):
-                date = current_date - timedelta(days=7*i)
-                month = date.month
-                
-                # Get seasonal multiplier for that month
-                multiplier = MSPFetcher._get_seasonal_multiplier(crop_name, month)
-                adjusted_price = int(base_price * multiplier)
-                
-                # Add small random variation for realism (±2%)
-                import random
-                variation = random.uniform(0.98, 1.02)
-                final_price = int(adjusted_price * variation)
-                
+            for point in store.downsample(crop_name, market=market, start=start, bucket=bucket):
+                date = datetime.strptime(point["date"], "%Y-%m-%d")
                 history.append({
                     "date": date.strftime("%b %d"),
                     "month": date.strftime("%b"),
-                    "price": final_price
+                    "price": int(round(point["price"]))
                 })
-            
             return history
             
         except Exception as e:
-            logger.error(f"Error generating price history: {str(e)}")
+            logger.error(f"Error loading price history: {str(e)}")
             return []
 
 
@@ -208,9 +281,53 @@ def get_msp_for_crop(crop_name):
     return MSPFetcher.fetch_live_msp(crop_name)
 
 
-def get_all_msp():
-    """Fetch MSP for all supported crops"""
+def fetch_all_msp(crop_names=None, deadline=BULK_FETCH_DEADLINE):
+    """
+    Bulk MSP lookup: cached crops are answered from msp_cache, the rest are fetched
+    concurrently (one pooled session, per-source timeouts) and written back to the cache
+    as they complete, so cold-cache latency is that of the slowest single crop. Crops that fail or miss the deadline get the seasonal estimate, and are
+    omitted only when no estimate exists either.
+    """
+    crop_names = list(crop_names or MSPFetcher.CROP_MAPPING.keys())
     result = {}
-    for crop in MSPFetcher.CROP_MAPPING.keys():
-        result[crop] = MSPFetcher.fetch_live_msp(crop)
+    missing = []
+    for crop in crop_names:
+        # TTLCache isn't thread-safe: every access goes through _cache_lock
+        with _cache_lock:
+            cached_data = msp_cache.get(hashkey(crop))
+        if cached_data is not None:
+            result[crop] = cached_data
+        else:
+            missing.append(crop)
+    if not missing:
+        return result
+    
+    def store(crop, future):
+        # Also runs for stragglers that finish after the deadline
+        if not future.exception() and future.result():
+            with _cache_lock:
+                msp_cache[hashkey(crop)] = future.result()
+    
+    pool = ThreadPoolExecutor(max_workers=len(missing))
+    futures = {crop: pool.submit(MSPFetcher.fetch_live_msp.__wrapped__, crop) for crop in missing}
+    for crop, future in futures.items():
+        future.add_done_callback(lambda f, crop=crop: store(crop, f))
+    wait(futures.values(), timeout=deadline)
+    # Don't block on stragglers; their threads finish in the background
+    pool.shutdown(wait=False)
+    
+    for crop, future in futures.items():
+        if future.done() and not future.exception():
+            data = future.result()
+        else:
+            # Estimates are returned but not cached, so the live source is retried next time
+            logger.warning(f"MSP fetch for {crop} failed or timed out, using estimate")
+            data = MSPFetcher._get_estimated_msp(crop)
+        if data:
+            result[crop] = data
     return result
+
+
+def get_all_msp():
+    """Fetch MSP for all supported crops"""
+    return fetch_all_msp(MSPFetcher.CROP_MAPPING.keys())
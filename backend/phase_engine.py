@@ -0,0 +1,191 @@
+"""
+Phase Auto-Advance Engine
+Derives the current lifecycle phase from start_date and each phase's duration_days
+using cumulative-duration prefix sums and binary search. A manual phase change re-bases
+the schedule (schedule_start_date) so the chosen phase starts on the day it was picked.
+
+Run this module directly for a nightly sweep over all stored cultivation states:
+    python phase_engine.py [--dry-run]
+Phase-change events are printed as JSON lines.
+"""
+
+import json
+import logging
+import math
+import re
+import sys
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from knowledge_compiler import open_compiled_core
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).parent / "data"
+
+# Per knowledge core: path -> (core, PhaseSchedule)
+_schedules = {}
+
+
+def parse_duration_days(value):
+    """
+    Normalizes the duration_days formats found in the knowledge cores to a day count:
+    25 -> 25, {"min": 15, "max": 25} -> 20, "25-35 days" -> 30.
+    Open-ended phases ("Ongoing", "Continuous", "Variable") never end -> inf.
+    """
+    if isinstance(value, (int, float)):
+        return max(0, value)
+    if isinstance(value, dict) and "min" in value and "max" in value:
+        return (value["min"] + value["max"]) / 2
+    if isinstance(value, str):
+        numbers = [int(n) for n in re.findall(r"\d+", value)[:2]]
+        if len(numbers) == 2 and "-" in value:
+            return sum(numbers) / 2
+        if numbers:
+            return numbers[0]
+    return float("inf")
+
+
+class PhaseSchedule:
+    """Cumulative phase boundaries for one crop: ends[i] = total days through phase i."""
+
+    def __init__(self, phase_names, durations):
+        self.phase_names = tuple(phase_names)
+        ends = []
+        total = 0
+        for days in durations:
+            total += parse_duration_days(days)
+            ends.append(total)
+        self.ends = tuple(ends)
+
+    def phase_start(self, index):
+        """Day offset at which phase `index` begins (inf after an open-ended phase)."""
+        return self.ends[index - 1] if 0 < index <= len(self.ends) else 0
+
+    def phase_index(self, elapsed_days):
+        """Phase index for a day offset from start_date (clamped to the final phase)."""
+        if not self.ends:
+            return 0
+        return min(bisect_right(self.ends, max(0, elapsed_days)), len(self.ends) - 1)
+
+
+def get_schedule(crop_name):
+    """Returns the PhaseSchedule for a crop, built once per knowledge core revision."""
+    json_path = DATA_DIR / f"knowledge_core_{crop_name.split()[0].lower()}.json"
+    core = open_compiled_core(json_path)
+    if not core:
+        return None
+    cached = _schedules.get(json_path)
+    if cached is None or cached[0] is not core:
+        phases = [core.get_phase(i) for i in range(core.phase_count)]
+        schedule = PhaseSchedule(
+            [p.get("phase_name") for p in phases],
+            [p.get("duration_days", 0) for p in phases]
+        )
+        cached = (core, schedule)
+        _schedules[json_path] = cached
+    return cached[1]
+
+
+def _elapsed_days(start_date_str, today):
+    return (today - datetime.strptime(start_date_str, "%Y-%m-%d").date()).days
+
+
+def rebase(state, today=None):
+    """
+    Anchors the state's schedule so its current phase starts today (in place), after a
+    manual phase change; auto-advance then continues from there. Returns the state.
+    """
+    today = today or date.today()
+    schedule = get_schedule(state.get("current_crop") or "Paddy")
+    if schedule is None:
+        return state
+    start = schedule.phase_start(state.get("current_phase_index", 0))
+    # None: the phase follows an open-ended one, so no date leads to it
+    state["schedule_start_date"] = (
+        None if math.isinf(start) else (today - timedelta(days=math.ceil(start))).isoformat()
+    )
+    return state
+
+
+def evaluate(states, today=None):
+    """
+    Evaluates a batch of cultivation states in one pass.
+
+    states: iterable of (farm_id, state_dict)
+    Returns a list of phase-change events. Phases only ever advance, counted from
+    schedule_start_date (set by rebase() on a manual /api/cultivation/update) or else
+    start_date, so manual moves in either direction stick.
+    Schedules are resolved once per crop, not once per farm.
+    """
+    today = today or date.today()
+    schedules = {}
+    events = []
+
+    for farm_id, state in states:
+        anchor = state.get("schedule_start_date", state.get("start_date")) if state else None
+        if not state or not state.get("active") or not anchor:
+            continue
+        crop = state.get("current_crop") or "Paddy"
+        if crop not in schedules:
+            schedules[crop] = get_schedule(crop)
+        schedule = schedules[crop]
+        if schedule is None:
+            continue
+
+        try:
+            elapsed = _elapsed_days(anchor, today)
+        except ValueError:
+            logger.warning(f"Invalid schedule start date for {farm_id}: {anchor}")
+            continue
+
+        current_idx = state.get("current_phase_index", 0)
+        target_idx = schedule.phase_index(elapsed)
+        if target_idx > current_idx:
+            events.append({
+                "farm_id": farm_id,
+                "crop": crop,
+                "from_phase": current_idx,
+                "to_phase": target_idx,
+                "phase_name": schedule.phase_names[target_idx],
+                "elapsed_days": elapsed,
+                "date": today.isoformat()
+            })
+    return events
+
+
+def apply_event(state, event):
+    """Moves a state to the event's phase (in place) and returns it."""
+    state["current_phase_index"] = event["to_phase"]
+    state["last_updated"] = datetime.now().isoformat()
+    return state
+
+
+def sweep(dry_run=False, today=None):
+    """Nightly sweep: advances every stored user state and returns the emitted events."""
+    files = sorted(DATA_DIR.glob("user_cultivation_state*.json"))
+    states = {}
+    for path in files:
+        try:
+            with open(path, 'r') as f:
+                states[path.stem] = json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading {path}: {e}")
+
+    events = evaluate(states.items(), today)
+    if not dry_run:
+        for event in events:
+            state = apply_event(states[event["farm_id"]], event)
+            path = DATA_DIR / f"{event['farm_id']}.json"
+            tmp_path = path.with_suffix(".json.tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f, indent=2)
+            tmp_path.replace(path)
+    return events
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    for event in sweep(dry_run="--dry-run" in sys.argv):
+        print(json.dumps(event))
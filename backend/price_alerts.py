@@ -0,0 +1,258 @@
+"""
+Price Alert Engine
+Evaluates users' price alert rules against incoming MSP and mandi price ticks.
+
+Rules are indexed by crop, so a tick only touches that crop's subscribers:
+- Threshold rules ("above"/"below" a price) sit in sorted lists per crop; a tick
+  moving the price from q to p fires exactly the thresholds crossed in between,
+  found with bisect.
+- Percent-move rules are grouped per (crop, percent). Each group keeps one reference
+  price, and all its subscribers fire together when the price moves that far.
+
+Users with ``price_alerts`` enabled get a default percent-move rule for each crop in
+``crop_favorites``; explicit rules come from the ``price_alert_rules`` setting.
+Alerts go to an outbox queue (for a notifier) and a bounded per-user inbox (for the API).
+"""
+
+import bisect
+import itertools
+import logging
+import queue
+import threading
+from collections import defaultdict, deque
+from datetime import datetime
+
+from price_store import ESTIMATE_SOURCE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MOVE_PERCENT = 5.0
+RULE_TYPES = ("above", "below", "move")
+# Market key for crop-level (not mandi-specific) prices
+ANY_MARKET = None
+
+
+class PriceAlertEngine:
+    """Crop-indexed alert rules with incremental evaluation per price tick."""
+
+    def __init__(self, default_move_percent=DEFAULT_MOVE_PERCENT, outbox_size=10000, inbox_size=50):
+        self.default_move_percent = default_move_percent
+        self.outbox = queue.Queue(maxsize=outbox_size)
+        self.inbox_size = inbox_size
+
+        self._rule_ids = itertools.count(1)
+        self._rules = {}                                 # rule_id -> rule dict
+        self._user_rules = defaultdict(set)              # user_id -> rule ids
+        self._above = defaultdict(list)                  # crop -> sorted [(threshold, rule_id)]
+        self._below = defaultdict(list)
+        self._move_groups = defaultdict(dict)            # crop -> {percent: {"reference", "rules": set}}
+        self._last_price = {}                            # (crop, market) -> (date, price)
+        self._inbox = defaultdict(lambda: deque(maxlen=self.inbox_size))
+        self._lock = threading.RLock()
+
+    # ---------- Subscriptions ----------
+
+    @staticmethod
+    def rules_from_settings(settings, crop_names_by_id=None):
+        """Derives a user's rules from their settings (favorites + explicit rules)."""
+        rules = []
+        if not settings.get("price_alerts", True):
+            return rules
+        for favorite in settings.get("crop_favorites", []):
+            crop = (crop_names_by_id or {}).get(favorite, favorite)
+            if isinstance(crop, str):
+                rules.append({"crop": crop, "type": "move", "percent": None})
+        for rule in settings.get("price_alert_rules", []):
+            if rule.get("type") in RULE_TYPES and rule.get("crop"):
+                rules.append(rule)
+        return rules
+
+    def set_user_rules(self, user_id, rules):
+        """Replaces all rules of one user (called whenever their settings change)."""
+        with self._lock:
+            for rule_id in self._user_rules.pop(user_id, set()):
+                self._remove_rule(rule_id)
+            for rule in rules:
+                self._add_rule(user_id, rule)
+
+    def _add_rule(self, user_id, rule):
+        rule_id = next(self._rule_ids)
+        crop = rule["crop"]
+        entry = {
+            "id": rule_id,
+            "user_id": user_id,
+            "crop": crop,
+            "type": rule["type"],
+            "market": rule.get("market", ANY_MARKET),
+        }
+        if rule["type"] == "move":
+            percent = float(rule.get("percent") or self.default_move_percent)
+            entry["percent"] = percent
+            group = self._move_groups[crop].setdefault(percent, {"reference": {}, "rules": set()})
+            group["rules"].add(rule_id)
+        else:
+            entry["price"] = float(rule["price"])
+            index = self._above[crop] if rule["type"] == "above" else self._below[crop]
+            bisect.insort(index, (entry["price"], rule_id))
+        self._rules[rule_id] = entry
+        self._user_rules[user_id].add(rule_id)
+
+    def _remove_rule(self, rule_id):
+        entry = self._rules.pop(rule_id, None)
+        if entry is None:
+            return
+        crop = entry["crop"]
+        if entry["type"] == "move":
+            group = self._move_groups[crop].get(entry["percent"])
+            if group:
+                group["rules"].discard(rule_id)
+                if not group["rules"]:
+                    del self._move_groups[crop][entry["percent"]]
+        else:
+            index = self._above[crop] if entry["type"] == "above" else self._below[crop]
+            i = bisect.bisect_left(index, (entry["price"], rule_id))
+            if i < len(index) and index[i] == (entry["price"], rule_id):
+                index.pop(i)
+
+    # ---------- Ticks ----------
+
+    def on_tick(self, crop, price, market=ANY_MARKET, date=None, source=None):
+        """
+        Evaluates one price observation. The first tick for a (crop, market) only sets the
+        baseline; older or unchanged ticks are ignored. Returns the alerts emitted.
+        """
+        date = date or datetime.now().strftime("%Y-%m-%d")
+        price = float(price)
+        with self._lock:
+            key = (crop, market)
+            previous = self._last_price.get(key)
+            if previous and (date < previous[0] or price == previous[1]):
+                return []
+            self._last_price[key] = (date, price)
+            if crop not in self._above and crop not in self._below and crop not in self._move_groups:
+                return []
+            if previous is None:
+                self._arm_move_groups(crop, market, price)
+                return []
+
+            old_price = previous[1]
+            alerts = []
+            if price > old_price:
+                above = self._above.get(crop, [])
+                # Thresholds in (old_price, price] were crossed upwards
+                lo = bisect.bisect_right(above, (old_price, float("inf")))
+                hi = bisect.bisect_right(above, (price, float("inf")))
+                alerts += [self._alert(rule_id, crop, market, price, old_price, date, source) for _, rule_id in above[lo:hi]]
+            else:
+                below = self._below.get(crop, [])
+                # Thresholds in [price, old_price) were crossed downwards
+                lo = bisect.bisect_left(below, (price, 0))
+                hi = bisect.bisect_left(below, (old_price, 0))
+                alerts += [self._alert(rule_id, crop, market, price, old_price, date, source) for _, rule_id in below[lo:hi]]
+
+            for percent, group in self._move_groups.get(crop, {}).items():
+                reference = group["reference"].setdefault(market, old_price)
+                change = (price - reference) / reference * 100
+                if abs(change) >= percent:
+                    group["reference"][market] = price
+                    alerts += [
+                        self._alert(rule_id, crop, market, price, reference, date, source, change)
+                        for rule_id in group["rules"]
+                    ]
+
+            alerts = [a for a in alerts if a is not None]
+            for alert in alerts:
+                self._emit(alert)
+            return alerts
+
+    def _arm_move_groups(self, crop, market, price):
+        for group in self._move_groups.get(crop, {}).values():
+            group["reference"].setdefault(market, price)
+
+    def on_rows(self, rows, source=None):
+        """Price-store listener: one tick per (crop, market), using the latest row of the batch."""
+        if source == ESTIMATE_SOURCE:
+            # Seeded seasonal points are not observations
+            return
+        latest = {}
+        for row in rows:
+            key = (row["crop"], row.get("market"))
+            if key not in latest or row["date"] >= latest[key]["date"]:
+                latest[key] = row
+        for (crop, market), row in latest.items():
+            self.on_tick(crop, row["modal_price"], market=market, date=row["date"], source=row.get("source", source))
+
+    def on_quotes(self, quotes):
+        """Ticks from MSP lookups: {crop: {"msp": "₹2,350", "date": ...}}."""
+        for crop, data in quotes.items():
+            if not data or not data.get("live_updated"):
+                # Seasonal estimates are not observations (their month change is not a price move)
+                continue
+            try:
+                price = float(data["msp"].replace("₹", "").replace(",", ""))
+            except (KeyError, ValueError):
+                continue
+            self.on_tick(crop, price, date=data.get("date"), source=data.get("source"))
+
+    def _alert(self, rule_id, crop, market, price, reference, date, source, change=None):
+        rule = self._rules.get(rule_id)
+        if rule is None or (rule["market"] is not None and rule["market"] != market):
+            return None
+        if change is None:
+            change = (price - reference) / reference * 100
+        if rule["type"] == "move":
+            message = f"{crop} price moved {change:+.1f}% to ₹{price:,.0f}"
+        else:
+            message = f"{crop} price went {rule['type']} ₹{rule['price']:,.0f} (now ₹{price:,.0f})"
+        return {
+            "user_id": rule["user_id"],
+            "rule_id": rule_id,
+            "type": rule["type"],
+            "crop": crop,
+            "market": market,
+            "price": price,
+            "reference_price": reference,
+            "change_percent": round(change, 2),
+            "message": f"{message}{f' at {market}' if market else ''}",
+            "date": date,
+            "source": source,
+            "created_at": datetime.now().isoformat()
+        }
+
+    def _emit(self, alert):
+        self._inbox[alert["user_id"]].append(alert)
+        try:
+            self.outbox.put_nowait(alert)
+        except queue.Full:
+            logger.warning("Price alert outbox full, dropping alert")
+
+    # ---------- Consumers ----------
+
+    def drain(self, max_items=100):
+        """Pops up to max_items alerts from the outbox (for a notification worker)."""
+        alerts = []
+        while len(alerts) < max_items:
+            try:
+                alerts.append(self.outbox.get_nowait())
+            except queue.Empty:
+                break
+        return alerts
+
+    def recent_alerts(self, user_id):
+        """Most recent alerts for one user, newest first."""
+        with self._lock:
+            return list(reversed(self._inbox.get(user_id, ())))
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_alert_engine():
+    """Process-wide PriceAlertEngine"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = PriceAlertEngine()
+    return _engine
@@ -0,0 +1,187 @@
+"""
+Price Trend & Forecast Analytics
+Batched NumPy analytics over the weekly price series in the price store:
+rolling mean, volatility, linear and seasonally-adjusted trends, and a short-horizon
+forecast for many (crop, market) series in one call. Results are cached per
+price-store data version.
+"""
+
+import logging
+import threading
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from price_catalog import get_price_catalog
+from price_store import get_price_store
+
+logger = logging.getLogger(__name__)
+
+ROLLING_WEEKS = 4
+# 4-week % change above/below which a trend is called Bullish/Bearish (the endpoint's old ±2% rule)
+TREND_THRESHOLD = 2.0
+
+
+def _masked_linear_fit(y, mask):
+    """Least-squares slope/intercept per row over the points where mask is set (x = 0..T-1)."""
+    x = np.arange(y.shape[1], dtype=np.float64)
+    n = np.maximum(mask.sum(axis=1), 1)
+    x_mean = (mask * x).sum(axis=1) / n
+    y_mean = np.where(mask, y, 0).sum(axis=1) / n
+    dx = np.where(mask, x - x_mean[:, None], 0)
+    dy = np.where(mask, y - y_mean[:, None], 0)
+    var = (dx * dx).sum(axis=1)
+    slope = np.divide((dx * dy).sum(axis=1), var, out=np.zeros_like(var), where=var > 0)
+    return slope, y_mean - slope * x_mean
+
+
+class PriceAnalytics:
+    """Batched trend/volatility/forecast KPIs over stored weekly price series."""
+
+    def __init__(self, store=None, catalog=None):
+        self.store = store or get_price_store()
+        self.catalog = catalog or get_price_catalog()
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _load_matrix(self, series_keys, days):
+        """
+        Weekly series aligned on calendar weeks (Monday-based, up to the current week) into a
+        (K, T) matrix, NaN where a series has no point, plus the month of each week.
+        """
+        today = datetime.now().date()
+        start = today - timedelta(days=days)
+        first_week = start - timedelta(days=start.weekday())
+        length = (today - first_week).days // 7 + 1
+        series = [self.store.downsample(crop, market=market, start=start.isoformat()) for crop, market in series_keys]
+
+        prices = np.full((len(series_keys), length), np.nan)
+        last_dates = []
+        for k, points in enumerate(series):
+            for p in points:
+                week = (date.fromisoformat(p["date"]) - first_week).days // 7
+                if 0 <= week < length:
+                    prices[k, week] = p["price"]
+            last_dates.append(points[-1]["date"] if points else None)
+        # Month of each week's Thursday (the ISO week convention)
+        week_months = [(first_week + timedelta(weeks=t, days=3)).month for t in range(length)]
+        months = np.tile(np.array(week_months, dtype=np.int64), (len(series_keys), 1))
+        return prices, months, last_dates
+
+    def _seasonal_index(self, crops, months):
+        """Catalog multiplier for each (series, month); 1.0 for crops without a profile."""
+        rows = np.array([self.catalog.index.get(crop, -1) for crop in crops])
+        index = self.catalog.multipliers[np.maximum(rows, 0)[:, None], months - 1]
+        return np.where((rows >= 0)[:, None], index, 1.0)
+
+    def compute(self, series_keys, days=180, horizon_weeks=4):
+        """
+        KPIs for each (crop, market) key; market None averages all markets.
+        Returns {(crop, market): {...}} (series with fewer than two points are omitted).
+        """
+        series_keys = [tuple(key) for key in series_keys]
+        if not series_keys:
+            return {}
+        prices, months, last_dates = self._load_matrix(series_keys, days)
+        mask = ~np.isnan(prices)
+        counts = mask.sum(axis=1)
+        if prices.shape[1] < 2:
+            return {}
+        # Week of each series' latest point
+        rows = np.arange(len(prices))
+        last = prices.shape[1] - 1 - np.argmax(mask[:, ::-1], axis=1)
+        latest = prices[rows, last]
+
+        # Rolling mean over the ROLLING_WEEKS weeks up to the latest point
+        window = last[:, None] - np.arange(ROLLING_WEEKS)[::-1]
+        recent = np.where(window >= 0, prices[rows[:, None], np.maximum(window, 0)], np.nan)
+        recent_mask = ~np.isnan(recent)
+        rolling_mean = np.where(recent_mask, recent, 0).sum(axis=1) / np.maximum(recent_mask.sum(axis=1), 1)
+
+        # Volatility: std of weekly % changes
+        with np.errstate(invalid="ignore", divide="ignore"):
+            returns = np.diff(prices, axis=1) / prices[:, :-1] * 100
+        return_mask = ~np.isnan(returns)
+        n_returns = np.maximum(return_mask.sum(axis=1), 1)
+        mean_return = np.where(return_mask, returns, 0).sum(axis=1) / n_returns
+        volatility = np.sqrt(
+            np.where(return_mask, (returns - mean_return[:, None]) ** 2, 0).sum(axis=1) / n_returns
+        )
+
+        # Change over the 4 weeks up to the latest point (what the endpoint used to call the trend)
+        back = np.where(last >= 4, prices[rows, np.maximum(last - 4, 0)], np.nan)
+        first_valid = prices[rows, np.argmax(mask, axis=1)]
+        back = np.where(np.isnan(back), first_valid, back)
+        change_percent = (latest - back) / back * 100
+
+        # Linear trend on raw prices, and on seasonally adjusted prices (multiplicative decomposition)
+        linear_slope, _ = _masked_linear_fit(prices, mask)
+        crops = [crop for crop, _ in series_keys]
+        seasonal = self._seasonal_index(crops, months)
+        deseasonalized = prices / seasonal
+        trend_slope, trend_intercept = _masked_linear_fit(deseasonalized, mask)
+
+        # Forecast: extend the deseasonalized trend and re-apply the seasonal index of the target month
+        last_day = datetime.now()
+        target_month = (last_day + timedelta(weeks=horizon_weeks)).month
+        target_seasonal = self._seasonal_index(crops, np.full((len(crops), 1), target_month))[:, 0]
+        horizon_x = prices.shape[1] - 1 + horizon_weeks
+        forecast_price = (trend_intercept + trend_slope * horizon_x) * target_seasonal
+        forecast_percent = (forecast_price - latest) / latest * 100
+
+        weekly_trend_percent = trend_slope / np.where(rolling_mean > 0, rolling_mean, 1) * 100 * seasonal[rows, last]
+
+        results = {}
+        for k, key in enumerate(series_keys):
+            if counts[k] < 2 or np.isnan(latest[k]):
+                continue
+            change = float(change_percent[k])
+            results[key] = {
+                "latest_price": round(float(latest[k]), 2),
+                "latest_date": last_dates[k],
+                "points": int(counts[k]),
+                "rolling_mean": round(float(rolling_mean[k]), 2),
+                "volatility_percent": round(float(volatility[k]), 2),
+                "change_percent": round(change, 2),
+                "trend": "Bullish" if change > TREND_THRESHOLD else "Bearish" if change < -TREND_THRESHOLD else "Stable",
+                "linear_slope_per_week": round(float(linear_slope[k]), 2),
+                "seasonal_trend_percent_per_week": round(float(weekly_trend_percent[k]), 2),
+                "forecast_horizon_weeks": horizon_weeks,
+                "forecast_price": round(float(forecast_price[k]), 2),
+                "forecast_percent": round(float(forecast_percent[k]), 2),
+            }
+        return results
+
+    def analyze(self, series_keys, days=180, horizon_weeks=4):
+        """Cached compute(): reused until new prices are stored (by any process) or the day changes."""
+        version = self.store.version
+        key = (version, datetime.now().date(), tuple(tuple(k) for k in series_keys), days, horizon_weeks)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        results = self.compute(series_keys, days, horizon_weeks)
+        with self._lock:
+            # Drop results for older data versions
+            self._cache = {k: v for k, v in self._cache.items() if k[0] == version and k[1] == key[1]}
+            self._cache[key] = results
+        return results
+
+
+_analytics = None
+_analytics_lock = threading.Lock()
+
+
+def get_price_analytics():
+    """Process-wide PriceAnalytics"""
+    global _analytics
+    if _analytics is None:
+        with _analytics_lock:
+            if _analytics is None:
+                _analytics = PriceAnalytics()
+    return _analytics
+
+
+def get_market_kpis(crops, market=None, days=180, horizon_weeks=4):
+    """Convenience function: {crop: kpis} for many crops in one batched call"""
+    results = get_price_analytics().analyze([(crop, market) for crop in crops], days, horizon_weeks)
+    return {crop: kpis for (crop, _), kpis in results.items()}
@@ -0,0 +1,105 @@
+"""
+Price Catalog
+Loads data/price_catalog.json once and compiles it into lookup arrays
+(base price, declared MSP, 12 monthly multipliers per crop), so price estimates
+and seasonal histories for any crop are array lookups with no per-crop branches.
+"""
+
+import json
+import logging
+import threading
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PRICE_CATALOG_FILE = Path(__file__).parent / "data" / "price_catalog.json"
+
+
+class PriceCatalog:
+    """Column-packed crop price catalog."""
+
+    def __init__(self, entries):
+        self.crops = tuple(e["crop"] for e in entries)
+        self.index = {crop: i for i, crop in enumerate(self.crops)}
+
+        self.base_price = np.array([e["base_price"] for e in entries], dtype=np.int64)
+        # NaN where the crop has no declared MSP/FRP (market-priced)
+        self.declared_price = np.array(
+            [np.nan if e.get("declared_price") is None else e["declared_price"] for e in entries],
+            dtype=np.float64
+        )
+        # (crops, 12): row i, column month-1
+        self.multipliers = np.array([e["monthly_multipliers"] for e in entries], dtype=np.float64)
+
+        self.units = tuple(e.get("unit", "Quintal") for e in entries)
+        self.sources = tuple(e.get("source", "Estimated") for e in entries)
+        self.agmarknet_commodities = tuple(e.get("agmarknet_commodity", e["crop"]) for e in entries)
+        self.crop_mapping = {
+            e["crop"]: {"common_names": e.get("common_names", [e["crop"]]), "season": e.get("season", "")}
+            for e in entries
+        }
+        # Lower-cased crop or common name -> catalog row
+        self.name_index = {
+            name.lower(): i
+            for i, e in enumerate(entries)
+            for name in [e["crop"], *e.get("common_names", [])]
+        }
+
+    @classmethod
+    def load(cls, path=PRICE_CATALOG_FILE):
+        with open(path, 'r') as f:
+            entries = json.load(f)["crops"]
+        logger.info(f"Loaded price catalog: {len(entries)} crops")
+        return cls(entries)
+
+    def __contains__(self, crop_name):
+        return crop_name in self.index
+
+    def seasonal_multiplier(self, crop_name, month):
+        """Multiplier for one crop and month (1.0 for crops not in the catalog)."""
+        i = self.index.get(crop_name)
+        return 1.0 if i is None else float(self.multipliers[i, month - 1])
+
+    def declared(self, crop_name):
+        """(price, unit, source) of the declared MSP/FRP, or None for market-priced crops."""
+        i = self.index.get(crop_name)
+        if i is None or np.isnan(self.declared_price[i]):
+            return None
+        return int(self.declared_price[i]), self.units[i], self.sources[i]
+
+    def agmarknet_commodity(self, crop_name):
+        """Agmarknet commodity label (e.g. 'Paddy(Dhan)(Common)') for a crop or common name, or None."""
+        i = self.index.get(crop_name, self.name_index.get(crop_name.strip().lower()))
+        return None if i is None else self.agmarknet_commodities[i]
+
+    def base(self, crop_name):
+        """(base price, unit) anchoring seasonal estimates, or None."""
+        i = self.index.get(crop_name)
+        if i is None:
+            return None
+        return int(self.base_price[i]), self.units[i]
+
+    def seasonal_series(self, crop_name, months, base_price=None):
+        """
+        Seasonal price for each month in `months` (array of 1-12) in one vectorized lookup,
+        truncated to whole rupees like the scalar estimate.
+        """
+        i = self.index[crop_name]
+        base = self.base_price[i] if base_price is None else base_price
+        return (base * self.multipliers[i, np.asarray(months) - 1]).astype(np.int64)
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_price_catalog():
+    """Process-wide PriceCatalog (loaded once)."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = PriceCatalog.load()
+    return _catalog
@@ -0,0 +1,306 @@
+"""
+Price Time-Series Store
+Append-only SQLite store of MSP and mandi prices, indexed by (crop, market, date).
+Seasonal estimates are placeholders: an observed price replaces the estimate for the
+same point, and a crop's estimates are left out of queries once it has observed data.
+
+- Bulk CSV ingestion of Agmarknet-style exports (one transaction per file)
+- Range queries returning NumPy columns
+- Downsampling (day / week / month buckets) done in SQL so only the points
+  a chart needs leave the database
+
+Usage:
+    python price_store.py ingest agmarknet_paddy.csv [more.csv ...]
+"""
+
+import csv
+import logging
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).parent / "data"
+PRICE_DB_FILE = DATA_DIR / "prices.db"
+
+# Market name used for state-level MSP points (not tied to a mandi)
+MSP_MARKET = "MSP"
+# Source tag of points seeded from the seasonal model rather than observed
+ESTIMATE_SOURCE = "Seasonal estimate"
+
+# Agmarknet export column names (with common variants) -> store columns
+CSV_COLUMNS = {
+    "commodity": ("Commodity",),
+    "market": ("Market Name", "Market"),
+    "date": ("Price Date", "Arrival_Date", "Arrival Date", "Date"),
+    "min_price": ("Min Price (Rs./Quintal)", "Min_x0020_Price", "Min Price"),
+    "max_price": ("Max Price (Rs./Quintal)", "Max_x0020_Price", "Max Price"),
+    "modal_price": ("Modal Price (Rs./Quintal)", "Modal_x0020_Price", "Modal Price"),
+    "arrivals": ("Arrivals (Tonnes)", "Arrivals"),
+}
+CSV_DATE_FORMATS = ("%d %b %Y", "%d-%m-%Y", "%d/%m/%Y", "%Y-%m-%d", "%d-%b-%Y")
+
+# SQLite bucket key for each downsampling bucket. Weeks are keyed on their Monday, so a
+# week spanning New Year stays one bucket (unlike strftime's %W)
+BUCKETS = {
+    "day": "date",
+    "week": "date(date, '-6 days', 'weekday 1')",
+    "month": "strftime('%Y-%m', date)",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    crop TEXT NOT NULL,
+    market TEXT NOT NULL,
+    date TEXT NOT NULL,
+    modal_price REAL NOT NULL,
+    min_price REAL,
+    max_price REAL,
+    arrivals REAL,
+    source TEXT,
+    PRIMARY KEY (crop, market, date)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_prices_crop_date ON prices (crop, date);
+CREATE TABLE IF NOT EXISTS price_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO price_meta VALUES ('version', 0);
+"""
+
+
+def _parse_date(value):
+    value = value.strip()
+    for fmt in CSV_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized date: {value}")
+
+
+def _parse_number(value):
+    value = (value or "").strip().replace(",", "")
+    return float(value) if value and value.upper() != "NR" else None
+
+
+class PriceStore:
+    """SQLite-backed price series; one connection per thread."""
+
+    def __init__(self, db_path=PRICE_DB_FILE, crop_aliases=None):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Lower-cased commodity name fragment -> registry crop name
+        self.crop_aliases = crop_aliases or {}
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._listeners = []
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def normalize_crop(self, commodity):
+        """Maps an Agmarknet commodity label (e.g. 'Paddy(Dhan)(Common)') to a registry crop."""
+        label = commodity.strip().lower()
+        for alias, crop in self.crop_aliases.items():
+            if alias in label:
+                return crop
+        return commodity.strip().title()
+
+    def append(self, rows, source=None):
+        """
+        Appends rows of dicts {crop, market, date, modal_price, [min_price, max_price, arrivals, source]}.
+        Existing (crop, market, date) points are kept (append-only), except seasonal estimates,
+        which an observed price replaces; returns the number of points stored.
+        """
+        records = [
+            (
+                r["crop"], r.get("market") or MSP_MARKET, r["date"], float(r["modal_price"]),
+                r.get("min_price"), r.get("max_price"), r.get("arrivals"), r.get("source", source),
+                ESTIMATE_SOURCE, ESTIMATE_SOURCE
+            )
+            for r in rows
+        ]
+        if not records:
+            return 0
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                before = conn.total_changes
+                conn.executemany(
+                    "INSERT INTO prices VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (crop, market, date) DO UPDATE SET "
+                    "modal_price = excluded.modal_price, min_price = excluded.min_price, "
+                    "max_price = excluded.max_price, arrivals = excluded.arrivals, source = excluded.source "
+                    "WHERE prices.source = ? AND excluded.source IS NOT ?",
+                    records
+                )
+                inserted = conn.total_changes - before
+                if inserted:
+                    # Same transaction as the points, so every process sees the new version with them
+                    conn.execute("UPDATE price_meta SET value = value + 1 WHERE key = 'version'")
+        if inserted:
+            for callback in self._listeners:
+                try:
+                    callback(rows, source)
+                except Exception as e:
+                    logger.error(f"Price store listener failed: {e}")
+        return inserted
+
+    @property
+    def version(self):
+        """Data version, bumped by every write that stores points (from any process), so analytics can cache per version."""
+        return self._conn().execute("SELECT value FROM price_meta WHERE key = 'version'").fetchone()[0]
+
+    def add_listener(self, callback):
+        """Registers callback(rows, source), called after appends that stored new points."""
+        self._listeners.append(callback)
+
+    def ingest_csv(self, path, source="Agmarknet"):
+        """Bulk-loads an Agmarknet-style CSV export; returns (inserted, skipped)."""
+        path = Path(path)
+        rows, skipped = [], 0
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            header = {name.strip(): name for name in reader.fieldnames or []}
+            columns = {
+                key: next((header[c] for c in candidates if c in header), None)
+                for key, candidates in CSV_COLUMNS.items()
+            }
+            missing = [k for k in ("commodity", "market", "date", "modal_price") if columns[k] is None]
+            if missing:
+                raise ValueError(f"{path.name} is missing columns: {missing}")
+
+            for record in reader:
+                try:
+                    modal = _parse_number(record[columns["modal_price"]])
+                    if modal is None:
+                        skipped += 1
+                        continue
+                    rows.append({
+                        "crop": self.normalize_crop(record[columns["commodity"]]),
+                        "market": record[columns["market"]].strip(),
+                        "date": _parse_date(record[columns["date"]]),
+                        "modal_price": modal,
+                        "min_price": _parse_number(record.get(columns["min_price"])) if columns["min_price"] else None,
+                        "max_price": _parse_number(record.get(columns["max_price"])) if columns["max_price"] else None,
+                        "arrivals": _parse_number(record.get(columns["arrivals"])) if columns["arrivals"] else None,
+                    })
+                except (ValueError, KeyError, AttributeError):
+                    skipped += 1
+        inserted = self.append(rows, source=source)
+        logger.info(f"Ingested {path.name}: {inserted} new points, {len(rows) - inserted} duplicates, {skipped} skipped")
+        return inserted, skipped
+
+    def has_series(self, crop, market=None):
+        query = "SELECT 1 FROM prices WHERE crop = ?" + (" AND market = ?" if market else "") + " LIMIT 1"
+        params = (crop, market) if market else (crop,)
+        return self._conn().execute(query, params).fetchone() is not None
+
+    def has_observed(self, crop):
+        """Whether any stored point of the crop is observed rather than a seasonal estimate."""
+        row = self._conn().execute(
+            "SELECT 1 FROM prices WHERE crop = ? AND source IS NOT ? LIMIT 1", (crop, ESTIMATE_SOURCE)
+        ).fetchone()
+        return row is not None
+
+    def _series_filter(self, crop, market, start, end):
+        """WHERE clause and params for one crop's points (estimates dropped once it has observed data)."""
+        sql = " WHERE crop = ?"
+        params = [crop]
+        if market:
+            sql += " AND market = ?"
+            params.append(market)
+        if start:
+            sql += " AND date >= ?"
+            params.append(start)
+        if end:
+            sql += " AND date <= ?"
+            params.append(end)
+        if self.has_observed(crop):
+            sql += " AND source IS NOT ?"
+            params.append(ESTIMATE_SOURCE)
+        return sql, params
+
+    def latest_date(self, crop, market=None):
+        """Most recent ISO date stored for a crop (optionally one market), or None."""
+        query = "SELECT MAX(date) FROM prices WHERE crop = ?" + (" AND market = ?" if market else "")
+        params = (crop, market) if market else (crop,)
+        return self._conn().execute(query, params).fetchone()[0]
+
+    def markets(self, crop):
+        rows = self._conn().execute("SELECT DISTINCT market FROM prices WHERE crop = ?", (crop,)).fetchall()
+        return [r[0] for r in rows]
+
+    def query(self, crop, market=None, start=None, end=None):
+        """
+        Raw points in [start, end] (ISO dates, inclusive) as NumPy columns:
+        {"date": datetime64[D], "price": float64, "market": object}
+        """
+        where, params = self._series_filter(crop, market, start, end)
+        rows = self._conn().execute(
+            "SELECT date, modal_price, market FROM prices" + where + " ORDER BY date", params
+        ).fetchall()
+        return {
+            "date": np.array([r[0] for r in rows], dtype="datetime64[D]"),
+            "price": np.array([r[1] for r in rows], dtype=np.float64),
+            "market": np.array([r[2] for r in rows], dtype=object),
+        }
+
+    def downsample(self, crop, market=None, start=None, end=None, bucket="week"):
+        """
+        Averages modal prices per bucket (across markets when market is None).
+        Returns [{"date": last ISO date in bucket, "price", "min_price", "max_price", "points"}].
+        """
+        where, params = self._series_filter(crop, market, start, end)
+        sql = (
+            "SELECT MAX(date), AVG(modal_price), MIN(COALESCE(min_price, modal_price)), "
+            "MAX(COALESCE(max_price, modal_price)), COUNT(*) FROM prices" + where
+        )
+        sql += f" GROUP BY {BUCKETS[bucket]} ORDER BY MAX(date)"
+        return [
+            {"date": r[0], "price": r[1], "min_price": r[2], "max_price": r[3], "points": r[4]}
+            for r in self._conn().execute(sql, params).fetchall()
+        ]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_price_store():
+    """Process-wide PriceStore (commodity aliases come from the MSP crop mapping)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                from msp_fetcher import MSPFetcher
+                aliases = {
+                    name.lower(): crop
+                    for crop, info in MSPFetcher.CROP_MAPPING.items()
+                    for name in info["common_names"]
+                }
+                _store = PriceStore(crop_aliases=aliases)
+    return _store
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 3 or sys.argv[1] != "ingest":
+        print(__doc__)
+        sys.exit(1)
+    store = get_price_store()
+    for csv_path in sys.argv[2:]:
+        store.ingest_csv(csv_path)
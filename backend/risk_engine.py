@@ -0,0 +1,196 @@
+"""
+Vectorized Disease Risk Engine
+Packs DISEASE_RISK_PROFILES into arrays and scores every disease against any number
+of weather rows in one NumPy pass. Results match
+WeatherDiseaseRiskCalculator.calculate_disease_risk exactly.
+"""
+
+import logging
+from datetime import datetime
+
+import numpy as np
+
+from advisory_rules import get_advisory_rules
+from weather_disease_risk import WeatherDiseaseRiskCalculator
+from weather_providers import get_current_weather
+
+logger = logging.getLogger(__name__)
+
+# Risk level codes, ordered by severity
+RISK_LEVELS = ("Low", "Moderate", "High", "Severe", "Critical")
+LOW, MODERATE, HIGH, SEVERE, CRITICAL = range(len(RISK_LEVELS))
+RISK_SCORES = np.array([WeatherDiseaseRiskCalculator._get_risk_score(level) for level in RISK_LEVELS])
+
+# Defaults used by the scalar path when a weather key is missing
+DEFAULT_TEMP = 25
+DEFAULT_HUMIDITY = 70
+DEFAULT_RAINFALL_LEVEL = 5    # _calculate_risk_level default
+DEFAULT_RAINFALL_FACTORS = 0  # _get_risk_factors default
+
+
+class VectorizedRiskEngine:
+    """Column-packed disease profiles + batch risk scoring over (weather rows x diseases)."""
+
+    def __init__(self, profiles=None, crop_diseases=None):
+        profiles = profiles or WeatherDiseaseRiskCalculator.DISEASE_RISK_PROFILES
+        self.crop_diseases = crop_diseases or WeatherDiseaseRiskCalculator.CROP_DISEASES
+
+        self.disease_names = tuple(profiles.keys())
+        self.disease_index = {name: i for i, name in enumerate(self.disease_names)}
+        values = [profiles[name] for name in self.disease_names]
+
+        self.temp_min = np.array([p["optimal_temp"][0] for p in values], dtype=np.float64)
+        self.temp_max = np.array([p["optimal_temp"][1] for p in values], dtype=np.float64)
+        self.humidity_threshold = np.array([p["humidity_threshold"] for p in values], dtype=np.float64)
+        self.rainfall_flag = np.array([bool(p["rainfall_factor"]) for p in values])
+        # Bit m is set when month m is a peak month
+        self.peak_mask = np.array(
+            [sum(1 << m for m in p["peak_season"]) for p in values], dtype=np.int64
+        )
+        base = [p.get("base_risk", "Moderate") for p in values]
+        self.base_high = np.array([b == "High" for b in base])
+        self.base_moderate = np.array([b == "Moderate" for b in base])
+        self.peak_season_names = tuple(p.get("peak_season_name", "Monsoon") for p in values)
+
+    def compute(self, temps, humidities, rainfalls, months):
+        """
+        Scores every disease for every weather row.
+
+        temps, humidities, rainfalls: shape (R,); months: scalar or shape (R,)
+        Returns a dict of (R, D) arrays: "level" (index into RISK_LEVELS), "score",
+        and the condition masks "temp_optimal", "humidity_high", "rain_active", "in_season".
+        """
+        t = np.asarray(temps, dtype=np.float64)[:, None]
+        h = np.asarray(humidities, dtype=np.float64)[:, None]
+        r = np.asarray(rainfalls, dtype=np.float64)[:, None]
+        m = np.broadcast_to(np.asarray(months, dtype=np.int64), t.shape[:1])[:, None]
+
+        temp_optimal = (self.temp_min <= t) & (t <= self.temp_max)
+        temp_near = (np.abs(t - self.temp_min) < 5) | (np.abs(t - self.temp_max) < 5)
+        temp_factor = np.where(temp_optimal, 1.3, np.where(temp_near, 1.1, 0.8))
+
+        humidity_high = h > self.humidity_threshold
+        humidity_factor = np.where(
+            humidity_high, 1.4, np.where(h > self.humidity_threshold - 10, 1.2, 0.9)
+        )
+
+        rain_active = self.rainfall_flag & (r > 5)
+        rainfall_factor = np.where(rain_active, 1.3, 1.0)
+
+        in_season = ((self.peak_mask >> m) & 1).astype(bool)
+        seasonal_factor = np.where(in_season, 1.3, 0.9)
+
+        # Same multiplication order as the scalar path, so float results are bit-identical
+        combined = temp_factor * humidity_factor * rainfall_factor * seasonal_factor
+
+        level_high_base = np.select(
+            [combined > 1.4, combined > 1.1], [CRITICAL, HIGH], default=MODERATE
+        )
+        level_moderate_base = np.select(
+            [combined > 1.5, combined > 1.2, combined > 0.9], [SEVERE, HIGH, MODERATE], default=LOW
+        )
+        level = np.where(
+            self.base_high, level_high_base, np.where(self.base_moderate, level_moderate_base, LOW)
+        )
+
+        return {
+            "level": level,
+            "score": RISK_SCORES[level],
+            "temp_optimal": temp_optimal,
+            "humidity_high": humidity_high,
+            "rain_active": rain_active,
+            "in_season": in_season,
+        }
+
+    def _prepare(self, weather_rows, month):
+        """Extracts the weather columns and scores all diseases once."""
+        columns = {
+            "temps": [w.get("temperature_celsius", DEFAULT_TEMP) for w in weather_rows],
+            "humidities": [w.get("humidity_percent", DEFAULT_HUMIDITY) for w in weather_rows],
+            # The scalar path uses different rainfall defaults for scoring and for the factor text
+            "rain_level": [w.get("rainfall_mm", DEFAULT_RAINFALL_LEVEL) for w in weather_rows],
+            "rain_text": [w.get("rainfall_mm", DEFAULT_RAINFALL_FACTORS) for w in weather_rows],
+        }
+        result = self.compute(columns["temps"], columns["humidities"], columns["rain_level"], month)
+        result["rain_text_active"] = self.rainfall_flag & (
+            np.asarray(columns["rain_text"], dtype=np.float64)[:, None] > 5
+        )
+        return columns, result
+
+    def _assemble(self, diseases, columns, result):
+        """Materializes the per-row assessment dicts for a subset of diseases."""
+        idx = [self.disease_index[d] for d in diseases]
+        level = result["level"][:, idx].tolist()
+        score = result["score"][:, idx].tolist()
+        temp_optimal = result["temp_optimal"][:, idx].tolist()
+        humidity_high = result["humidity_high"][:, idx].tolist()
+        rain_active = result["rain_text_active"][:, idx].tolist()
+        in_season = result["in_season"][:, idx].tolist()
+        advisories = get_advisory_rules()
+
+        batch = []
+        for row in range(len(level)):
+            temp = columns["temps"][row]
+            humidity = columns["humidities"][row]
+            rainfall = columns["rain_text"][row]
+            assessments = []
+            for j, disease_name in enumerate(diseases):
+                factors = []
+                if temp_optimal[row][j]:
+                    factors.append(f"Optimal temperature ({temp}°C) for disease development")
+                if humidity_high[row][j]:
+                    factors.append(f"High humidity ({humidity}%) favors pathogen spread")
+                if rain_active[row][j]:
+                    factors.append(f"Recent rainfall ({rainfall}mm) increases infection risk")
+                if in_season[row][j]:
+                    factors.append(f"Currently in peak disease season ({self.peak_season_names[idx[j]]})")
+
+                risk_level = RISK_LEVELS[level[row][j]]
+                assessments.append({
+                    "name": disease_name,
+                    "risk_level": risk_level,
+                    "risk_score": score[row][j],
+                    "contributing_factors": factors if factors else ["General seasonal risk"],
+                    "advisory": advisories.disease_advisory(disease_name, risk_level, temp, humidity)
+                })
+            batch.append(assessments)
+        return batch
+
+    def _crop_diseases(self, crop_name):
+        return [d for d in self.crop_diseases.get(crop_name, []) if d in self.disease_index]
+
+    def calculate_batch(self, crop_name, weather_rows, month=None):
+        """
+        Batch equivalent of WeatherDiseaseRiskCalculator.calculate_disease_risk:
+        returns one list of risk assessments per weather row.
+        """
+        if not weather_rows:
+            return []
+        columns, result = self._prepare(weather_rows, month or datetime.now().month)
+        return self._assemble(self._crop_diseases(crop_name), columns, result)
+
+    def calculate_all_crops(self, weather_data, month=None):
+        """Risk assessments for every registry crop against one weather snapshot (one pass)."""
+        columns, result = self._prepare([weather_data], month or datetime.now().month)
+        return {
+            crop: self._assemble(self._crop_diseases(crop), columns, result)[0]
+            for crop in self.crop_diseases
+        }
+
+
+_engine = None
+
+
+def get_engine():
+    """Shared engine instance (profiles are packed once per process)."""
+    global _engine
+    if _engine is None:
+        _engine = VectorizedRiskEngine()
+    return _engine
+
+
+def get_all_crop_disease_risks(weather=None):
+    """Convenience function: disease risks for every registry crop in one vectorized pass"""
+    if weather is None:
+        weather = get_current_weather()
+    return get_engine().calculate_all_crops(weather)
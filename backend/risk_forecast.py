@@ -0,0 +1,184 @@
+"""
+Multi-Day Disease Risk Forecast
+Turns a 7-14 day hourly or daily weather series into a per-day risk curve per disease.
+
+The series is consumed as a stream: records are folded into the current day's
+accumulators, and leaf-wetness / high-humidity durations are tracked over a rolling
+window of days with running sums, so working memory does not grow with the series.
+"""
+
+import logging
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from risk_engine import get_engine, RISK_LEVELS, RISK_SCORES, SEVERE, CRITICAL
+from weather_disease_risk import WeatherDiseaseRiskCalculator
+
+logger = logging.getLogger(__name__)
+
+# Leaf wetness: an hour counts as wet when RH is at/near saturation or it rains
+LEAF_WETNESS_RH = 90
+# Rolling-window thresholds (average hours per day) that raise the risk by one level
+WET_HOURS_PER_DAY = 10
+HUMID_HOURS_PER_DAY = 12
+
+
+def _record_day_and_hours(record):
+    """
+    Returns (date string, hours the record covers), or None for a record without a
+    usable timestamp/date. Daily records have no time part.
+    """
+    stamp = record.get("timestamp") or record.get("date")
+    if not isinstance(stamp, str):
+        return None
+    try:
+        datetime.strptime(stamp[:10], "%Y-%m-%d")
+    except ValueError:
+        return None
+    if "T" in stamp:
+        return stamp[:10], record.get("hours", 1)
+    return stamp[:10], record.get("hours", 24)
+
+
+class _DayAccumulator:
+    """Sums for the day currently being streamed."""
+
+    def __init__(self, date, num_diseases):
+        self.date = date
+        self.hours = 0
+        self.temp_hours = 0.0
+        self.humidity_hours = 0.0
+        self.rainfall = 0.0
+        self.wet_hours = 0.0
+        self.humid_hours = np.zeros(num_diseases)
+
+    def add(self, record, hours, humidity_threshold):
+        temp = record.get("temperature_celsius", 25)
+        humidity = record.get("humidity_percent", 70)
+        rainfall = record.get("rainfall_mm", 0)
+
+        self.hours += hours
+        self.temp_hours += temp * hours
+        self.humidity_hours += humidity * hours
+        self.rainfall += rainfall
+
+        if "leaf_wetness_hours" in record:
+            self.wet_hours += record["leaf_wetness_hours"]
+        elif humidity >= LEAF_WETNESS_RH or rainfall > 0:
+            self.wet_hours += hours
+        self.humid_hours += (humidity > humidity_threshold) * hours
+
+
+class RiskForecaster:
+    """Streams a weather series through the vectorized risk engine, one day at a time."""
+
+    def __init__(self, engine=None, window_days=3):
+        self.engine = engine or get_engine()
+        self.window_days = window_days
+        # Highest level each profile can reach (matches the scalar base_risk ladder)
+        self.max_level = np.where(
+            self.engine.base_high, CRITICAL, np.where(self.engine.base_moderate, SEVERE, 0)
+        )
+
+    def iter_days(self, series):
+        """
+        Yields one dict per day: date, daily weather summary, rolling wetness/humidity
+        features and per-disease level/score arrays (indexed like engine.disease_names).
+        """
+        num_diseases = len(self.engine.disease_names)
+        window = deque()
+        wet_sum = 0.0
+        humid_sum = np.zeros(num_diseases)
+        day = None
+
+        def finish(acc):
+            nonlocal wet_sum, humid_sum
+            window.append((acc.wet_hours, acc.humid_hours))
+            wet_sum += acc.wet_hours
+            humid_sum = humid_sum + acc.humid_hours
+            if len(window) > self.window_days:
+                old_wet, old_humid = window.popleft()
+                wet_sum -= old_wet
+                humid_sum = humid_sum - old_humid
+            return self._score_day(acc, wet_sum / len(window), humid_sum / len(window))
+
+        for record in series:
+            day_and_hours = _record_day_and_hours(record)
+            if day_and_hours is None:
+                logger.warning(f"Skipping forecast record without a valid timestamp/date: {record}")
+                continue
+            date, hours = day_and_hours
+            if day is not None and date != day.date:
+                yield finish(day)
+                day = None
+            if day is None:
+                day = _DayAccumulator(date, num_diseases)
+            day.add(record, hours, self.engine.humidity_threshold)
+        if day is not None:
+            yield finish(day)
+
+    def _score_day(self, acc, wet_hours, humid_hours):
+        hours = acc.hours or 1
+        temp = acc.temp_hours / hours
+        humidity = acc.humidity_hours / hours
+        month = datetime.strptime(acc.date, "%Y-%m-%d").month
+
+        result = self.engine.compute([temp], [humidity], [acc.rainfall], month)
+        level = result["level"][0]
+
+        # Sustained leaf wetness (rain-driven pathogens) or long humid spells raise risk one level
+        wet = (wet_hours >= WET_HOURS_PER_DAY) & self.engine.rainfall_flag
+        humid = humid_hours >= HUMID_HOURS_PER_DAY
+        bumped = np.maximum(level, np.where(wet | humid, np.minimum(level + 1, self.max_level), level))
+
+        return {
+            "date": acc.date,
+            "temperature_celsius": round(temp, 1),
+            "humidity_percent": round(humidity, 1),
+            "rainfall_mm": round(acc.rainfall, 2),
+            "leaf_wetness_hours": round(float(wet_hours), 1),
+            "humid_hours": humid_hours,
+            "level": bumped,
+            "score": RISK_SCORES[bumped]
+        }
+
+    def forecast(self, series, diseases=None):
+        """
+        Per-disease risk trajectory over the series:
+            {disease: {"peak_day", "peak_risk_level", "peak_risk_score", "risk_trajectory": [...]}}
+        """
+        names = self.engine.disease_names
+        wanted = [names.index(d) for d in (diseases or names) if d in self.engine.disease_index]
+        curves = {names[i]: [] for i in wanted}
+
+        for day in self.iter_days(series):
+            for i in wanted:
+                curves[names[i]].append({
+                    "date": day["date"],
+                    "risk_level": RISK_LEVELS[day["level"][i]],
+                    "risk_score": int(day["score"][i]),
+                    "leaf_wetness_hours": day["leaf_wetness_hours"],
+                    "high_humidity_hours": round(float(day["humid_hours"][i]), 1)
+                })
+
+        forecast = {}
+        for name, curve in curves.items():
+            if not curve:
+                continue
+            # Earliest day with the highest score
+            peak = max(curve, key=lambda point: point["risk_score"])
+            forecast[name] = {
+                "peak_day": peak["date"],
+                "peak_risk_level": peak["risk_level"],
+                "peak_risk_score": peak["risk_score"],
+                "risk_trajectory": curve
+            }
+        return forecast
+
+
+def get_disease_risk_forecast(region="Karnataka", days=7, diseases=None):
+    """Convenience function: risk forecast over the simulated series for a region"""
+    series = WeatherDiseaseRiskCalculator.get_simulated_forecast(region, days)
+    return RiskForecaster().forecast(series, diseases)
@@ -0,0 +1,189 @@
+"""
+Write-Behind Settings Store
+Keeps user settings in memory and flushes changes to disk in debounced batches
+"""
+
+import atexit
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER = "default"
+MAX_USER_ID_LENGTH = 128
+# Ids made only of these characters are used as-is in file names; any other id is hex-encoded
+# behind a "~" (which plain ids can't contain), so distinct ids never share a file, even on
+# case-insensitive file systems
+PLAIN_USER_ID = re.compile(r"[a-z0-9_-]+")
+
+
+class SettingsStore:
+    """In-memory settings cache with debounced write-behind persistence.
+
+    Reads never touch the disk after a user's settings are first loaded.
+    Updates mark the user dirty and (re)arm a timer; when it fires, every
+    dirty user is written out in one pass. ``flush()`` is registered with
+    ``atexit`` so pending changes survive a normal shutdown. At most
+    ``max_cached_users`` users are kept in memory; the least recently used
+    ones with nothing left to flush are dropped and reloaded on demand.
+    """
+
+    def __init__(self, settings_dir, defaults, flush_delay=2.0, max_cached_users=1024):
+        self.settings_dir = Path(settings_dir)
+        self.settings_dir.mkdir(parents=True, exist_ok=True)
+        self.defaults = dict(defaults)
+        self.flush_delay = flush_delay
+        self.max_cached_users = max_cached_users
+
+        self._data = OrderedDict()
+        self._dirty = set()
+        self._flushing = set()
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._timer = None
+        self._listeners = []
+
+        atexit.register(self.flush)
+
+    def add_listener(self, callback):
+        """Registers callback(user_id, settings), called after every put()."""
+        self._listeners.append(callback)
+
+    @staticmethod
+    def is_valid_user_id(user_id):
+        return isinstance(user_id, str) and 0 < len(user_id) <= MAX_USER_ID_LENGTH
+
+    @staticmethod
+    def _validate(user_id):
+        if not SettingsStore.is_valid_user_id(user_id):
+            raise ValueError(f"Invalid user id (1-{MAX_USER_ID_LENGTH} characters): {str(user_id)[:MAX_USER_ID_LENGTH]!r}")
+
+    def user_ids(self):
+        """Every user with settings in memory or on disk."""
+        with self._lock:
+            ids = set(self._data)
+        for path in self.settings_dir.glob("user_settings*.json"):
+            stem = path.stem
+            if stem == "user_settings":
+                ids.add(DEFAULT_USER)
+                continue
+            key = stem[len("user_settings_"):]
+            if key.startswith("~"):
+                try:
+                    key = bytes.fromhex(key[1:]).decode("utf-8")
+                except ValueError:
+                    continue
+            ids.add(key)
+        return sorted(ids)
+
+    def _path_for(self, user_id):
+        """The default user keeps the legacy file name; others get their own file."""
+        if user_id == DEFAULT_USER:
+            return self.settings_dir / "user_settings.json"
+        key = user_id if PLAIN_USER_ID.fullmatch(user_id) else "~" + user_id.encode("utf-8").hex()
+        return self.settings_dir / f"user_settings_{key}.json"
+
+    def _load_from_disk(self, user_id):
+        path = self._path_for(user_id)
+        try:
+            if path.exists():
+                with open(path, 'r') as f:
+                    return {**self.defaults, **json.load(f)}
+        except Exception as e:
+            logger.error(f"Error loading settings for {user_id}: {str(e)}")
+        return dict(self.defaults)
+
+    @staticmethod
+    def _copy(settings):
+        # Lists (crop_favorites) are mutated in place by callers, so copy them too
+        return {k: (list(v) if isinstance(v, list) else v) for k, v in settings.items()}
+
+    def _evict(self):
+        """Drops least recently used users beyond max_cached_users (never unsaved ones)."""
+        if len(self._data) <= self.max_cached_users:
+            return
+        for user_id in list(self._data):
+            if len(self._data) <= self.max_cached_users:
+                break
+            if user_id not in self._dirty and user_id not in self._flushing:
+                del self._data[user_id]
+
+    def get(self, user_id=DEFAULT_USER):
+        """Return a private copy of the user's settings (disk is hit only on first access)."""
+        self._validate(user_id)
+        with self._lock:
+            settings = self._data.get(user_id)
+            if settings is None:
+                settings = self._load_from_disk(user_id)
+                self._data[user_id] = settings
+                self._evict()
+            else:
+                self._data.move_to_end(user_id)
+            return self._copy(settings)
+
+    def put(self, settings, user_id=DEFAULT_USER):
+        """Replace the user's settings in memory and schedule a flush."""
+        self._validate(user_id)
+        with self._lock:
+            self._data[user_id] = {**self.defaults, **self._copy(settings)}
+            self._data.move_to_end(user_id)
+            self._dirty.add(user_id)
+            self._evict()
+            self._schedule_flush()
+            settings = self._copy(self._data[user_id])
+        for callback in self._listeners:
+            try:
+                callback(user_id, settings)
+            except Exception as e:
+                logger.error(f"Settings listener failed for {user_id}: {str(e)}")
+        return True
+
+    def _schedule_flush(self):
+        # Debounce: every update pushes the flush out by flush_delay
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(self.flush_delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self):
+        """Write every dirty user's settings to disk. Returns False if any write failed."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            pending = {user_id: self._data[user_id] for user_id in self._dirty}
+            self._dirty.clear()
+            # Kept in memory until written, so an eviction can't expose the old file in between
+            self._flushing.update(pending)
+
+        with self._write_lock:
+            ok = self._write_pending(pending)
+        with self._lock:
+            self._flushing.difference_update(pending)
+            self._evict()
+        if pending and ok:
+            logger.info(f"Flushed settings for {len(pending)} user(s)")
+        return ok
+
+    def _write_pending(self, pending):
+        ok = True
+        for user_id, settings in pending.items():
+            # last_updated is regenerated on read, so it is never persisted
+            settings_to_save = {k: v for k, v in settings.items() if k != 'last_updated'}
+            path = self._path_for(user_id)
+            tmp_path = path.with_suffix(".json.tmp")
+            try:
+                with open(tmp_path, 'w') as f:
+                    json.dump(settings_to_save, f, indent=2)
+                tmp_path.replace(path)
+            except Exception as e:
+                logger.error(f"Error saving settings for {user_id}: {str(e)}")
+                with self._lock:
+                    self._dirty.add(user_id)
+                ok = False
+        return ok
@@ -0,0 +1,92 @@
+"""
+Checks that the batch advisory evaluator matches CultivationAdvisor row for row over random
+farms (crops, sowing dates, weather), that invalid rows become error lines without stopping
+the batch, and reports the timing of both paths.
+"""
+import json
+import random
+import time
+from datetime import date, timedelta
+
+from cultivation_advisor import CultivationAdvisor
+from advisory_batch import evaluate_batch, iter_ndjson
+
+ADVISORY_KEYS = (
+    "crop", "season", "current_stage", "status", "recommendation", "weather_assessment",
+    "immediate_actions", "water_management", "nutrition_timing", "disease_prevention"
+)
+
+
+def random_farms(n, today, seed=7):
+    rng = random.Random(seed)
+    crops = list(CultivationAdvisor.CULTIVATION_CALENDAR)
+    rows = []
+    for i in range(n):
+        rows.append({
+            "farm_id": i,
+            "crop": rng.choice(crops),
+            "sowing_date": (today - timedelta(days=rng.randint(0, 300))).isoformat(),
+            "weather": {
+                "temperature_celsius": round(rng.uniform(8, 42), 1),
+                "humidity_percent": round(rng.uniform(30, 100), 1),
+                "rainfall_mm": round(rng.uniform(0, 25), 2)
+            }
+        })
+    return rows
+
+
+def verify_parity(rows, today):
+    for row, batch in zip(rows, evaluate_batch(rows, today)):
+        scalar = CultivationAdvisor.get_weather_based_recommendations(row["crop"], row["weather"], row["sowing_date"])
+        # The scalar path resolves the stage against the real clock
+        expected = {k: scalar[k] for k in ADVISORY_KEYS if k in scalar}
+        assert {k: batch[k] for k in ADVISORY_KEYS if k in batch} == expected, (row, batch, scalar)
+    print(f"Parity OK: {len(rows)} farms identical")
+
+
+def verify_invalid_rows(rows, today):
+    def bad(i, **fields):
+        return {**rows[i], "farm_id": f"bad-{i}", **fields}
+
+    bad_rows = {
+        1: bad(1, sowing_date="07/01/2026"),
+        3: ["not", "a", "row"],
+        4: bad(4, weather={"humidity_percent": "wet"}),
+        # Accepted by date.fromisoformat, rejected or misread by numpy's datetime64
+        7: bad(7, sowing_date="2026-W01-1"),
+        8: bad(8, sowing_date="20260101"),
+        9: bad(9, weather={**rows[9]["weather"], "temperature_celsius": float("nan")}),
+        10: bad(10, weather={**rows[10]["weather"], "rainfall_mm": float("inf")}),
+        11: bad(11, weather={**rows[11]["weather"], "humidity_percent": True}),
+    }
+    lines = [json.dumps(bad_rows.get(i, row)) for i, row in enumerate(rows)]
+    lines[6] = '{"farm_id": 6, "crop":'
+    expected = list(evaluate_batch(rows, today))
+
+    results = list(evaluate_batch(iter_ndjson(lines), today, chunk_size=4))
+    assert len(results) == len(rows), results
+    errors = {i for i, result in enumerate(results) if "error" in result}
+    assert errors == {1, 3, 4, 6, 7, 8, 9, 10, 11}, results
+    assert results[1]["farm_id"] == "bad-1" and results[3]["farm_id"] is None, results
+    assert all(results[i] == expected[i] for i in range(len(rows)) if i not in errors), results
+    print(f"Invalid rows OK: {len(errors)} error lines, {len(rows) - len(errors)} farms evaluated")
+
+
+def benchmark(rows, today):
+    start = time.perf_counter()
+    for row in rows:
+        CultivationAdvisor.get_weather_based_recommendations(row["crop"], row["weather"], row["sowing_date"])
+    scalar = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = list(evaluate_batch(rows, today))
+    batch = time.perf_counter() - start
+    print(f"Scalar: {scalar * 1000:8.1f} ms   Batch: {batch * 1000:8.1f} ms   ({len(results)} farms)")
+
+
+if __name__ == "__main__":
+    today = date.today()
+    farms = random_farms(20000, today)
+    verify_parity(farms[:5000], today)
+    verify_invalid_rows(farms[:16], today)
+    benchmark(farms, today)
@@ -0,0 +1,98 @@
+"""
+Checks the compiled advisory rule tables against a direct scan of the rules in
+data/advisory_rules.json (including values sitting exactly on rule boundaries), and
+reports the per-evaluation cost of the scalar lookup, the batch path and the direct scan.
+"""
+import random
+import time
+
+from advisory_rules import get_advisory_rules
+from cultivation_advisor import CultivationAdvisor
+
+N_EVALUATIONS = 50000
+
+
+def stage_names():
+    names = {"Maturity", None}
+    for seasons in CultivationAdvisor.STAGE_TIMELINE.values():
+        for stages in seasons.values():
+            names.update(name for name, _ in stages)
+    return sorted(names, key=str)
+
+
+def boundary_values(rules):
+    """Every rule boundary, plus values just either side of it."""
+    values = {v: set() for v in range(len(rules.variables))}
+    for checks in rules.checks:
+        for v, lo, _, hi, _ in checks:
+            for b in (lo, hi):
+                if abs(b) != float("inf"):
+                    values[v].update((b - 0.1, b, b + 0.1))
+    return {v: sorted(points) for v, points in values.items()}
+
+
+def random_cases(rules, n, seed=11):
+    rng = random.Random(seed)
+    crops = list(CultivationAdvisor.CULTIVATION_CALENDAR) + ["Unknown"]
+    stages = stage_names()
+    edges = boundary_values(rules)
+    cases = []
+    for i in range(n):
+        weather = {}
+        for v, key in enumerate(rules.weather_keys):
+            if i % 10 == 0 and edges[v]:
+                weather[key] = rng.choice(edges[v])
+            elif i % 97 != 0:
+                # Every 97th farm omits its weather so the defaults apply
+                weather[key] = round(rng.uniform(0, 100), 1)
+        cases.append((rng.choice(crops), rng.choice(stages), weather))
+    return cases
+
+
+def direct_scan(rules, crop, stage, weather):
+    """Reference evaluation: test every rule that admits (crop, stage) against the weather."""
+    raw = [weather.get(key, default) for key, default in zip(rules.weather_keys, rules.defaults)]
+    lines = {section: [] for section in rules.sections}
+    for r in rules.candidates(crop, stage):
+        if rules._matches(r, raw):
+            lines[rules.sections[rules.rule_section[r]]].append(rules.texts[r].format(**dict(zip(rules.variables, raw))))
+    return {section: rules._finish(section, lines[section]) for section in rules.sections}
+
+
+def verify_parity(rules, cases):
+    for crop, stage, weather in cases:
+        expected = direct_scan(rules, crop, stage, weather)
+        assert rules.evaluate(crop, stage, weather) == expected, (crop, stage, weather)
+    batch = rules.evaluate_columns([c[0] for c in cases], [c[1] for c in cases], [c[2] for c in cases])
+    assert batch == [rules.evaluate(*case) for case in cases]
+    print(f"Parity OK: {len(cases)} evaluations identical (scalar, batch, direct scan)")
+
+
+def benchmark(rules, cases):
+    def per_eval(fn):
+        start = time.perf_counter()
+        fn()
+        return (time.perf_counter() - start) / len(cases) * 1e6
+
+    scan = per_eval(lambda: [direct_scan(rules, *case) for case in cases])
+    scalar = per_eval(lambda: [rules.evaluate(*case) for case in cases])
+    batch = per_eval(lambda: rules.evaluate_columns(
+        [c[0] for c in cases], [c[1] for c in cases], [c[2] for c in cases]
+    ))
+    tables = rules._tables.values()
+    print(f"Rules: {len(rules.rules)}   Tables: {len(rules._tables)}   "
+          f"Plans: {sum(len(t.plans) for t in tables)}   "
+          f"Max breakpoints/variable: {max((len(p) for t in tables for p in t.points), default=0)}")
+    print(f"Direct scan: {scan:6.2f} us/eval   Compiled lookup: {scalar:6.2f} us/eval   Batch: {batch:6.2f} us/eval")
+
+    start = time.perf_counter()
+    for _ in range(len(cases)):
+        rules.disease_advisory("Rice Blast", "Critical", 31.2, 92)
+    print(f"Disease advisory lookup: {(time.perf_counter() - start) / len(cases) * 1e6:6.2f} us/eval")
+
+
+if __name__ == "__main__":
+    rules = get_advisory_rules()
+    cases = random_cases(rules, N_EVALUATIONS)
+    verify_parity(rules, cases[:10000])
+    benchmark(rules, cases)
@@ -0,0 +1,97 @@
+"""
+Checks that the vectorized risk engine matches the scalar calculator for every crop,
+month and a few thousand random weather rows, that the district grid's risk forecasts
+follow each region's climate, and reports the timing of both paths.
+"""
+import random
+import time
+from datetime import datetime
+from unittest import mock
+
+from weather_disease_risk import WeatherDiseaseRiskCalculator
+from risk_engine import get_engine
+from risk_forecast import get_disease_risk_forecast
+from district_grid import DistrictRiskGrid
+
+
+def random_weather_rows(n, seed=42):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        row = {
+            "temperature_celsius": round(rng.uniform(5, 42), 1),
+            "humidity_percent": round(rng.uniform(30, 100), 1),
+            "rainfall_mm": round(rng.uniform(0, 20), 2)
+        }
+        # Exercise the scalar path's defaults for missing keys
+        if i % 7 == 0:
+            del row["rainfall_mm"]
+        if i % 11 == 0:
+            del row["temperature_celsius"]
+        rows.append(row)
+    return rows
+
+
+def verify_parity(rows):
+    engine = get_engine()
+    checked = 0
+    for month in range(1, 13):
+        class FixedDateTime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return datetime(2025, month, 15)
+
+        with mock.patch("weather_disease_risk.datetime", FixedDateTime):
+            for crop in WeatherDiseaseRiskCalculator.CROP_DISEASES:
+                batch = engine.calculate_batch(crop, rows, month)
+                for weather, assessments in zip(rows, batch):
+                    expected = WeatherDiseaseRiskCalculator.calculate_disease_risk(crop, weather)
+                    assert assessments == expected, f"Mismatch for {crop}, month {month}: {weather}"
+                    checked += 1
+    print(f"Parity OK: {checked} (crop, month, weather) combinations identical")
+
+
+def verify_regional_forecasts():
+    grid = DistrictRiskGrid()
+    assert grid.forecast("Malnad", 14) != grid.forecast("North Karnataka", 14), "Cluster forecasts identical"
+    assert grid.forecast("Mysuru", 14) != grid.forecast("Belagavi", 14), "District forecasts identical"
+    # Districts match the standalone forecaster
+    for district in ("Mysuru", "Belagavi"):
+        assert grid.forecast(district, 7) == get_disease_risk_forecast(district, 7), district
+    print("Regional forecasts OK: clusters and districts follow their climate")
+
+
+def benchmark(rows):
+    engine = get_engine()
+    crops = list(WeatherDiseaseRiskCalculator.CROP_DISEASES)
+
+    start = time.perf_counter()
+    for crop in crops:
+        for weather in rows:
+            WeatherDiseaseRiskCalculator.calculate_disease_risk(crop, weather)
+    scalar = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for crop in crops:
+        engine.calculate_batch(crop, rows)
+    batch = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engine.compute(
+        [w.get("temperature_celsius", 25) for w in rows],
+        [w.get("humidity_percent", 70) for w in rows],
+        [w.get("rainfall_mm", 5) for w in rows],
+        datetime.now().month
+    )
+    scores_only = time.perf_counter() - start
+
+    print(f"Scalar path:            {scalar * 1000:8.1f} ms")
+    print(f"Vectorized (full dicts): {batch * 1000:7.1f} ms")
+    print(f"Vectorized (scores only, all diseases): {scores_only * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    weather_rows = random_weather_rows(2000)
+    verify_parity(weather_rows)
+    verify_regional_forecasts()
+    benchmark(weather_rows)
@@ -0,0 +1,45 @@
+"""
+Checks the per-user settings store (distinct files for ids that differ only in case or
+punctuation, bounded in-memory cache) and that the settings endpoints answer an invalid
+user id with 400.
+"""
+import tempfile
+
+from settings_store import SettingsStore, MAX_USER_ID_LENGTH
+
+
+def verify_file_names(store):
+    user_ids = ["default", "bob", "Bob", "a/b", "a_b", "नमस्ते"]
+    paths = {store._path_for(user_id) for user_id in user_ids}
+    assert len(paths) == len(user_ids), paths
+    for user_id in user_ids:
+        store.put({"language": user_id}, user_id)
+    store.flush()
+    assert set(store.user_ids()) >= set(user_ids), store.user_ids()
+    print(f"File names OK: {len(user_ids)} ids, {len(paths)} files")
+
+
+def verify_cache_bound(store):
+    for i in range(3 * store.max_cached_users):
+        store.get(f"user-{i}")
+    assert len(store._data) <= store.max_cached_users, len(store._data)
+    print(f"Cache bound OK: {len(store._data)} users cached")
+
+
+def verify_invalid_user_id():
+    from app import app
+    client = app.test_client()
+    response = client.get("/api/settings", headers={"X-User-Id": "x" * (MAX_USER_ID_LENGTH + 1)})
+    assert response.status_code == 400, (response.status_code, response.get_data(as_text=True))
+    response = client.post("/api/settings/language", json={"language": "EN"}, headers={"X-User-Id": "x" * 200})
+    assert response.status_code == 400, (response.status_code, response.get_data(as_text=True))
+    assert client.get("/api/settings", headers={"X-User-Id": "farmer-1"}).status_code == 200
+    print("Invalid user id OK: 400")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as settings_dir:
+        store = SettingsStore(settings_dir, {"language": "EN"}, max_cached_users=16)
+        verify_file_names(store)
+        verify_cache_bound(store)
+    verify_invalid_user_id()
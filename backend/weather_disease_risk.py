@@ -3,14 +3,31 @@ Real-Time Weather & Disease Risk Calculator
 Fetches weather data and calculates disease risk based on environmental conditions
 """
 
+import json
 import logging
-from datetime import datetime
-from cachetools import TTLCache, cached
+import math
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from advisory_rules import get_advisory_rules
 
 logger = logging.getLogger(__name__)
 
-# Cache weather data for 1 hour (3600 seconds)
-weather_cache = TTLCache(maxsize=50, ttl=3600)
+DISTRICTS_FILE = Path(__file__).parent / "data" / "karnataka_districts.json"
+_region_climate = None
+
+
+def get_region_climate():
+    """District -> climate offsets used by the simulator (loaded once)"""
+    global _region_climate
+    if _region_climate is None:
+        try:
+            with open(DISTRICTS_FILE, 'r') as f:
+                _region_climate = {d["district"]: d for d in json.load(f)["districts"]}
+        except Exception as e:
+            logger.error(f"Error loading {DISTRICTS_FILE}: {e}")
+            _region_climate = {}
+    return _region_climate
 
 
 class WeatherDiseaseRiskCalculator:
@@ -79,14 +96,10 @@ class WeatherDiseaseRiskCalculator:
     }
     
     @staticmethod
-    @cached(cache=weather_cache)
-    def get_simulated_weather(region="Karnataka"):
-        """
-        Simulates real-time weather data for demonstration
-        In production, this would integrate with OpenWeatherMap or IMD API
-        """
-        current_month = datetime.now().month
-        current_day = datetime.now().day
+    def _simulated_profile(day):
+        """Seasonal weather profile used by the simulator for a given date"""
+        current_month = day.month
+        current_day = day.day
         
         # Simulate weather patterns based on season
         weather_profiles = {
@@ -124,12 +137,59 @@ class WeatherDiseaseRiskCalculator:
         else:
             profile = weather_profiles["winter"]
         
+        return profile
+    
+    @staticmethod
+    def get_simulated_forecast(region="Karnataka", days=7, start=None, climate=None):
+        """
+        Yields a simulated hourly forecast series (days * 24 rows) for the risk forecaster.
+        Each day follows the simulator's seasonal profile with a diurnal cycle:
+        cooler, more humid nights and afternoon rain. climate ({"temp_offset",
+        "humidity_offset", "rainfall_factor"}) defaults to the district's offsets, as in
+        get_simulated_weather.
+        """
+        if climate is None:
+            climate = get_region_climate().get(region, {})
+        temp_offset = climate.get("temp_offset", 0)
+        humidity_offset = climate.get("humidity_offset", 0)
+        rainfall_factor = climate.get("rainfall_factor", 1)
+        start = (start or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+        for d in range(days):
+            day = start + timedelta(days=d)
+            profile = WeatherDiseaseRiskCalculator._simulated_profile(day)
+            for hour in range(24):
+                # Peak temperature at 14:00, minimum before dawn
+                swing = math.cos((hour - 14) * math.pi / 12)
+                rain_hour = 14 <= hour < 18
+                humidity = profile["humidity"] + humidity_offset - 10 * swing
+                yield {
+                    "region": region,
+                    "timestamp": (day + timedelta(hours=hour)).isoformat(),
+                    "temperature_celsius": round(profile["temperature"] + temp_offset + 4 * swing, 1),
+                    "humidity_percent": round(min(100, max(0, humidity)), 1),
+                    "rainfall_mm": round(profile["rainfall"] * rainfall_factor / 4, 2) if rain_hour else 0.0
+                }
+    
+    @staticmethod
+    def get_simulated_weather(region="Karnataka"):
+        """
+        Simulates real-time weather data for demonstration
+        Served through weather_providers.WeatherService, which caches per time bucket
+        """
+        profile = WeatherDiseaseRiskCalculator._simulated_profile(datetime.now())
+        
+        # Districts shift the state-wide profile by their climate offsets
+        climate = get_region_climate().get(region, {})
+        temperature = profile["temperature"] + climate.get("temp_offset", 0)
+        humidity = min(100, max(0, profile["humidity"] + climate.get("humidity_offset", 0)))
+        rainfall = profile["rainfall"] * climate.get("rainfall_factor", 1)
+        
         return {
             "region": region,
             "timestamp": datetime.now().isoformat(),
-            "temperature_celsius": round(profile["temperature"], 1),
-            "humidity_percent": round(profile["humidity"], 1),
-            "rainfall_mm": round(profile["rainfall"], 2),
+            "temperature_celsius": round(temperature, 1),
+            "humidity_percent": round(humidity, 1),
+            "rainfall_mm": round(rainfall, 2),
             "wind_speed_kmh": round(profile["wind_speed"], 1),
             "season": profile["season"],
             "source": "Simulated (Real API would connect to IMD/OpenWeatherMap)"
@@ -142,7 +202,8 @@ class WeatherDiseaseRiskCalculator:
         Returns list of diseases with risk levels and recommendations
         """
         if weather_data is None:
-            weather_data = WeatherDiseaseRiskCalculator.get_simulated_weather()
+            from weather_providers import get_current_weather
+            weather_data = get_current_weather()
         
         diseases = WeatherDiseaseRiskCalculator.CROP_DISEASES.get(crop_name, [])
         risk_assessments = []
@@ -280,52 +341,13 @@ class WeatherDiseaseRiskCalculator:
         """Generate actionable advisory based on disease risk"""
         temp = weather_data.get("temperature_celsius", 25)
         humidity = weather_data.get("humidity_percent", 70)
-        
-        advisories = {
-            "Rice Blast": {
-                "Critical": f"URGENT: Immediate fungicide application required. Current conditions (T:{temp}°C, H:{humidity}%) are ideal for rapid spread.",
-                "Severe": f"Apply preventive fungicide within 48 hours. Avoid overhead irrigation.",
-                "High": f"Monitor closely. Apply Tricyclazole 75% WP @ 0.6g/L if symptoms appear.",
-                "Moderate": "Monitor for initial symptoms. Maintain field sanitation.",
-                "Low": "Routine monitoring sufficient."
-            },
-            "Bacterial Leaf Blight": {
-                "Critical": "URGENT: Apply Streptocycline + Copper oxychloride immediately.",
-                "Severe": "Apply bactericide within 48 hours. Avoid spreading through irrigation.",
-                "High": "Increase monitoring frequency. Prune infected leaves if limited spread.",
-                "Moderate": "Monitor field daily. Remove infected plants immediately.",
-                "Low": "Routine monitoring only."
-            },
-            "Finger Millet Blast": {
-                "Critical": "URGENT: Apply Carbendazim 50% WP @ 1g/L immediately.",
-                "Severe": "Apply fungicide within 48 hours. Critical at flowering stage.",
-                "High": "Monitor closely around ear emergence.",
-                "Moderate": "Preventive spray recommended.",
-                "Low": "Routine monitoring."
-            },
-            "Coffee Leaf Rust": {
-                "Critical": "SEVERE THREAT: Apply Bordeaux mixture or Copper oxychloride immediately. Increase spray frequency.",
-                "Severe": "Apply fungicide every 10 days during monsoon.",
-                "High": "Apply preventive spray. Avoid wet foliage practices.",
-                "Moderate": "Monitor closely. Ensure good shade management.",
-                "Low": "Continue routine shade management and monitoring."
-            },
-            "Red Rot": {
-                "Critical": "URGENT: Use resistant varieties for new plantings. Destroy affected plants.",
-                "Severe": "Strict field sanitation. Remove and destroy symptomatic stools.",
-                "High": "Improve drainage to reduce waterlogging.",
-                "Moderate": "Monitor for stress. Maintain optimal water management.",
-                "Low": "Maintain normal cultural practices."
-            }
-        }
-        
-        disease_advice = advisories.get(disease_name, {})
-        return disease_advice.get(risk_level, "Monitor field regularly")
+        return get_advisory_rules().disease_advisory(disease_name, risk_level, temp, humidity)
 
 
 def get_crop_disease_risks(crop_name):
     """Convenience function to get disease risks for a crop"""
-    weather = WeatherDiseaseRiskCalculator.get_simulated_weather()
+    from weather_providers import get_current_weather
+    weather = get_current_weather()
     return {
         "crop": crop_name,
         "weather": weather,
@@ -0,0 +1,243 @@
+"""
+Pluggable Weather Providers
+A small provider interface (simulated, local file, HTTP) behind a stale-while-revalidate
+cache keyed on (region, time bucket), so request handlers never wait on a weather fetch.
+
+Provider selection (environment):
+    WEATHER_PROVIDER   simulated (default) | file | http
+    WEATHER_FILE       JSON file for the file provider: {"<region>": {weather fields}, ...}
+    WEATHER_API_URL    base URL for the http provider (OpenWeatherMap-compatible /weather)
+    WEATHER_API_KEY    API key for the http provider
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from weather_disease_risk import WeatherDiseaseRiskCalculator
+
+logger = logging.getLogger(__name__)
+
+
+class WeatherProvider(ABC):
+    """Base provider: returns weather dicts in the simulator's schema."""
+
+    name = "base"
+
+    @abstractmethod
+    def get_current(self, region):
+        """Current weather for one region (raises on failure)."""
+
+    def get_many(self, regions):
+        """Bulk fetch; returns {region: weather} and skips regions that failed."""
+        results = {}
+        for region in regions:
+            try:
+                results[region] = self.get_current(region)
+            except Exception as e:
+                logger.error(f"{self.name} weather fetch failed for {region}: {e}")
+        return results
+
+
+class SimulatedWeatherProvider(WeatherProvider):
+    """Deterministic seasonal simulator (no I/O)."""
+
+    name = "simulated"
+
+    def get_current(self, region):
+        return WeatherDiseaseRiskCalculator.get_simulated_weather(region)
+
+
+class LocalFileWeatherProvider(WeatherProvider):
+    """Reads fixed observations from a JSON file, for offline testing."""
+
+    name = "file"
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def get_current(self, region):
+        with open(self.path, 'r') as f:
+            data = json.load(f)
+        weather = data.get(region) or data.get("default")
+        if weather is None:
+            raise KeyError(f"No weather for {region} in {self.path}")
+        return {
+            "region": region,
+            "timestamp": datetime.now().isoformat(),
+            "source": f"Local file ({self.path.name})",
+            **weather
+        }
+
+
+class HttpWeatherProvider(WeatherProvider):
+    """OpenWeatherMap-compatible HTTP provider with a pooled session and timeouts."""
+
+    name = "http"
+
+    def __init__(self, base_url, api_key, timeout=(3.05, 5), pool_size=10, retries=2):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.pool_size = pool_size
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get_current(self, region):
+        response = self.session.get(
+            f"{self.base_url}/weather",
+            params={"q": f"{region},IN", "units": "metric", "appid": self.api_key},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        data = response.json()
+        rain = data.get("rain", {})
+        return {
+            "region": region,
+            "timestamp": datetime.now().isoformat(),
+            "temperature_celsius": round(data["main"]["temp"], 1),
+            "humidity_percent": round(data["main"]["humidity"], 1),
+            "rainfall_mm": round(rain.get("1h", rain.get("3h", 0)), 2),
+            # API reports m/s
+            "wind_speed_kmh": round(data.get("wind", {}).get("speed", 0) * 3.6, 1),
+            "season": WeatherDiseaseRiskCalculator.get_simulated_weather(region)["season"],
+            "source": "OpenWeatherMap"
+        }
+
+    def get_many(self, regions):
+        """Fetches all regions concurrently over the shared connection pool."""
+        regions = list(regions)
+        results = {}
+        with ThreadPoolExecutor(max_workers=min(self.pool_size, max(1, len(regions)))) as pool:
+            futures = {region: pool.submit(self.get_current, region) for region in regions}
+            for region, future in futures.items():
+                try:
+                    results[region] = future.result()
+                except Exception as e:
+                    logger.error(f"HTTP weather fetch failed for {region}: {e}")
+        return results
+
+
+class WeatherService:
+    """
+    Stale-while-revalidate weather cache keyed on (region, time bucket).
+
+    - Fresh entry (same local day and bucket): returned directly.
+    - Stale entry: returned immediately while one background refresh runs.
+    - No entry: the local fallback provider answers now and the real provider is
+      fetched in the background (unless the provider is itself local).
+    - Fallback data cached after a provider failure is only fresh for
+      fallback_ttl_seconds, so the provider is retried well before the bucket ends.
+    """
+
+    def __init__(self, provider, bucket_minutes=60, fallback=None, fallback_ttl_seconds=60):
+        self.provider = provider
+        self.bucket_minutes = bucket_minutes
+        self.fallback = fallback or SimulatedWeatherProvider()
+        self.fallback_ttl_seconds = fallback_ttl_seconds
+
+        self._entries = {}      # region -> (bucket, weather, monotonic expiry or None)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def _bucket(self, now=None):
+        # Day is part of the key so buckets never span a day boundary
+        now = now or datetime.now()
+        return (now.date().isoformat(), (now.hour * 60 + now.minute) // self.bucket_minutes)
+
+    def _is_local(self):
+        return isinstance(self.provider, (SimulatedWeatherProvider, LocalFileWeatherProvider))
+
+    def get(self, region="Karnataka"):
+        bucket = self._bucket()
+        entry = self._entries.get(region)
+        if entry and entry[0] == bucket and (entry[2] is None or time.monotonic() < entry[2]):
+            return entry[1]
+
+        if entry is None and self._is_local():
+            return self._refresh(region, bucket)
+
+        self._refresh_async(region, bucket)
+        if entry:
+            return entry[1]
+        return self.fallback.get_current(region)
+
+    def get_many(self, regions):
+        """Bulk lookup; every region is answered from cache or the fallback immediately."""
+        return {region: self.get(region) for region in regions}
+
+    def prefetch(self, regions):
+        """Synchronously refreshes many regions with one bulk provider call (e.g. at startup)."""
+        bucket = self._bucket()
+        results = self.provider.get_many(regions)
+        with self._lock:
+            for region, weather in results.items():
+                self._entries[region] = (bucket, weather, None)
+        return results
+
+    def _refresh(self, region, bucket):
+        try:
+            expires = None
+            try:
+                weather = self.provider.get_current(region)
+            except Exception as e:
+                logger.error(f"Weather refresh failed for {region} ({self.provider.name}): {e}")
+                weather = self.fallback.get_current(region)
+                expires = time.monotonic() + self.fallback_ttl_seconds
+            with self._lock:
+                self._entries[region] = (bucket, weather, expires)
+            return weather
+        finally:
+            # Always released, so an unexpected error doesn't stop future refreshes of the region
+            with self._lock:
+                self._refreshing.discard(region)
+
+    def _refresh_async(self, region, bucket):
+        with self._lock:
+            if region in self._refreshing:
+                return
+            self._refreshing.add(region)
+        threading.Thread(target=self._refresh, args=(region, bucket), daemon=True).start()
+
+
+def create_provider_from_env():
+    """Builds the provider selected by WEATHER_PROVIDER (falls back to the simulator)."""
+    kind = os.getenv("WEATHER_PROVIDER", "simulated").lower()
+    if kind == "file" and os.getenv("WEATHER_FILE"):
+        return LocalFileWeatherProvider(os.getenv("WEATHER_FILE"))
+    if kind == "http" and os.getenv("WEATHER_API_URL") and os.getenv("WEATHER_API_KEY"):
+        return HttpWeatherProvider(os.getenv("WEATHER_API_URL"), os.getenv("WEATHER_API_KEY"))
+    if kind != "simulated":
+        logger.warning(f"Weather provider '{kind}' is not configured, using simulated weather")
+    return SimulatedWeatherProvider()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_weather_service():
+    """Process-wide WeatherService (created on first use, after .env is loaded)."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = WeatherService(create_provider_from_env())
+    return _service
+
+
+def get_current_weather(region="Karnataka"):
+    """Convenience function: current weather for a region, never blocking on the network"""
+    return get_weather_service().get(region)
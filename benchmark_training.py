@@ -0,0 +1,120 @@
+"""
+Training throughput benchmark.
+Times full training steps (forward, multi-task loss, backward, optimizer step) of
+ViTMultiTaskModel on synthetic batches and reports images/sec for every combination
+of precision, channels-last, torch.compile and thread count, so each node type can
+pick its fastest settings for CONFIG in train.py.
+
+    python benchmark_training.py --threads 8,16,32 --precisions fp32,bf16 --compile
+"""
+
+import argparse
+import itertools
+import json
+import time
+
+import torch
+import torch.nn as nn
+
+from plant_vision.model import ViTMultiTaskModel
+from plant_vision.training_engine import TrainingEngine, configure_cpu_threads, cpu_supports_bf16
+
+NUM_CROPS = 8
+NUM_DISEASES = 30
+
+
+def run_config(device, precision, channels_last, compile_model, batch_size, steps, warmup):
+    model = ViTMultiTaskModel(NUM_CROPS, NUM_DISEASES, pretrained=False).to(device)
+    model.train()
+    optimizer = torch.optim.AdamW(model.parameters(), lr=3e-5)
+    engine = TrainingEngine(
+        model, optimizer, device, precision=precision,
+        channels_last=channels_last, compile_model=compile_model
+    )
+    criterion = nn.CrossEntropyLoss()
+    criterion_seg = nn.BCEWithLogitsLoss()
+
+    images = torch.randn(batch_size, 3, 224, 224)
+    crops = torch.randint(0, NUM_CROPS, (batch_size,), device=device)
+    diseases = torch.randint(0, NUM_DISEASES, (batch_size,), device=device)
+
+    def train_step(step):
+        imgs = engine.to_device(images)
+        with engine.autocast():
+            c_logits, d_logits, s_map = engine(imgs)
+            loss = (
+                criterion(c_logits, crops)
+                + criterion(d_logits, diseases)
+                + 0.5 * criterion_seg(s_map, torch.zeros_like(s_map))
+            )
+        engine.backward(loss, step)
+
+    for step in range(warmup):
+        train_step(step)
+    if engine.device_type == "cuda":
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for step in range(steps):
+        train_step(step)
+    if engine.device_type == "cuda":
+        torch.cuda.synchronize()
+    elapsed = time.perf_counter() - start
+    return batch_size * steps / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--threads", default="", help="Comma-separated intra-op thread counts (CPU only)")
+    parser.add_argument("--interop-threads", type=int, default=1)
+    parser.add_argument("--precisions", default="fp32,bf16" if not torch.cuda.is_available() else "fp32,fp16")
+    parser.add_argument("--compile", action="store_true", help="Also try torch.compile")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    cpu = args.device == "cpu"
+    threads = [int(t) for t in args.threads.split(",") if t] or [torch.get_num_threads()]
+    if cpu:
+        configure_cpu_threads(threads[0], args.interop_threads)
+        print(f"Native bf16: {cpu_supports_bf16()}")
+
+    results = []
+    configs = itertools.product(
+        threads if cpu else [None],
+        args.precisions.split(","),
+        (False, True),
+        (False, True) if args.compile else (False,)
+    )
+    for n_threads, precision, channels_last, compile_model in configs:
+        if n_threads:
+            torch.set_num_threads(n_threads)
+        try:
+            rate = run_config(
+                args.device, precision, channels_last, compile_model, args.batch_size, args.steps, args.warmup
+            )
+        except (RuntimeError, ValueError) as e:
+            print(f"Skipped {precision} channels_last={channels_last} compile={compile_model}: {e}")
+            continue
+        result = {
+            "threads": n_threads, "precision": precision, "channels_last": channels_last,
+            "compile": compile_model, "images_per_sec": round(rate, 2)
+        }
+        results.append(result)
+        print(
+            f"threads={str(n_threads):>4} precision={precision:<5} channels_last={str(channels_last):<5} "
+            f"compile={str(compile_model):<5} -> {rate:8.2f} img/s"
+        )
+
+    if results:
+        best = max(results, key=lambda r: r["images_per_sec"])
+        print(f"Fastest: {best}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"device": args.device, "batch_size": args.batch_size, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Knowledge Distillation
+Trains a compact student (CompactMultiTaskModel on a small timm backbone) to match the
+trained ViTMultiTaskModel teacher on both the crop and disease heads, writes an
+accuracy/latency report comparing the two and registers the student in
+models/model_registry.json so LocalInferenceService can serve it.
+
+    python distill.py                  # train, report, register (vit_small stays active)
+    python distill.py --activate       # ... and serve the student from now on
+    python distill.py --report-only    # re-measure an already distilled student
+"""
+
+import json
+import os
+import pickle
+import sys
+import time
+from contextlib import nullcontext
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from tqdm import tqdm
+
+from plant_vision.checkpointing import EarlyStopping
+from plant_vision.model import CompactMultiTaskModel, ViTMultiTaskModel
+from plant_vision.model_registry import load_registry, register_model
+from plant_vision.trainer import Trainer
+from plant_vision.training_engine import TrainingEngine
+from train import CONFIG
+
+DISTILL_CONFIG = {
+    # Any timm backbone works, e.g. "vit_tiny_patch16_224", "efficientnet_b0", "mobilenetv3_small_100"
+    "student_backbone": "mobilenetv3_large_100",
+    "name": "mobilenetv3_student",
+    "epochs": 15,
+    "lr": 5e-4,
+    "temperature": 4.0,
+    "alpha": 0.5, # Weight of the hard-label loss; the rest goes to matching the teacher
+    "patience": 3,
+    "latency_runs": 50,
+    "throughput_batch": 32,
+    "report_file": "distillation_report.json",
+}
+
+
+def distillation_loss(student_logits, teacher_logits, labels, temperature, alpha):
+    """Hard-label cross-entropy plus the temperature-softened KL to the teacher (scaled by T^2)."""
+    hard = F.cross_entropy(student_logits, labels)
+    soft = F.kl_div(
+        F.log_softmax(student_logits / temperature, dim=1),
+        F.softmax(teacher_logits / temperature, dim=1),
+        reduction="batchmean"
+    ) * temperature ** 2
+    return alpha * hard + (1 - alpha) * soft
+
+
+def teacher_logits(teacher, imgs):
+    # Only the classification heads are distilled, so the segmentation decoder is skipped
+    cls_token = teacher.encoder.forward_features(imgs)[:, 0]
+    return teacher.crop_head(cls_token), teacher.disease_head(cls_token)
+
+
+def load_teacher(trainer):
+    path = os.path.join(trainer.config["save_path"], "vit_model.pt")
+    if not os.path.exists(path):
+        print(f"❌ Teacher weights not found at {path}. Run train.py first.")
+        sys.exit(1)
+    teacher = ViTMultiTaskModel(trainer.index.num_crops, trainer.index.num_diseases, pretrained=False).to(trainer.device)
+    teacher.load_state_dict(torch.load(path, map_location=trainer.device))
+    teacher.eval()
+    for param in teacher.parameters():
+        param.requires_grad_(False)
+    return teacher
+
+
+@torch.no_grad()
+def evaluate(model, loader, device, autocast=nullcontext):
+    model.eval()
+    correct_c = correct_d = seen = 0
+    with autocast():
+        for batch in loader:
+            crop_logits, disease_logits, _ = model(batch["image"].to(device))
+            correct_c += (crop_logits.argmax(1).cpu() == batch["crop"]).sum().item()
+            correct_d += (disease_logits.argmax(1).cpu() == batch["disease"]).sum().item()
+            seen += batch["crop"].size(0)
+    return {"crop_acc": correct_c / seen, "disease_acc": correct_d / seen}
+
+
+def save_student(trainer, student):
+    name = DISTILL_CONFIG["name"]
+    torch.save(student.state_dict(), os.path.join(trainer.config["save_path"], f"{name}.pt"))
+    # Own copy of the label encoders: the student stays loadable if the teacher is retrained on new classes
+    with open(os.path.join(trainer.config["save_path"], f"{name}_encoders.pkl"), "wb") as f:
+        pickle.dump(trainer.index.encoders, f)
+
+
+def train_student(trainer, teacher, student):
+    cfg = DISTILL_CONFIG
+    device = trainer.device
+    optimizer = torch.optim.AdamW(student.parameters(), lr=cfg["lr"])
+    engine = TrainingEngine(
+        student, optimizer, device, precision=trainer.config["precision"], channels_last=trainer.config["channels_last"]
+    )
+    early_stopping = EarlyStopping(patience=cfg["patience"])
+    last_step = len(trainer.train_loader) - 1
+
+    for epoch in range(cfg["epochs"]):
+        student.train()
+        train_loss = 0.0
+        for step, batch in enumerate(tqdm(trainer.train_loader, desc=f"Distill {epoch+1} ({engine.precision_name})")):
+            imgs = engine.to_device(batch["image"])
+            crops = batch["crop"].to(device, non_blocking=True)
+            diseases = batch["disease"].to(device, non_blocking=True)
+
+            with engine.autocast():
+                with torch.no_grad():
+                    t_crop, t_disease = teacher_logits(teacher, imgs)
+                s_crop, s_disease, _ = engine(imgs)
+            # Losses in float32: softmax over T-scaled logits is sensitive to bf16 rounding
+            loss = (
+                distillation_loss(s_crop.float(), t_crop.float(), crops, cfg["temperature"], cfg["alpha"])
+                + distillation_loss(s_disease.float(), t_disease.float(), diseases, cfg["temperature"], cfg["alpha"])
+            )
+            engine.backward(loss, step, last=step == last_step)
+            train_loss += loss.item()
+
+        metrics = evaluate(student, trainer.val_loader, device, engine.autocast)
+        print(
+            f"Distill {epoch+1} | Loss: {train_loss / len(trainer.train_loader):.4f} | "
+            f"Crop Acc: {metrics['crop_acc']:.4f} | Disease Acc: {metrics['disease_acc']:.4f}"
+        )
+        if early_stopping.step(metrics["disease_acc"]):
+            save_student(trainer, student)
+            print(f"New best student Disease Acc {metrics['disease_acc']:.4f}, saved")
+        if early_stopping.should_stop:
+            print(f"Early stopping: no improvement for {early_stopping.patience} epochs")
+            break
+    return early_stopping.best
+
+
+@torch.no_grad()
+def measure_latency(model, img_size, runs, batch_size=1):
+    """Median / p95 milliseconds per forward pass on CPU in float32, as LocalInferenceService runs it."""
+    model.eval()
+    x = torch.randn(batch_size, 3, img_size, img_size)
+    for _ in range(5):
+        model(x)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        model(x)
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times)), float(np.percentile(times, 95))
+
+
+def model_report(trainer, model, weights_path):
+    cfg = DISTILL_CONFIG
+    img_size = trainer.config["img_size"]
+    metrics = evaluate(model.to(trainer.device), trainer.val_loader, trainer.device)
+    model.cpu()
+    p50, p95 = measure_latency(model, img_size, cfg["latency_runs"])
+    batch_ms, _ = measure_latency(model, img_size, max(cfg["latency_runs"] // 5, 3), cfg["throughput_batch"])
+    return {
+        **{k: round(v, 4) for k, v in metrics.items()},
+        "params_m": round(sum(p.numel() for p in model.parameters()) / 1e6, 2),
+        "size_mb": round(os.path.getsize(weights_path) / 2**20, 1),
+        "latency_ms_p50": round(p50, 2),
+        "latency_ms_p95": round(p95, 2),
+        "throughput_img_s": round(cfg["throughput_batch"] * 1000 / batch_ms, 1),
+    }
+
+
+def build_report(trainer, teacher, student):
+    save_path = trainer.config["save_path"]
+    report = {
+        "cpu_threads": torch.get_num_threads(),
+        "img_size": trainer.config["img_size"],
+        "val_samples": len(trainer.val_dataset),
+        "models": {
+            "vit_small": model_report(trainer, teacher, os.path.join(save_path, "vit_model.pt")),
+            DISTILL_CONFIG["name"]: model_report(trainer, student, os.path.join(save_path, f"{DISTILL_CONFIG['name']}.pt")),
+        }
+    }
+    with open(os.path.join(save_path, DISTILL_CONFIG["report_file"]), "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'Model':<24}{'Params(M)':>10}{'Size(MB)':>10}{'Crop Acc':>10}{'Dis. Acc':>10}{'p50 ms':>9}{'p95 ms':>9}{'img/s':>8}")
+    for name, r in report["models"].items():
+        print(
+            f"{name:<24}{r['params_m']:>10}{r['size_mb']:>10}{r['crop_acc']:>10.4f}{r['disease_acc']:>10.4f}"
+            f"{r['latency_ms_p50']:>9.2f}{r['latency_ms_p95']:>9.2f}{r['throughput_img_s']:>8.1f}"
+        )
+    print(f"(CPU, {report['cpu_threads']} threads, batch 1 latency, batch {DISTILL_CONFIG['throughput_batch']} throughput)")
+    return report
+
+
+if __name__ == "__main__":
+    cfg = DISTILL_CONFIG
+    trainer = Trainer(CONFIG)
+    save_path = trainer.config["save_path"]
+    teacher = load_teacher(trainer)
+    student = CompactMultiTaskModel(
+        trainer.index.num_crops, trainer.index.num_diseases, backbone=cfg["student_backbone"],
+        pretrained="--report-only" not in sys.argv
+    ).to(trainer.device)
+
+    if "--report-only" not in sys.argv:
+        best_acc = train_student(trainer, teacher, student)
+        print(f"Distillation complete (best student Disease Acc: {best_acc:.4f})")
+    # Report on the best epoch's weights, not the last epoch's
+    student.load_state_dict(torch.load(os.path.join(save_path, f"{cfg['name']}.pt"), map_location=trainer.device))
+
+    report = build_report(trainer, teacher, student)
+
+    registry = load_registry(save_path)
+    if "vit_small" in registry["models"]:
+        register_model(save_path, "vit_small", {**registry["models"]["vit_small"], "metrics": report["models"]["vit_small"]})
+    register_model(save_path, cfg["name"], {
+        "architecture": "compact_multitask",
+        "backbone": cfg["student_backbone"],
+        "weights": f"{cfg['name']}.pt",
+        "encoders": f"{cfg['name']}_encoders.pkl",
+        "img_size": trainer.config["img_size"],
+        "teacher": "vit_small",
+        "metrics": report["models"][cfg["name"]],
+    }, activate="--activate" in sys.argv)
+    print(f"Registered '{cfg['name']}' in {save_path}" + (" (now served)" if "--activate" in sys.argv else ""))
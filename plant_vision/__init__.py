@@ -0,0 +1,17 @@
+"""
+plant_vision: crop/disease detection model, dataset indexing and training library.
+
+Submodules are imported on demand and do no work at import time, so e.g.
+`from plant_vision.model import ViTMultiTaskModel` only costs the torch/timm import.
+
+    model            ViTMultiTaskModel, CompactMultiTaskModel
+    data             dataset scan, label encoders, transforms, PlantDataset
+    dataset_manifest cached, incrementally rescanned listing of the dataset folders
+    trainer          Trainer (lazily built loaders/model, fit, heads-only retraining)
+    training_engine  precision / DDP / accumulation wrapper around a model + optimizer
+    image_shards     preprocessed uint8 memmap shards
+    embedding_cache  frozen-encoder embedding cache
+    checkpointing    per-epoch checkpoints and early stopping
+    dist_utils       torch.distributed helpers
+    model_registry   models/model_registry.json read/write
+"""
@@ -0,0 +1,163 @@
+"""
+Training Checkpoints
+Per-epoch checkpoints holding everything needed to resume a run exactly where it
+stopped (model, optimizer, AMP scaler, RNG streams, early-stopping state, history),
+plus early stopping on a validation metric.
+
+Each checkpoint records the run signature (label counts, sample fingerprint) it was
+trained on; a run only resumes from a checkpoint with the same signature. Starting a
+new run moves the previous run's checkpoints into a run_<timestamp> subdirectory, so
+they are neither pruned in favour of nor resumed by the new run.
+"""
+
+import glob
+import os
+import random
+import re
+import time
+
+import numpy as np
+import torch
+
+CHECKPOINT_FILE = "checkpoint_epoch_{:03d}.pt"
+CHECKPOINT_PATTERN = re.compile(r"checkpoint_epoch_(\d+)\.pt$")
+
+
+def rng_state():
+    state = {
+        "python": random.getstate(),
+        "numpy": np.random.get_state(),
+        "torch": torch.get_rng_state(),
+    }
+    if torch.cuda.is_available():
+        state["cuda"] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def set_rng_state(state):
+    random.setstate(state["python"])
+    np.random.set_state(state["numpy"])
+    torch.set_rng_state(state["torch"])
+    if "cuda" in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state["cuda"])
+
+
+class EarlyStopping:
+    """Stops after `patience` epochs without the monitored metric improving by min_delta."""
+
+    def __init__(self, patience=3, min_delta=0.0, mode="max"):
+        self.patience = patience
+        self.min_delta = min_delta
+        self.mode = mode
+        self.best = None
+        self.stale_epochs = 0
+
+    def step(self, metric):
+        """Records one epoch's metric; returns True when it is a new best."""
+        if self.best is None or (
+            metric > self.best + self.min_delta if self.mode == "max" else metric < self.best - self.min_delta
+        ):
+            self.best = metric
+            self.stale_epochs = 0
+            return True
+        self.stale_epochs += 1
+        return False
+
+    @property
+    def should_stop(self):
+        return self.patience > 0 and self.stale_epochs >= self.patience
+
+    def state_dict(self):
+        return {"best": self.best, "stale_epochs": self.stale_epochs}
+
+    def load_state_dict(self, state):
+        self.best = state["best"]
+        self.stale_epochs = state["stale_epochs"]
+
+
+def list_checkpoints(checkpoint_dir):
+    """(epoch, path) of every checkpoint in the directory, oldest first."""
+    found = []
+    for path in glob.glob(os.path.join(checkpoint_dir, "checkpoint_epoch_*.pt")):
+        match = CHECKPOINT_PATTERN.search(os.path.basename(path))
+        if match:
+            found.append((int(match.group(1)), path))
+    return sorted(found)
+
+
+def latest_checkpoint(checkpoint_dir):
+    found = list_checkpoints(checkpoint_dir)
+    return found[-1][1] if found else None
+
+
+class CheckpointMismatchError(ValueError):
+    """The checkpoint was trained on a different label set or sample list."""
+
+
+def archive_checkpoints(checkpoint_dir):
+    """Moves every checkpoint in the directory into a run_<timestamp> subdirectory; returns it (or None)."""
+    found = list_checkpoints(checkpoint_dir)
+    if not found:
+        return None
+    archive_dir = os.path.join(checkpoint_dir, time.strftime("run_%Y%m%d-%H%M%S"))
+    os.makedirs(archive_dir, exist_ok=True)
+    for _, path in found:
+        os.replace(path, os.path.join(archive_dir, os.path.basename(path)))
+    return archive_dir
+
+
+def save_checkpoint(
+    checkpoint_dir, epoch, model, optimizer, scaler=None, early_stopping=None, history=None, keep=2, signature=None
+):
+    """
+    Writes the checkpoint for a finished epoch (1-based) atomically, then prunes all but
+    the newest `keep` checkpoints.
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    path = os.path.join(checkpoint_dir, CHECKPOINT_FILE.format(epoch))
+    tmp_path = path + ".tmp"
+    torch.save({
+        "epoch": epoch,
+        "model": model.state_dict(),
+        "optimizer": optimizer.state_dict(),
+        "scaler": scaler.state_dict() if scaler is not None else None,
+        "early_stopping": early_stopping.state_dict() if early_stopping is not None else None,
+        "history": history or [],
+        "rng": rng_state(),
+        "signature": signature,
+    }, tmp_path)
+    # A crash mid-write leaves the previous checkpoint intact
+    os.replace(tmp_path, path)
+
+    if keep:
+        for _, old_path in list_checkpoints(checkpoint_dir)[:-keep]:
+            os.remove(old_path)
+    return path
+
+
+def read_checkpoint(path, signature=None):
+    """
+    Loads a checkpoint dict (on CPU). With a signature, raises CheckpointMismatchError
+    unless the checkpoint was written for the same one.
+    """
+    # Loaded on CPU: RNG states must be CPU tensors, and load_state_dict copies to the model's device
+    checkpoint = torch.load(path, map_location="cpu", weights_only=False)
+    if signature is not None and checkpoint.get("signature") != signature:
+        raise CheckpointMismatchError(
+            f"{path} was trained on different labels or samples "
+            f"({checkpoint.get('signature')} vs {signature}); run with --fresh to start a new run"
+        )
+    return checkpoint
+
+
+def load_checkpoint(path, model, optimizer, scaler=None, early_stopping=None, signature=None):
+    """Restores a checkpoint (path or read_checkpoint() dict) in place; returns (epochs completed, history)."""
+    checkpoint = path if isinstance(path, dict) else read_checkpoint(path, signature)
+    model.load_state_dict(checkpoint["model"])
+    optimizer.load_state_dict(checkpoint["optimizer"])
+    if scaler is not None and checkpoint.get("scaler"):
+        scaler.load_state_dict(checkpoint["scaler"])
+    if early_stopping is not None and checkpoint.get("early_stopping"):
+        early_stopping.load_state_dict(checkpoint["early_stopping"])
+    set_rng_state(checkpoint["rng"])
+    return checkpoint["epoch"], checkpoint.get("history", [])
@@ -0,0 +1,167 @@
+"""
+Dataset indexing, transforms and datasets for the PlantVillage + New Plant Diseases
+folders ("<Crop>___<Disease>" class directories). Nothing runs on import:
+DatasetIndex.build() scans the folders (incrementally, through the dataset manifest)
+and fits the label encoders when first needed.
+"""
+
+import random
+
+import cv2
+cv2.setNumThreads(0)
+cv2.ocl.setUseOpenCL(False)
+import torch
+from torch.utils.data import Dataset
+import albumentations as A
+from albumentations.pytorch import ToTensorV2
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+
+from .dataset_manifest import DatasetManifest
+
+CROP_NAME_MAP = {
+    "Tomato": "tomato", "Potato": "potato", "Corn_(maize)": "maize",
+    "Pepper,_bell": "capsicum", "Soybean": "soybean", "Grape": "grape",
+    "Orange": "orange", "Apple": "apple", "Peach": "peach",
+    "Strawberry": "strawberry", "Cherry": "cherry", "Blueberry": "blueberry"
+}
+
+INDIAN_CROPS = {"tomato", "potato", "maize", "capsicum", "soybean", "grape", "orange", "apple"}
+
+
+def parse_class_name(folder_name):
+    if "___" not in folder_name: return None, None
+    crop_raw, disease = folder_name.split("___", 1)
+    crop = CROP_NAME_MAP.get(crop_raw.strip())
+    return crop, disease.strip()
+
+
+def is_used_class(folder_name):
+    return parse_class_name(folder_name)[0] in INDIAN_CROPS
+
+
+def collect_samples(roots, manifest_path=None, full_rescan=False):
+    """
+    (path, crop, disease) for every image of a supported crop under roots. Images with
+    the same content are kept once (the first in roots order): the augmented dataset
+    contains copies of PlantVillage images.
+    """
+    manifest = DatasetManifest(manifest_path)
+    stats = manifest.refresh(roots, hash_dir=is_used_class, full=full_rescan)
+
+    samples = []
+    seen = {}
+    duplicates = conflicts = 0
+    for path, class_dir, _, digest in manifest.files():
+        crop, disease = parse_class_name(class_dir)
+        if crop not in INDIAN_CROPS:
+            continue
+        if digest in seen:
+            duplicates += 1
+            conflicts += seen[digest] != (crop, disease)
+            continue
+        seen[digest] = (crop, disease)
+        samples.append((path, crop, disease))
+
+    print(
+        f"Dataset manifest: {len(samples)} images ({duplicates} duplicates dropped, {conflicts} with other labels); "
+        f"{stats['relisted']}/{stats['directories']} directories re-listed, {stats['hashed']} files hashed "
+        f"in {stats['seconds']}s"
+    )
+    return samples
+
+
+class DatasetIndex:
+    """Sample paths, encoded labels, label encoders and the stratified train/val split."""
+
+    def __init__(self, samples, seed=42, val_fraction=0.2):
+        self.image_paths = [x[0] for x in samples]
+        self.crop_encoder = LabelEncoder()
+        self.disease_encoder = LabelEncoder()
+        self.crop_ids = self.crop_encoder.fit_transform([x[1] for x in samples])
+        self.disease_ids = self.disease_encoder.fit_transform([x[2] for x in samples])
+        self.train_idx, self.val_idx = train_test_split(
+            list(range(len(self.image_paths))), test_size=val_fraction, random_state=seed, stratify=self.disease_ids
+        )
+
+    @classmethod
+    def build(cls, config):
+        samples = collect_samples(
+            [config["pv_path"], config["vip_path"]], config.get("manifest_path"), config.get("manifest_full_rescan", False)
+        )
+        if len(samples) == 0:
+            raise FileNotFoundError("No images found! Please check your file paths in the CONFIG section.")
+        return cls(samples, seed=config["seed"])
+
+    @property
+    def num_crops(self):
+        return len(self.crop_encoder.classes_)
+
+    @property
+    def num_diseases(self):
+        return len(self.disease_encoder.classes_)
+
+    @property
+    def encoders(self):
+        return {'crop': self.crop_encoder, 'disease': self.disease_encoder}
+
+
+def train_transform(img_size):
+    return A.Compose([
+        A.Resize(img_size, img_size),
+        A.HorizontalFlip(p=0.5),
+        A.RandomBrightnessContrast(p=0.2),
+        A.Normalize(),
+        ToTensorV2()
+    ])
+
+
+def val_transform(img_size):
+    return A.Compose([
+        A.Resize(img_size, img_size),
+        A.Normalize(),
+        ToTensorV2()
+    ])
+
+
+def shard_train_transform(img_size):
+    # Shards are stored at shard_img_size, so training takes random crops and validation resizes
+    return A.Compose([
+        A.RandomCrop(img_size, img_size),
+        A.HorizontalFlip(p=0.5),
+        A.RandomBrightnessContrast(p=0.2),
+        A.Normalize(),
+        ToTensorV2()
+    ])
+
+
+class PlantDataset(Dataset):
+    """Decodes the JPEGs of index samples `indices` on every access."""
+
+    def __init__(self, index, indices, transform=None):
+        self.image_paths = index.image_paths
+        self.crop_ids = index.crop_ids
+        self.disease_ids = index.disease_ids
+        self.indices = indices
+        self.transform = transform
+    def __len__(self): return len(self.indices)
+    def __getitem__(self, idx):
+        i = self.indices[idx]
+        path = self.image_paths[i]
+
+        img = cv2.imread(path, cv2.IMREAD_COLOR)
+
+        # Skip corrupted images safely
+        if img is None:
+            return self.__getitem__(random.randint(0, len(self.indices) - 1))
+
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+        if self.transform:
+            img = self.transform(image=img)["image"]
+
+        return {
+            "image": img,
+            "crop": torch.tensor(self.crop_ids[i], dtype=torch.long),
+            "disease": torch.tensor(self.disease_ids[i], dtype=torch.long)
+        }
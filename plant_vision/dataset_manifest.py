@@ -0,0 +1,151 @@
+"""
+Dataset Manifest
+Persisted listing of the image folders (per file: size, mtime, content hash) so that
+startup doesn't stat hundreds of thousands of files on every run.
+
+Refreshing is incremental: a directory whose mtime is unchanged has the same entries
+(adding, removing or renaming a file or subfolder updates it), so it is reused without
+listing it. Changed directories are re-listed with os.scandir, and their files keep
+their hash when size and mtime are unchanged. Directories are walked, and new files
+hashed, in a thread pool. Files edited in place don't touch the directory mtime:
+refresh(full=True) re-lists every directory to catch those.
+
+File layout (JSON):
+    {"version": 1, "roots": {root: {dir relative to root: {
+        "mtime_ns": ..., "subdirs": [...], "files": [[name, size, mtime_ns, hash], ...]}}}}
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+MANIFEST_VERSION = 1
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def hash_file(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _scan_dir(path, previous, full):
+    """Manifest record of one directory (and whether it was re-listed); reuses `previous` when unchanged."""
+    mtime_ns = os.stat(path).st_mtime_ns
+    if previous is not None and previous["mtime_ns"] == mtime_ns and not full:
+        return previous, False
+
+    old_files = {f[0]: f for f in previous["files"]} if previous else {}
+    subdirs = []
+    files = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                subdirs.append(entry.name)
+            elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                st = entry.stat()
+                old = old_files.get(entry.name)
+                digest = old[3] if old and old[1] == st.st_size and old[2] == st.st_mtime_ns else None
+                files.append([entry.name, st.st_size, st.st_mtime_ns, digest])
+    return {"mtime_ns": mtime_ns, "subdirs": sorted(subdirs), "files": sorted(files)}, True
+
+
+class DatasetManifest:
+    def __init__(self, path=None):
+        """path=None keeps the manifest in memory only (a plain parallel scan)."""
+        self.path = path
+        self.roots = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+                if data.get("version") == MANIFEST_VERSION:
+                    self.roots = data["roots"]
+            except (OSError, ValueError):
+                print(f"Unreadable dataset manifest {path}, rescanning")
+
+    def _walk(self, root, pool, full):
+        previous = self.roots.get(root, {})
+        dirs = {}
+        relisted = 0
+        pending = {pool.submit(_scan_dir, root, previous.get("."), full): "."}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                rel = pending.pop(future)
+                try:
+                    record, changed = future.result()
+                except FileNotFoundError:
+                    continue  # Removed while scanning
+                dirs[rel] = record
+                relisted += changed
+                for name in record["subdirs"]:
+                    sub = os.path.normpath(os.path.join(rel, name))
+                    pending[pool.submit(_scan_dir, os.path.join(root, sub), previous.get(sub), full)] = sub
+        return dirs, relisted
+
+    def refresh(self, roots, hash_dir=None, full=False, workers=None):
+        """
+        Brings the manifest up to date with `roots` (other roots are dropped) and saves it
+        if anything changed. Files in directories for which hash_dir(dir name) is true get
+        a content hash. Returns scan statistics.
+        """
+        start_time = time.time()
+        stats = {"directories": 0, "relisted": 0, "hashed": 0, "files": 0}
+        roots = [r for r in roots if r]
+        missing = [r for r in roots if not os.path.isdir(r)]
+        for root in missing:
+            print(f"Warning: Path not found: {root}")
+        changed = set(self.roots) != set(roots) - set(missing)
+
+        scanned = {}
+        with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) * 4)) as pool:
+            for root in roots:
+                if root in missing:
+                    continue
+                dirs, relisted = self._walk(root, pool, full)
+                scanned[root] = dirs
+                stats["directories"] += len(dirs)
+                stats["relisted"] += relisted
+                changed = changed or relisted > 0 or set(dirs) != set(self.roots.get(root, {}))
+
+            # Content hashes of new or modified files, read in parallel
+            jobs = []
+            for root, dirs in scanned.items():
+                for rel, record in dirs.items():
+                    stats["files"] += len(record["files"])
+                    if hash_dir is not None and not hash_dir(os.path.basename(os.path.join(root, rel))):
+                        continue
+                    jobs.extend((root, rel, f) for f in record["files"] if f[3] is None)
+            for (root, rel, f), digest in zip(
+                jobs, pool.map(hash_file, [os.path.join(root, rel, f[0]) for root, rel, f in jobs])
+            ):
+                f[3] = digest
+            stats["hashed"] = len(jobs)
+
+        self.roots = scanned
+        if changed or jobs:
+            self.save()
+        stats["seconds"] = round(time.time() - start_time, 2)
+        return stats
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": MANIFEST_VERSION, "roots": self.roots}, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def files(self):
+        """(path, class directory name, size, hash) of every file, in a stable order (roots as given, then sorted)."""
+        for root, dirs in self.roots.items():
+            for rel in sorted(dirs):
+                class_dir = os.path.basename(os.path.normpath(os.path.join(root, rel)))
+                for name, size, _, digest in dirs[rel]["files"]:
+                    yield os.path.normpath(os.path.join(root, rel, name)), class_dir, size, digest
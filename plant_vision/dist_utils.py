@@ -0,0 +1,66 @@
+"""
+Distributed Training Helpers
+Thin wrappers over torch.distributed for the Trainer. Process-group settings come from the
+environment variables torchrun sets (RANK, WORLD_SIZE, LOCAL_RANK, MASTER_ADDR/PORT);
+without them every helper degrades to a single-process no-op.
+
+    torchrun --standalone --nproc_per_node=4 train.py            # one box, 4 processes
+    torchrun --nnodes=2 --node_rank=0 --master_addr=HOST --nproc_per_node=8 train.py
+"""
+
+import os
+from contextlib import contextmanager
+
+import torch
+import torch.distributed as dist
+
+
+def init_distributed(backend="gloo"):
+    """Joins the process group if launched by torchrun. Returns (rank, world_size, local_rank)."""
+    world_size = int(os.environ.get("WORLD_SIZE", 1))
+    if world_size <= 1:
+        return 0, 1, 0
+    if not dist.is_initialized():
+        dist.init_process_group(backend=backend)
+    return dist.get_rank(), dist.get_world_size(), int(os.environ.get("LOCAL_RANK", 0))
+
+
+def is_distributed():
+    return dist.is_available() and dist.is_initialized()
+
+
+def is_main_process():
+    return not is_distributed() or dist.get_rank() == 0
+
+
+def local_world_size():
+    """Processes sharing this machine (used to split CPU threads between them)."""
+    return int(os.environ.get("LOCAL_WORLD_SIZE", 1))
+
+
+def barrier():
+    if is_distributed():
+        dist.barrier()
+
+
+@contextmanager
+def main_process_first():
+    """Rank 0 runs the block first (e.g. building caches), the other ranks after it finishes."""
+    if not is_main_process():
+        barrier()
+    yield
+    if is_main_process():
+        barrier()
+
+
+def all_reduce_sum(values, device="cpu"):
+    """Sums a list of numbers over all ranks; returns a list of floats."""
+    tensor = torch.tensor(values, dtype=torch.float64, device=device)
+    if is_distributed():
+        dist.all_reduce(tensor, op=dist.ReduceOp.SUM)
+    return tensor.tolist()
+
+
+def cleanup():
+    if is_distributed():
+        dist.destroy_process_group()
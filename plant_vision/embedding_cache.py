@@ -0,0 +1,184 @@
+"""
+Frozen-Encoder Embedding Cache
+Runs the ViT encoder once over every sample and stores its CLS embeddings (and
+optionally the patch tokens) as float16 memmaps. crop_head / disease_head can then be
+retrained on the cache in minutes on CPU, without touching the encoder.
+
+Layout of a cache directory:
+    embeddings.json     fingerprint (samples + encoder weights), dims, count
+    labels.npz          sample_index, crop_id, disease_id (one entry per cached row)
+    cls.npy             (n, embed_dim) float16
+    patch_tokens.npy    (n, num_patches, embed_dim) float16, only with patch_tokens=True
+"""
+
+import copy
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+
+META_FILE = "embeddings.json"
+LABELS_FILE = "labels.npz"
+CLS_FILE = "cls.npy"
+PATCH_FILE = "patch_tokens.npy"
+
+
+def encoder_fingerprint(encoder, samples_fingerprint):
+    """Identifies the encoder weights + sample list the cache was built from."""
+    digest = hashlib.sha1(samples_fingerprint.encode())
+    for name, tensor in encoder.state_dict().items():
+        digest.update(name.encode())
+        digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return digest.hexdigest()
+
+
+def load_matching_weights(model, state_dict):
+    """Loads the entries of state_dict whose shapes match model (e.g. a checkpoint with fewer diseases)."""
+    own = model.state_dict()
+    matching = {k: v for k, v in state_dict.items() if k in own and own[k].shape == v.shape}
+    skipped = sorted(set(state_dict) - set(matching))
+    model.load_state_dict(matching, strict=False)
+    if skipped:
+        print(f"Not loaded (shape changed or unknown): {', '.join(skipped)}")
+    return skipped
+
+
+class EmbeddingCache:
+    """Read-only view of a built cache."""
+
+    def __init__(self, cache_dir):
+        with open(os.path.join(cache_dir, META_FILE)) as f:
+            self.meta = json.load(f)
+        labels = np.load(os.path.join(cache_dir, LABELS_FILE))
+        self.sample_index = labels["sample_index"]
+        self.crop_id = labels["crop_id"]
+        self.disease_id = labels["disease_id"]
+        self.cls = np.load(os.path.join(cache_dir, CLS_FILE), mmap_mode="r")
+        patch_path = os.path.join(cache_dir, PATCH_FILE)
+        self.patch_tokens = np.load(patch_path, mmap_mode="r") if os.path.exists(patch_path) else None
+
+    def rows_for(self, sample_indices):
+        """Cache rows holding the given dataset sample indices (e.g. a train/val split)."""
+        return np.flatnonzero(np.isin(self.sample_index, np.asarray(sample_indices)))
+
+
+@torch.no_grad()
+def build_cache(encoder, dataset, cache_dir, fingerprint, device, batch_size=64, num_workers=4, patch_tokens=False):
+    """
+    Encodes every item of dataset (use the validation transform: no augmentation).
+    dataset must expose .indices (sample index per item) like PlantDataset/ShardDataset.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    n = len(dataset)
+    dim = encoder.embed_dim
+    num_patches = encoder.patch_embed.num_patches
+    cls = np.lib.format.open_memmap(os.path.join(cache_dir, CLS_FILE), mode="w+", dtype=np.float16, shape=(n, dim))
+    patches = None
+    if patch_tokens:
+        patches = np.lib.format.open_memmap(
+            os.path.join(cache_dir, PATCH_FILE), mode="w+", dtype=np.float16, shape=(n, num_patches, dim)
+        )
+    crop_id = np.empty(n, dtype=np.int64)
+    disease_id = np.empty(n, dtype=np.int64)
+
+    encoder.eval().to(device)
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=False, num_workers=num_workers)
+    start_time = time.time()
+    pos = 0
+    for batch in loader:
+        features = encoder.forward_features(batch["image"].to(device)).float().cpu()
+        b = features.size(0)
+        cls[pos:pos + b] = features[:, 0].numpy()
+        if patches is not None:
+            patches[pos:pos + b] = features[:, 1:].numpy()
+        crop_id[pos:pos + b] = batch["crop"].numpy()
+        disease_id[pos:pos + b] = batch["disease"].numpy()
+        pos += b
+        if pos % (batch_size * 50) < b:
+            print(f"Encoded {pos}/{n} images ({pos / (time.time() - start_time):.1f} img/s)")
+    cls.flush()
+    if patches is not None:
+        patches.flush()
+
+    np.savez(
+        os.path.join(cache_dir, LABELS_FILE),
+        sample_index=np.asarray(dataset.indices, dtype=np.int64), crop_id=crop_id, disease_id=disease_id
+    )
+    # Meta last: its presence marks a complete build
+    with open(os.path.join(cache_dir, META_FILE), "w") as f:
+        json.dump({
+            "fingerprint": fingerprint,
+            "count": n,
+            "embed_dim": dim,
+            "patch_tokens": bool(patch_tokens)
+        }, f, indent=2)
+    print(f"Cached {n} embeddings in {cache_dir} ({time.time() - start_time:.0f}s)")
+
+
+def ensure_cache(encoder, dataset, cache_dir, samples_fingerprint, device, patch_tokens=False, **loader_args):
+    """Opens the cache for this encoder + sample list, building it first if missing or stale."""
+    fingerprint = encoder_fingerprint(encoder, samples_fingerprint)
+    try:
+        cache = EmbeddingCache(cache_dir)
+        if cache.meta.get("fingerprint") == fingerprint and (cache.patch_tokens is not None or not patch_tokens):
+            return cache
+    except (OSError, ValueError, KeyError):
+        pass
+    print(f"Building embedding cache in {cache_dir} (encoder runs once over {len(dataset)} images)...")
+    build_cache(encoder, dataset, cache_dir, fingerprint, device, patch_tokens=patch_tokens, **loader_args)
+    return EmbeddingCache(cache_dir)
+
+
+def train_heads(model, cache, train_rows, val_rows, epochs=30, lr=1e-3, batch_size=256, patience=5, device="cpu"):
+    """
+    Trains model.crop_head / model.disease_head on cached CLS embeddings, keeping the
+    heads from the epoch with the best validation disease accuracy. Returns that accuracy.
+    """
+    x = torch.from_numpy(np.asarray(cache.cls, dtype=np.float32))
+    crops = torch.from_numpy(cache.crop_id)
+    diseases = torch.from_numpy(cache.disease_id)
+    train_rows = torch.as_tensor(train_rows, dtype=torch.long)
+    val_rows = torch.as_tensor(val_rows, dtype=torch.long)
+
+    heads = nn.ModuleDict({"crop": model.crop_head, "disease": model.disease_head}).to(device)
+    optimizer = torch.optim.AdamW(heads.parameters(), lr=lr)
+    criterion = nn.CrossEntropyLoss()
+
+    best_acc, best_state, stale = -1.0, None, 0
+    for epoch in range(epochs):
+        heads.train()
+        train_loss = 0.0
+        order = train_rows[torch.randperm(len(train_rows))]
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            emb = x[rows].to(device)
+            loss = (
+                criterion(heads["crop"](emb), crops[rows].to(device))
+                + criterion(heads["disease"](emb), diseases[rows].to(device))
+            )
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            train_loss += loss.item() * len(rows)
+
+        heads.eval()
+        with torch.no_grad():
+            predicted = heads["disease"](x[val_rows].to(device)).argmax(1).cpu()
+        acc = (predicted == diseases[val_rows]).float().mean().item()
+        print(f"Head epoch {epoch+1} | Loss: {train_loss / max(len(order), 1):.4f} | Disease Acc: {acc:.4f}")
+
+        if acc > best_acc:
+            best_acc, best_state, stale = acc, copy.deepcopy(heads.state_dict()), 0
+        else:
+            stale += 1
+            if stale >= patience:
+                print(f"No improvement for {patience} epochs, stopping")
+                break
+
+    heads.load_state_dict(best_state)
+    return best_acc
@@ -0,0 +1,184 @@
+"""
+Preprocessed Image Shards
+Decodes and resizes the training images once into uint8 memory-mapped .npy shards,
+so epochs read pixels straight from the page cache instead of decoding JPEGs.
+
+Layout of a shard directory:
+    index.json          size, count, shard boundaries, fingerprint of the sample list
+    labels.npz          crop_id, disease_id, shard, offset, valid (one entry per sample)
+    shard_00000.npy     (n, size, size, 3) uint8, RGB
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset
+
+INDEX_FILE = "index.json"
+LABELS_FILE = "labels.npz"
+SHARD_FILE = "shard_{:05d}.npy"
+
+
+def fingerprint(paths, size):
+    """Identifies a sample list + resolution, so stale shards are rebuilt."""
+    digest = hashlib.sha1(f"{size}\n".encode())
+    for path in paths:
+        digest.update(path.encode("utf-8", "surrogateescape"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def _load_resized(job):
+    path, size = job
+    img = cv2.imread(path, cv2.IMREAD_COLOR)
+    if img is None:
+        return None
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    return cv2.resize(img, (size, size), interpolation=cv2.INTER_AREA)
+
+
+def build_shards(paths, crop_ids, disease_ids, shard_dir, size=256, shard_size=4096, workers=None):
+    """
+    Writes all images as (n, size, size, 3) uint8 shards. Decoding runs in a thread pool
+    (OpenCV releases the GIL, and threads don't re-import train.py the way spawned
+    processes do on Windows); unreadable images are kept as zero rows marked invalid.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    n = len(paths)
+    shard = np.arange(n) // shard_size
+    offset = np.arange(n) % shard_size
+    valid = np.ones(n, dtype=bool)
+
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for s, start in enumerate(range(0, n, shard_size)):
+            end = min(start + shard_size, n)
+            out = np.lib.format.open_memmap(
+                os.path.join(shard_dir, SHARD_FILE.format(s)), mode="w+",
+                dtype=np.uint8, shape=(end - start, size, size, 3)
+            )
+            jobs = [(paths[i], size) for i in range(start, end)]
+            for k, img in enumerate(pool.map(_load_resized, jobs)):
+                if img is None:
+                    valid[start + k] = False
+                else:
+                    out[k] = img
+            out.flush()
+            del out
+            print(f"Shard {s}: {end}/{n} images ({end / (time.time() - start_time):.0f} img/s)")
+
+    np.savez(
+        os.path.join(shard_dir, LABELS_FILE),
+        crop_id=np.asarray(crop_ids, dtype=np.int64),
+        disease_id=np.asarray(disease_ids, dtype=np.int64),
+        shard=shard, offset=offset, valid=valid
+    )
+    # Index last: its presence marks a complete build
+    with open(os.path.join(shard_dir, INDEX_FILE), "w") as f:
+        json.dump({
+            "size": size,
+            "count": n,
+            "shard_size": shard_size,
+            "num_shards": int(shard[-1]) + 1 if n else 0,
+            "invalid": int((~valid).sum()),
+            "fingerprint": fingerprint(paths, size)
+        }, f, indent=2)
+    print(f"Wrote {n} images to {shard_dir} in {time.time() - start_time:.0f}s ({int((~valid).sum())} unreadable)")
+
+
+class ShardIndex:
+    """Labels and lazily opened read-only memmaps of one shard directory."""
+
+    def __init__(self, shard_dir):
+        self.shard_dir = shard_dir
+        with open(os.path.join(shard_dir, INDEX_FILE)) as f:
+            self.meta = json.load(f)
+        labels = np.load(os.path.join(shard_dir, LABELS_FILE))
+        self.crop_id = labels["crop_id"]
+        self.disease_id = labels["disease_id"]
+        self.shard = labels["shard"]
+        self.offset = labels["offset"]
+        self.valid = labels["valid"]
+        self._shards = {}
+
+    @classmethod
+    def open_if_current(cls, shard_dir, paths, size):
+        """The index for this exact sample list and size, or None if missing/stale."""
+        try:
+            index = cls(shard_dir)
+        except (OSError, ValueError, KeyError):
+            return None
+        meta = index.meta
+        if meta.get("size") != size or meta.get("fingerprint") != fingerprint(paths, size):
+            return None
+        return index
+
+    def image(self, i):
+        """Zero-copy (size, size, 3) view of sample i."""
+        s = int(self.shard[i])
+        shard = self._shards.get(s)
+        if shard is None:
+            shard = np.load(os.path.join(self.shard_dir, SHARD_FILE.format(s)), mmap_mode="r")
+            self._shards[s] = shard
+        return shard[self.offset[i]]
+
+    def __getstate__(self):
+        # DataLoader workers reopen their own memmaps instead of pickling the pixels
+        state = self.__dict__.copy()
+        state["_shards"] = {}
+        return state
+
+
+def ensure_shards(shard_dir, paths, crop_ids, disease_ids, size=256, shard_size=4096, workers=None):
+    """Opens the shards for this sample list, building them first if missing or stale."""
+    index = ShardIndex.open_if_current(shard_dir, paths, size)
+    if index is None:
+        print(f"Building image shards in {shard_dir} (one-time, {len(paths)} images)...")
+        build_shards(paths, crop_ids, disease_ids, shard_dir, size, shard_size, workers)
+        index = ShardIndex(shard_dir)
+    return index
+
+
+class ShardDataset(Dataset):
+    """PlantDataset over preprocessed shards: no decode, no resize, unreadable images dropped."""
+
+    def __init__(self, index, indices, transform=None):
+        self.index = index
+        self.indices = [i for i in indices if index.valid[i]]
+        self.transform = transform
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, idx):
+        i = self.indices[idx]
+        img = self.index.image(i)
+        if self.transform:
+            img = self.transform(image=img)["image"]
+        return {
+            "image": img,
+            "crop": torch.tensor(self.index.crop_id[i], dtype=torch.long),
+            "disease": torch.tensor(self.index.disease_id[i], dtype=torch.long)
+        }
+
+
+def measure_throughput(dataset, batch_size=32, num_workers=4, max_batches=200, warmup=5):
+    """Images/sec a DataLoader sustains over this dataset (after a few warm-up batches)."""
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=True, num_workers=num_workers)
+    images = 0
+    start = None
+    for step, batch in enumerate(loader):
+        if step == warmup:
+            start = time.perf_counter()
+        elif step > warmup:
+            images += batch["image"].size(0)
+        if step >= warmup + max_batches:
+            break
+    elapsed = time.perf_counter() - start if start else 0.0
+    return images / elapsed if elapsed else 0.0
@@ -0,0 +1,57 @@
+"""
+ViT multi-task model: shared ViT-small encoder with crop and disease classification
+heads and a patch-token segmentation decoder. CompactMultiTaskModel is the small
+student distilled from it for CPU/edge serving (see distill.py).
+"""
+
+import timm
+import torch.nn as nn
+import torch.nn.functional as F
+
+
+class ViTMultiTaskModel(nn.Module):
+    def __init__(self, num_crops, num_diseases, pretrained=True):
+        super().__init__()
+        self.encoder = timm.create_model("vit_small_patch16_224",pretrained=pretrained,num_classes=0)
+        hidden_dim = self.encoder.embed_dim
+        self.crop_head = nn.Sequential(nn.LayerNorm(hidden_dim), nn.Linear(hidden_dim, num_crops))
+        self.disease_head = nn.Sequential(nn.LayerNorm(hidden_dim), nn.Linear(hidden_dim, num_diseases))
+        self.seg_decoder = nn.Sequential(
+            nn.Conv2d(hidden_dim, 256, kernel_size=3, padding=1),
+            nn.ReLU(),
+            nn.Conv2d(256, 1, kernel_size=1)
+        )
+
+    def forward(self, x):
+        B = x.size(0)
+        features = self.encoder.forward_features(x)
+        cls_token = features[:, 0]
+        crop_logits = self.crop_head(cls_token)
+        disease_logits = self.disease_head(cls_token)
+        
+        patch_tokens = features[:, 1:]
+        n = int(patch_tokens.size(1)**0.5)
+        seg_map = patch_tokens.transpose(1, 2).reshape(B, -1, n, n)
+        seg_map = F.interpolate(seg_map, size=(224, 224), mode='bilinear', align_corners=False)
+        seg_map = self.seg_decoder(seg_map)
+        return crop_logits, disease_logits, seg_map
+
+
+class CompactMultiTaskModel(nn.Module):
+    """
+    Small timm backbone (MobileNetV3, tiny ViT, ...) with crop and disease heads. It has
+    no segmentation decoder: forward returns None in its place so code unpacking
+    (crop_logits, disease_logits, seg_map) works with either model.
+    """
+
+    def __init__(self, num_crops, num_diseases, backbone="mobilenetv3_large_100", pretrained=True):
+        super().__init__()
+        self.backbone_name = backbone
+        self.backbone = timm.create_model(backbone, pretrained=pretrained, num_classes=0)
+        hidden_dim = self.backbone.num_features
+        self.crop_head = nn.Sequential(nn.LayerNorm(hidden_dim), nn.Linear(hidden_dim, num_crops))
+        self.disease_head = nn.Sequential(nn.LayerNorm(hidden_dim), nn.Linear(hidden_dim, num_diseases))
+
+    def forward(self, x):
+        features = self.backbone(x)
+        return self.crop_head(features), self.disease_head(features), None
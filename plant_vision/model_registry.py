@@ -0,0 +1,54 @@
+"""
+Model Registry
+models/model_registry.json lists the exported detection models and which one
+LocalInferenceService serves (override with the LOCAL_MODEL environment variable):
+
+    {
+      "active": "vit_small",
+      "models": {
+        "vit_small": {
+          "architecture": "vit_multitask",        # ViTMultiTaskModel
+          "backbone": "vit_small_patch16_224",
+          "weights": "vit_model.pt",              # relative to the models directory
+          "encoders": "encoders.pkl",
+          "img_size": 224,
+          "metrics": {...}                        # optional: accuracy, latency, params
+        },
+        "mobilenetv3_student": {"architecture": "compact_multitask", ...}
+      }
+    }
+"""
+
+import json
+import os
+
+REGISTRY_FILE = "model_registry.json"
+ARCHITECTURES = ("vit_multitask", "compact_multitask")
+
+
+def load_registry(models_dir):
+    path = os.path.join(models_dir, REGISTRY_FILE)
+    if not os.path.exists(path):
+        return {"active": None, "models": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def register_model(models_dir, name, entry, activate=False):
+    """
+    Adds or replaces a registry entry. The entry becomes active when activate=True or
+    when nothing is active yet.
+    """
+    if entry.get("architecture") not in ARCHITECTURES:
+        raise ValueError(f"architecture must be one of {ARCHITECTURES}")
+    registry = load_registry(models_dir)
+    registry["models"][name] = entry
+    if activate or not registry.get("active"):
+        registry["active"] = name
+
+    path = os.path.join(models_dir, REGISTRY_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(registry, f, indent=2)
+    os.replace(tmp_path, path)
+    return registry
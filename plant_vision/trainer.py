@@ -0,0 +1,326 @@
+"""
+Training loop for ViTMultiTaskModel. A Trainer only reads its config when created; the
+dataset index, datasets, loaders, model and optimizer are built on first use, so
+tools that just need (say) the label encoders or the val loader pay for nothing else.
+
+    trainer = Trainer(CONFIG)
+    trainer.fit()                # full training, resumed from the latest checkpoint
+    trainer.train_heads_only()   # heads on cached frozen-encoder embeddings
+"""
+
+import os
+import pickle
+import random
+from functools import cached_property
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import DataLoader
+from torch.utils.data.distributed import DistributedSampler
+from tqdm import tqdm
+
+from . import dist_utils, embedding_cache
+from .checkpointing import (
+    EarlyStopping, archive_checkpoints, latest_checkpoint, load_checkpoint, read_checkpoint, save_checkpoint
+)
+from .data import DatasetIndex, PlantDataset, shard_train_transform, train_transform, val_transform
+from .image_shards import ShardDataset, ensure_shards, fingerprint, measure_throughput
+from .model import ViTMultiTaskModel
+from .model_registry import register_model
+from .training_engine import TrainingEngine, configure_cpu_threads
+
+
+def set_seed(seed):
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    torch.cuda.manual_seed_all(seed)
+
+
+class Trainer:
+    def __init__(self, config):
+        self.config = dict(config)
+        os.makedirs(self.config["save_path"], exist_ok=True)
+        set_seed(self.config["seed"])
+
+        # Single process unless launched by torchrun; only rank 0 prints progress and writes files
+        self.rank, self.world_size, self.local_rank = dist_utils.init_distributed(self.config["dist_backend"])
+        self.is_main = self.rank == 0
+        if self.world_size > 1 and self.config["device"] == "cuda":
+            self.config["device"] = f"cuda:{self.local_rank}"
+            torch.cuda.set_device(self.local_rank)
+
+        if self.config["device"] == "cpu":
+            # Processes on the same node share its cores
+            cpu_threads = self.config["cpu_threads"] or max(1, (os.cpu_count() or 1) // dist_utils.local_world_size())
+            threads = configure_cpu_threads(cpu_threads, self.config["interop_threads"])
+            if self.is_main:
+                print(f"CPU threads per process (intra-op, inter-op): {threads}")
+        if self.is_main:
+            print(f"Using device: {self.config['device']} (processes: {self.world_size})")
+
+    @property
+    def device(self):
+        return self.config["device"]
+
+    # ================= DATA =================
+    @cached_property
+    def index(self):
+        # Rank 0 refreshes (and saves) the dataset manifest; the other ranks then find it up to date
+        with dist_utils.main_process_first():
+            return DatasetIndex.build(self.config)
+
+    @cached_property
+    def shard_index(self):
+        """Preprocessed uint8 shards of every sample (None with use_shards off)."""
+        if not self.config["use_shards"]:
+            return None
+        # Rank 0 builds missing shards; the other ranks open them once it is done
+        with dist_utils.main_process_first():
+            return ensure_shards(
+                self.config["shard_path"], self.index.image_paths, self.index.crop_ids, self.index.disease_ids,
+                size=self.config["shard_img_size"]
+            )
+
+    def dataset(self, indices, train=False):
+        img_size = self.config["img_size"]
+        if self.shard_index is not None:
+            transform = shard_train_transform(img_size) if train else val_transform(img_size)
+            return ShardDataset(self.shard_index, indices, transform)
+        return PlantDataset(self.index, indices, train_transform(img_size) if train else val_transform(img_size))
+
+    @cached_property
+    def train_dataset(self):
+        return self.dataset(self.index.train_idx, train=True)
+
+    @cached_property
+    def val_dataset(self):
+        return self.dataset(self.index.val_idx)
+
+    @cached_property
+    def train_sampler(self):
+        # Under torchrun each rank trains on its own 1/world_size shard of every epoch (padded to
+        # equal length so ranks run the same number of steps)
+        if self.world_size == 1:
+            return None
+        return DistributedSampler(self.train_dataset, shuffle=True, seed=self.config["seed"])
+
+    def _loader(self, dataset, **kwargs):
+        # (On Windows, num_workers > 0 can sometimes cause errors, start with 0)
+        num_workers = self.config["num_workers"]
+        return DataLoader(
+            dataset,
+            batch_size=self.config["batch_size"],
+            num_workers=num_workers,
+            pin_memory=True,
+            persistent_workers=num_workers > 0,
+            prefetch_factor=2 if num_workers > 0 else None,
+            **kwargs
+        )
+
+    @cached_property
+    def train_loader(self):
+        return self._loader(self.train_dataset, shuffle=self.train_sampler is None, sampler=self.train_sampler)
+
+    @cached_property
+    def val_loader(self):
+        # Each rank validates an unpadded strided slice; fit() sums the counts over ranks
+        sampler = None
+        if self.world_size > 1:
+            sampler = list(range(self.rank, len(self.val_dataset), self.world_size))
+        return self._loader(self.val_dataset, sampler=sampler)
+
+    @cached_property
+    def run_signature(self):
+        """Label counts and sample list a checkpoint is trained on; resuming requires a match."""
+        return {
+            "num_crops": self.index.num_crops,
+            "num_diseases": self.index.num_diseases,
+            "samples": fingerprint(self.index.image_paths, self.config["img_size"]),
+        }
+
+    # ================= MODEL =================
+    @cached_property
+    def model(self):
+        return ViTMultiTaskModel(self.index.num_crops, self.index.num_diseases).to(self.device)
+
+    @cached_property
+    def optimizer(self):
+        return optim.AdamW(self.model.parameters(), lr=self.config["lr"])
+
+    @cached_property
+    def engine(self):
+        return TrainingEngine(
+            self.model, self.optimizer, self.device, precision=self.config["precision"],
+            accum_steps=self.config["accum_steps"], channels_last=self.config["channels_last"],
+            compile_model=self.config["compile"], distributed=self.world_size > 1
+        )
+
+    # ================= OUTPUTS =================
+    def save_outputs(self):
+        save_path = self.config["save_path"]
+        torch.save(self.model.state_dict(), os.path.join(save_path, "vit_model.pt"))
+        with open(os.path.join(save_path, "encoders.pkl"), "wb") as f:
+            pickle.dump(self.index.encoders, f)
+        # Served by default unless another registry entry (e.g. a distilled student) is active
+        register_model(save_path, "vit_small", {
+            "architecture": "vit_multitask",
+            "backbone": "vit_small_patch16_224",
+            "weights": "vit_model.pt",
+            "encoders": "encoders.pkl",
+            "img_size": self.config["img_size"],
+        })
+
+    # ================= TASKS =================
+    def benchmark_loader(self):
+        """Loader throughput: JPEG decode + resize vs preprocessed shards."""
+        num_workers = self.config["num_workers"]
+        jpeg_dataset = PlantDataset(self.index, self.index.train_idx, train_transform(self.config["img_size"]))
+        print(f"JPEG loader:  {measure_throughput(jpeg_dataset, num_workers=num_workers):.1f} img/s")
+        if self.shard_index is not None:
+            print(f"Shard loader: {measure_throughput(self.train_dataset, num_workers=num_workers):.1f} img/s")
+
+    def train_heads_only(self):
+        """
+        Keeps the encoder (and seg decoder) of the saved model frozen and retrains only
+        crop_head / disease_head on cached embeddings. Heads whose class count changed start fresh.
+        """
+        config = self.config
+        model = self.model
+        base_path = os.path.join(config["save_path"], "vit_model.pt")
+        if os.path.exists(base_path):
+            embedding_cache.load_matching_weights(model, torch.load(base_path, map_location=self.device))
+
+        encode_dataset = self.dataset(list(range(len(self.index.image_paths))))
+        samples_key = f"{fingerprint(self.index.image_paths, config['img_size'])}:shards={config['use_shards']}"
+        cache = embedding_cache.ensure_cache(
+            model.encoder, encode_dataset, config["embedding_path"], samples_key, self.device,
+            patch_tokens=config["cache_patch_tokens"], num_workers=config["num_workers"]
+        )
+        best_acc = embedding_cache.train_heads(
+            model, cache, cache.rows_for(self.index.train_idx), cache.rows_for(self.index.val_idx),
+            epochs=config["head_epochs"], lr=config["head_lr"], device=self.device
+        )
+        self.save_outputs()
+        print(f"Head retraining complete (Disease Acc: {best_acc:.4f}). Model Saved.")
+
+    def fit(self, resume=True):
+        config = self.config
+        model, optimizer, engine = self.model, self.optimizer, self.engine
+        train_loader, val_loader = self.train_loader, self.val_loader
+        scaler = engine.scaler
+        criterion = nn.CrossEntropyLoss()
+        criterion_seg = nn.BCEWithLogitsLoss()
+
+        early_stopping = EarlyStopping(patience=config["early_stopping_patience"])
+        history = []
+        start_epoch = 0
+        resume_path = latest_checkpoint(config["checkpoint_path"]) if resume else None
+        checkpoint = None
+        if resume_path:
+            # Refuses (CheckpointMismatchError) a checkpoint of another label set or sample list
+            checkpoint = read_checkpoint(resume_path, self.run_signature)
+            finished = EarlyStopping(patience=config["early_stopping_patience"])
+            if checkpoint.get("early_stopping"):
+                finished.load_state_dict(checkpoint["early_stopping"])
+            if checkpoint["epoch"] >= config["epochs"] or finished.should_stop:
+                if self.is_main:
+                    print(f"{resume_path} belongs to a finished run (epoch {checkpoint['epoch']}), starting a new one")
+                checkpoint = None
+        if checkpoint is None:
+            # A new run: the previous run's checkpoints must neither be resumed nor outrank (and prune) ours
+            if self.is_main:
+                archived = archive_checkpoints(config["checkpoint_path"])
+                if archived:
+                    print(f"Previous checkpoints moved to {archived}")
+            dist_utils.barrier()
+        else:
+            # Every rank loads the same checkpoint, so replicas stay identical
+            start_epoch, history = load_checkpoint(checkpoint, model, optimizer, scaler, early_stopping)
+            if self.is_main:
+                print(f"Resumed from {resume_path} (epoch {start_epoch}, best Disease Acc: {early_stopping.best})")
+
+        for epoch in range(start_epoch, config["epochs"]):
+            if early_stopping.should_stop:
+                break
+            model.train()
+            train_loss = 0.0
+            if self.train_sampler is not None:
+                self.train_sampler.set_epoch(epoch)
+
+            optimizer.zero_grad()
+
+            last_step = len(train_loader) - 1
+            progress = tqdm(train_loader, desc=f"Epoch {epoch+1} ({engine.precision_name})", disable=not self.is_main)
+            for step, batch in enumerate(progress):
+                imgs = engine.to_device(batch["image"])
+                crops = batch["crop"].to(self.device, non_blocking=True)
+                diseases = batch["disease"].to(self.device, non_blocking=True)
+
+                # A final partial accumulation window still gets its (synced) optimizer step
+                with engine.accumulation(step, last=step == last_step):
+                    with engine.autocast():
+                        c_logits, d_logits, s_map = engine(imgs)
+                        loss = (
+                            criterion(c_logits, crops)
+                            + criterion(d_logits, diseases)
+                            + 0.5 * criterion_seg(s_map, torch.zeros_like(s_map))
+                        )
+
+                    engine.backward(loss, step, last=step == last_step)
+                train_loss += loss.item()
+
+            # ================= VALIDATION =================
+            model.eval()
+            correct_c = 0
+            correct_d = 0
+            seen = 0
+
+            with torch.no_grad(), engine.autocast():
+                for batch in val_loader:
+                    imgs = engine.to_device(batch["image"])
+                    crops = batch["crop"].to(self.device)
+                    diseases = batch["disease"].to(self.device)
+                    c_logits, d_logits, _ = engine.evaluate(imgs)
+                    correct_c += (c_logits.argmax(1) == crops).sum().item()
+                    correct_d += (d_logits.argmax(1) == diseases).sum().item()
+                    seen += crops.size(0)
+
+            # Summed over ranks, so every rank gets the same metrics (and the same early-stopping decision)
+            loss_sum, batches, correct_c, correct_d, seen = dist_utils.all_reduce_sum(
+                [train_loss, len(train_loader), correct_c, correct_d, seen]
+            )
+            metrics = {
+                "epoch": epoch + 1,
+                "loss": loss_sum / batches,
+                "crop_acc": correct_c / seen,
+                "disease_acc": correct_d / seen,
+            }
+            history.append(metrics)
+            if self.is_main:
+                print(
+                    f"Epoch {epoch+1} | "
+                    f"Loss: {metrics['loss']:.4f} | "
+                    f"Crop Acc: {metrics['crop_acc']:.4f} | "
+                    f"Disease Acc: {metrics['disease_acc']:.4f}"
+                )
+
+            # Best model is exported as soon as it appears; later, worse epochs don't overwrite it
+            if early_stopping.step(metrics["disease_acc"]) and self.is_main:
+                self.save_outputs()
+                print(f"New best Disease Acc {metrics['disease_acc']:.4f}, model exported")
+            if self.is_main:
+                save_checkpoint(
+                    config["checkpoint_path"], epoch + 1, model, optimizer, scaler, early_stopping, history,
+                    keep=config["keep_checkpoints"], signature=self.run_signature
+                )
+            # Nobody moves on (or exits) before the epoch's files are written
+            dist_utils.barrier()
+            if early_stopping.should_stop and self.is_main:
+                print(f"Early stopping: no improvement for {early_stopping.patience} epochs")
+
+        if self.is_main:
+            print(f"Training Complete. Best model (Disease Acc: {early_stopping.best}) saved.")
+        return history
@@ -0,0 +1,137 @@
+"""
+Device-Aware Training Engine
+Picks the mixed-precision mode for the device the model runs on and wraps the
+forward/backward/step calls of the training loop:
+- CUDA: float16 autocast with a GradScaler
+- CPU:  bfloat16 autocast when the CPU has native bf16 support (AVX512-BF16 / AMX),
+        float32 otherwise; never a GradScaler (bf16 has float32's exponent range)
+plus CPU thread tuning, optional channels-last inputs, optional torch.compile and,
+under torchrun, DistributedDataParallel with gradient sync only on optimizer steps.
+"""
+
+import os
+from contextlib import nullcontext
+
+import torch
+from torch.nn.parallel import DistributedDataParallel
+
+PRECISIONS = ("auto", "fp32", "bf16", "fp16")
+
+
+def cpu_supports_bf16():
+    """True when oneDNN reports native bf16 kernels on this CPU."""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def configure_cpu_threads(intra_op=None, inter_op=None):
+    """
+    Sets torch intra-op threads (default os.cpu_count()) and, if given, inter-op threads
+    (1-2 is usually best: the training graph is sequential). Call before the first
+    parallel op.
+    """
+    intra_op = intra_op or os.cpu_count() or 1
+    torch.set_num_threads(intra_op)
+    if inter_op:
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError:
+            # Already fixed once any inter-op parallel work has started
+            print(f"Inter-op threads already set ({torch.get_num_interop_threads()}), keeping them")
+    return torch.get_num_threads(), torch.get_num_interop_threads()
+
+
+def resolve_precision(device_type, precision="auto"):
+    """Autocast dtype (or None for float32) for a device and a precision setting."""
+    if precision not in PRECISIONS:
+        raise ValueError(f"precision must be one of {PRECISIONS}")
+    if precision == "fp32":
+        return None
+    if precision == "auto":
+        if device_type == "cuda":
+            return torch.float16
+        return torch.bfloat16 if cpu_supports_bf16() else None
+    if precision == "fp16" and device_type != "cuda":
+        raise ValueError("fp16 autocast needs CUDA; use bf16 or fp32 on CPU")
+    return torch.bfloat16 if precision == "bf16" else torch.float16
+
+
+class TrainingEngine:
+    """Forward context, scaled backward and accumulated optimizer steps for one device."""
+
+    def __init__(self, model, optimizer, device, precision="auto", accum_steps=1,
+                 channels_last=False, compile_model=False, distributed=False):
+        self.device = torch.device(device)
+        self.device_type = self.device.type
+        self.optimizer = optimizer
+        self.accum_steps = accum_steps
+        self.channels_last = channels_last
+        self.amp_dtype = resolve_precision(self.device_type, precision)
+        # Loss scaling is only needed for float16; disabled scalers are no-ops but keep a state_dict
+        self.scaler = torch.amp.GradScaler(
+            self.device_type if self.device_type == "cuda" else "cpu",
+            enabled=self.amp_dtype == torch.float16
+        )
+
+        if channels_last:
+            model = model.to(memory_format=torch.channels_last)
+        self.model = model
+        # DDP broadcasts rank 0's weights on construction and all-reduces gradients in backward
+        self.ddp_model = None
+        if distributed:
+            device_ids = [self.device.index] if self.device_type == "cuda" else None
+            self.ddp_model = DistributedDataParallel(model, device_ids=device_ids)
+        # The compiled/DDP wrappers share parameters with `model`; state_dicts come from the original
+        train_model = self.ddp_model or model
+        self.forward_model = torch.compile(train_model) if compile_model and hasattr(torch, "compile") else train_model
+        # Evaluation skips DDP: its forward syncs buffers, which hangs when ranks run different batch counts
+        self.eval_model = self.forward_model if self.ddp_model is None else model
+
+    @property
+    def precision_name(self):
+        return {None: "fp32", torch.bfloat16: "bf16", torch.float16: "fp16"}[self.amp_dtype]
+
+    def autocast(self):
+        if self.amp_dtype is None:
+            return nullcontext()
+        return torch.autocast(device_type=self.device_type, dtype=self.amp_dtype)
+
+    def to_device(self, images):
+        images = images.to(self.device, non_blocking=True)
+        if self.channels_last:
+            images = images.contiguous(memory_format=torch.channels_last)
+        return images
+
+    def __call__(self, images):
+        return self.forward_model(images)
+
+    def evaluate(self, images):
+        return self.eval_model(images)
+
+    def _is_step(self, step, last):
+        return last or (step + 1) % self.accum_steps == 0
+
+    def accumulation(self, step, last=False):
+        """
+        Context for one micro-batch's forward + backward. Under DDP, gradients are only
+        all-reduced on micro-batches that end in an optimizer step.
+        """
+        if self.ddp_model is None or self._is_step(step, last):
+            return nullcontext()
+        return self.ddp_model.no_sync()
+
+    def backward(self, loss, step, last=False):
+        """
+        Backward for one micro-batch; steps the optimizer every accum_steps micro-batches
+        and on the last one (pass last=True so a partial window is applied too).
+        """
+        self.scaler.scale(loss / self.accum_steps).backward()
+        if self._is_step(step, last):
+            self.step()
+
+    def step(self):
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        self.optimizer.zero_grad(set_to_none=True)